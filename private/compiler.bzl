@@ -124,6 +124,13 @@ def _py_reqs_compiler_impl(ctx):
     if ctx.attr.allow_sdists:
         args.append("--allow_sdists")
 
+    if ctx.attr.target_python:
+        args.extend(["--target_python", ctx.attr.target_python])
+    for target_platform in ctx.attr.target_platforms:
+        args.extend(["--target_platform", target_platform])
+    for target_abi in ctx.attr.target_abis:
+        args.extend(["--target_abi", target_abi])
+
     args_file = ctx.actions.declare_file("{}.args.txt".format(ctx.label.name))
     ctx.actions.write(
         output = args_file,
@@ -224,6 +231,18 @@ bazel run //:requirements.update -- --upgrade
             allow_single_file = True,
             mandatory = True,
         ),
+        "target_abis": attr.string_list(
+            doc = "ABI tags supported by the target. Defaults to the ABIs of `target_python`.",
+        ),
+        "target_platforms": attr.string_list(
+            doc = (
+                "Platform tags to compile for (e.g. `manylinux_2_28_x86_64`, `win_amd64`) instead " +
+                "of the platform the compiler runs on. Metadata of sdists is still extracted on the host."
+            ),
+        ),
+        "target_python": attr.string(
+            doc = "The Python version to compile for (e.g. `3.12`) instead of the Python the compiler runs with.",
+        ),
         "_compiler": attr.label(
             cfg = _compilation_mode_opt_transition,
             executable = True,
@@ -300,6 +319,8 @@ def _py_reqs_solution_test_impl(ctx):
         ))
 
     args.add("--no_index")
+    if ctx.attr.verify_only:
+        args.add("--verify")
 
     ctx.actions.write(
         output = args_file,
@@ -376,6 +397,14 @@ py_reqs_solution_test(
             doc = "The solution file. This attribute is mutually exclusive with `compiler`.",
             allow_single_file = True,
         ),
+        "verify_only": attr.bool(
+            doc = (
+                "Only check the pins and explanations recorded in the solution against " +
+                "the requirements, instead of compiling them. This never reads " +
+                "distribution metadata."
+            ),
+            default = False,
+        ),
         "_copier": attr.label(
             cfg = "exec",
             executable = True,
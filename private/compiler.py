@@ -9,9 +9,12 @@ import shutil
 import subprocess
 import sys
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from pathlib import Path
 from typing import (
+    IO,
+    Any,
     Dict,
     List,
     Mapping,
@@ -27,6 +30,7 @@ from typing import (
 # pylint: disable-next=import-error
 from python.runfiles import Runfiles
 
+from req_compile.batch import BatchJob, read_batch_manifest, shared_repositories
 from req_compile.cmdline import (
     IndentFilter,
     _generate_no_candidate_display,
@@ -35,10 +39,16 @@ from req_compile.cmdline import (
 )
 from req_compile.compile import AllOnlyBinarySet, perform_compile
 from req_compile.containers import RequirementsFile
+from req_compile.daemon import run_in_daemon
 from req_compile.dists import DependencyNode, DistributionCollection
 from req_compile.errors import NoCandidateException
 from req_compile.repos import Repository
 from req_compile.repos.repository import DistributionType
+from req_compile.repos.solution import SolutionRepository
+from req_compile.result_cache import ResultCache, compile_fingerprint
+from req_compile.target import TargetEnvironment, set_target
+from req_compile.verify import verify_solution
+from req_compile.worker import WORKER_FLAG, worker_main
 
 _HEADER = """\
 ################################################################################
@@ -113,6 +123,62 @@ def parse_args(args: Optional[Sequence[str]]) -> argparse.Namespace:
         type=Path,
         help="When set, failed compilations will write wheels for sdist requirements found to this locaiton.",
     )
+    parser.add_argument(
+        "--target_python",
+        type=str,
+        help="The Python version to compile for. Defaults to the running Python.",
+    )
+    parser.add_argument(
+        "--target_platform",
+        dest="target_platforms",
+        action="append",
+        default=[],
+        type=str,
+        help="A platform tag to compile for, e.g. `manylinux_2_28_x86_64`. Defaults to the current platform.",
+    )
+    parser.add_argument(
+        "--target_abi",
+        dest="target_abis",
+        action="append",
+        default=[],
+        type=str,
+        help="An ABI tag supported by the target. Defaults to the ABIs of the target Python.",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help=(
+            "If set, only check that the pins and explanations in the solution "
+            "satisfy the requirements, without compiling them."
+        ),
+    )
+    parser.add_argument(
+        "--result_cache_dir",
+        type=Path,
+        default=os.environ.get("REQ_COMPILE_RESULT_CACHE_DIR") or None,
+        help=(
+            "A directory in which to cache compile results. An unchanged compile is "
+            "answered from the cache without consulting any index. Defaults to "
+            "`REQ_COMPILE_RESULT_CACHE_DIR`."
+        ),
+    )
+    parser.add_argument(
+        "--index_snapshot",
+        type=str,
+        default=os.environ.get("REQ_COMPILE_INDEX_SNAPSHOT") or None,
+        help=(
+            "An id for the state of the package indices, included in the result "
+            "cache key. Defaults to `REQ_COMPILE_INDEX_SNAPSHOT`."
+        ),
+    )
+    parser.add_argument(
+        "--all_platform_hashes",
+        action="store_true",
+        help=(
+            "If set, the solution includes the hashes of each pinned version's files "
+            "for every platform, not only those used while compiling."
+        ),
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -175,7 +241,11 @@ def compile_requirements(
     only_binary: bool = False,
     promote_extra_index_urls: bool = False,
     wheeldir: Optional[Union[str, Path]] = None,
-) -> CompilationResult:
+    result_cache: Optional[ResultCache] = None,
+    index_snapshot: Optional[str] = None,
+    all_platform_hashes: bool = False,
+    write_to: Optional[IO[str]] = None,
+) -> Optional[CompilationResult]:
     """Compile a solution for a set of requirements.
 
     Args:
@@ -188,9 +258,18 @@ def compile_requirements(
         only_binary: Ensure the solution is composed exclusively of wheels.
         promote_extra_index_urls: Promote extra index urls to index urls.
         wheeldir: An optional wheeldir to use during compilation.
+        result_cache: A cache of previous results. If the inputs, repositories and
+            options match a previous compile, its solution is written to `write_to`
+            as is. Without `write_to`, it is used in place of `solution` and
+            resolves every requirement without using an index.
+        index_snapshot: An id for the state of the indices, added to the cache key.
+        all_platform_hashes: Whether solutions written or stored in the result cache
+            include the hashes of the pinned versions' files for every platform.
+        write_to: If given, the solution is written to it, with URLs and hashes.
 
     Returns:
-        The results of the compilation if successful.
+        The results of the compilation if successful, or None if the solution was
+        written from the result cache without compiling.
     """
     input_reqs: List[RequirementsFile] = []
     index_urls: Set[str] = set()
@@ -223,25 +302,56 @@ def compile_requirements(
             container.name = name
             constraint_reqs.append(container)
 
+    index_urls = index_urls | (extra_index_urls if promote_extra_index_urls else set())
+    if promote_extra_index_urls:
+        extra_index_urls = set()
+
+    solutions = [] if upgrade else [solution]
+    cache_key = None
+    if result_cache is not None:
+        cache_key = compile_fingerprint(
+            requirement_files=requirements_ins,
+            constraint_files=constraints,
+            solutions=solutions,
+            find_links=sorted(find_links),
+            index_urls=sorted(index_urls),
+            extra_index_urls=sorted(extra_index_urls),
+            options={
+                "no_index": no_index,
+                "only_binary": only_binary,
+                "upgrade": upgrade,
+                "all_platform_hashes": all_platform_hashes,
+            },
+            index_snapshot=index_snapshot,
+        )
+        cached_solution = result_cache.get(cache_key)
+        if cached_solution is not None and write_to is not None:
+            write_to.write(cached_solution.read_text(encoding="utf-8"))
+            return None
+        if cached_solution is not None:
+            solutions = [cached_solution]
+            cache_key = None
+
     # Identify the wheeldir to use
     external_wheeldir = True
+    if not wheeldir and os.environ.get("REQ_COMPILE_DOWNLOAD_DIR"):
+        wheeldir = Path(os.environ["REQ_COMPILE_DOWNLOAD_DIR"])
+        wheeldir.mkdir(parents=True, exist_ok=True)
     if not wheeldir:
         wheeldir = Path(tempfile.mkdtemp())
         external_wheeldir = False
 
     # Generate the solution repository
     repo = build_repo(
-        solutions=[] if upgrade else [str(solution)],
+        solutions=[str(path) for path in solutions],
         upgrade_packages=[],
         sources=[],
         excluded_sources=[],
         find_links=dict(sorted(find_links.items())),
-        index_urls=sorted(
-            index_urls | (extra_index_urls if promote_extra_index_urls else set())
-        ),
+        index_urls=sorted(index_urls),
         no_index=no_index,
         wheeldir=wheeldir,
-        extra_index_urls=[] if promote_extra_index_urls else sorted(extra_index_urls),
+        extra_index_urls=sorted(extra_index_urls),
     )
 
     # Compile the solution
@@ -255,9 +365,28 @@ def compile_requirements(
     except NoCandidateException as exc:
         raise CompilationError(repo=repo, parent=exc) from exc
     finally:
-        if external_wheeldir:
+        if not external_wheeldir:
             shutil.rmtree(wheeldir)
 
+    store = result_cache is not None and cache_key is not None
+    if store or write_to is not None:
+        buffer = StringIO()
+        write_requirements_file(
+            results=compiled_solution,
+            roots=dep_nodes,
+            repo=repo,
+            urls=True,
+            hashes=True,
+            multiline=True,
+            write_to=buffer,
+            all_platform_hashes=all_platform_hashes,
+        )
+        if store:
+            assert result_cache is not None and cache_key is not None
+            result_cache.put(cache_key, buffer.getvalue())
+        if write_to is not None:
+            write_to.write(buffer.getvalue())
+
     return CompilationResult(
         solution=compiled_solution,
         dep_nodes=dep_nodes,
@@ -265,6 +394,108 @@ def compile_requirements(
     )
 
 
+# The options of batch manifest jobs that map to `compile_requirements` arguments.
+_BATCH_OPTIONS: Dict[Tuple[str, ...], Dict[str, Any]] = {
+    ("--no-index",): {"no_index": True},
+    ("--only-binary", ":all:"): {"only_binary": True},
+    ("--only-binary=:all:",): {"only_binary": True},
+    ("--all-platform-hashes",): {"all_platform_hashes": True},
+    # Solutions are always written with URLs and hashes, on several lines.
+    ("--hashes",): {},
+    ("--urls",): {},
+    ("--multiline",): {},
+}
+
+
+def _batch_job_options(job: BatchJob) -> Dict[str, Any]:
+    """The `compile_requirements` arguments given by the options of a batch job.
+
+    Raises:
+        ValueError: If the job has an option that can't be mapped.
+    """
+    options: Dict[str, Any] = {}
+    remaining = list(job.options)
+    while remaining:
+        for flag, values in _BATCH_OPTIONS.items():
+            if tuple(remaining[: len(flag)]) == flag:
+                options.update(values)
+                del remaining[: len(flag)]
+                break
+        else:
+            raise ValueError(
+                f"Option {remaining[0]} of batch job {job.name} is not supported"
+            )
+    return options
+
+
+def compile_batch(
+    manifest: Union[str, Path], **options: Any
+) -> Dict[str, Union[Optional[CompilationResult], Exception]]:
+    """Compile the jobs of a batch manifest, like `req-compile --batch`.
+
+    The jobs are compiled concurrently, sharing their repositories and caches. The
+    inputs and constraints of each job are passed to `compile_requirements` as
+    `requirements_ins` and `constraints`. Its output is the previous `solution`, and
+    is overwritten with the new solution once the job succeeds.
+
+    Only the manifest options with a `compile_requirements` argument are supported:
+    --no-index, --only-binary :all: and --all-platform-hashes. --hashes, --urls and
+    --multiline are accepted, as solutions are always written with them.
+
+    Args:
+        manifest: Path of the batch manifest.
+        options: Keyword arguments of `compile_requirements` for every job, other
+            than `write_to`.
+
+    Returns:
+        The result of each job by name, or the error it failed with.
+
+    Raises:
+        ValueError: If the manifest can't be read, or has unsupported options.
+    """
+    jobs = read_batch_manifest(str(manifest))
+    job_options = {job.name: _batch_job_options(job) for job in jobs}
+
+    # Jobs share a wheeldir, so they can share their index repositories.
+    wheeldir = options.pop("wheeldir", None)
+    temp_wheeldir = None
+    if not wheeldir:
+        wheeldir = temp_wheeldir = Path(tempfile.mkdtemp())
+
+    def compile_job(job: BatchJob) -> Optional[CompilationResult]:
+        buffer = StringIO()
+        result = compile_requirements(
+            requirements_ins={name: Path(name) for name in job.inputs},
+            solution=Path(job.output),
+            constraints=(
+                {name: Path(name) for name in job.constraints}
+                if job.constraints
+                else None
+            ),
+            wheeldir=wheeldir,
+            write_to=buffer,
+            **{**options, **job_options[job.name]},
+        )
+        Path(job.output).write_text(buffer.getvalue(), encoding="utf-8")
+        return result
+
+    try:
+        with shared_repositories(), ThreadPoolExecutor(
+            max_workers=max(1, min(len(jobs), os.cpu_count() or 1))
+        ) as executor:
+            futures = {job.name: executor.submit(compile_job, job) for job in jobs}
+            results: Dict[str, Union[Optional[CompilationResult], Exception]] = {}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    results[name] = exc
+    finally:
+        if temp_wheeldir is not None:
+            shutil.rmtree(temp_wheeldir)
+    return results
+
+
 def rlocation(runfiles: Runfiles, rlocationpath: str) -> Path:
     """Look up a runfile and ensure the file exists
 
@@ -386,6 +617,32 @@ def wheelmaker_main(args: argparse.Namespace, runfiles: Runfiles) -> None:
         sys.exit(proc_result.returncode)
 
 
+def verify_main(args: argparse.Namespace, runfiles: Runfiles) -> None:
+    """The entrypoint for checking a solution without compiling it."""
+
+    requirements_ins: List[RequirementsFile] = []
+    for requirement_file in args.requirements_files:
+        container = RequirementsFile.from_file(rlocation(runfiles, requirement_file))
+        container.name = requirement_file
+        requirements_ins.append(container)
+    solution = rlocation(runfiles, args.solution)
+
+    if args.target_python or args.target_platforms or args.target_abis:
+        set_target(
+            TargetEnvironment.create(
+                python_version=args.target_python,
+                platforms=args.target_platforms,
+                abis=args.target_abis,
+            )
+        )
+
+    problems = verify_solution(SolutionRepository(solution), requirements_ins)
+    for problem in problems:
+        print(f"ERROR: {problem}", file=sys.stderr)
+    if problems:
+        sys.exit(1)
+
+
 def compile_main(args: argparse.Namespace, runfiles: Runfiles) -> None:
     """The entrypoint for performing compilation."""
 
@@ -394,14 +651,42 @@ def compile_main(args: argparse.Namespace, runfiles: Runfiles) -> None:
         requirements_files[requirement_file] = rlocation(runfiles, requirement_file)
     solution = rlocation(runfiles, args.solution)
 
+    target = None
+    if args.target_python or args.target_platforms or args.target_abis:
+        target = TargetEnvironment.create(
+            python_version=args.target_python,
+            platforms=args.target_platforms,
+            abis=args.target_abis,
+        )
+        set_target(target)
+
+    buffer = StringIO()
+    buffer.write(
+        _HEADER.format(
+            custom_compile_command=args.custom_compile_command,
+            python=(target.python_version if target else platform.python_version()),
+            platform=(
+                target.marker_environment()["platform_system"]
+                if target
+                else platform.system()
+            ),
+        )
+    )
+
     # Compile all requirements
     try:
-        result = compile_requirements(
+        compile_requirements(
             requirements_ins=requirements_files,
             solution=solution,
             upgrade=args.upgrade,
             only_binary=False if args.allow_sdists else True,
             no_index=args.no_index,
+            result_cache=(
+                ResultCache(args.result_cache_dir) if args.result_cache_dir else None
+            ),
+            index_snapshot=args.index_snapshot,
+            all_platform_hashes=args.all_platform_hashes,
+            write_to=buffer,
         )
     except CompilationError as exc:
         _generate_no_candidate_display(
@@ -418,24 +703,6 @@ def compile_main(args: argparse.Namespace, runfiles: Runfiles) -> None:
 
     # Write out the requirements file if a location was provided.
     if args.output:
-        buffer = StringIO()
-        buffer.write(
-            _HEADER.format(
-                custom_compile_command=args.custom_compile_command,
-                python=platform.python_version(),
-                platform=platform.system(),
-            )
-        )
-        write_requirements_file(
-            results=result.solution,
-            roots=result.dep_nodes,
-            repo=result.repo,
-            urls=True,
-            hashes=True,
-            multiline=True,
-            write_to=buffer,
-        )
-
         if str(args.output).startswith(".."):
             print(
                 "WARNING: Outputs cannot be outside the current workspace.",
@@ -461,6 +728,14 @@ def compile_main(args: argparse.Namespace, runfiles: Runfiles) -> None:
 def main() -> None:
     """The main entrypoint."""
 
+    if WORKER_FLAG in sys.argv[1:]:
+        worker_main(main, sys.argv[0])
+        return
+
+    # Compile in the req-compile daemon, if REQ_COMPILE_DAEMON is set.
+    if run_in_daemon((os.path.abspath(__file__), "main"), sys.argv[1:]):
+        return
+
     runfiles = Runfiles.Create()
     if not runfiles:
         raise EnvironmentError("Failed to locate runfiles.")
@@ -7,7 +7,14 @@ import sys
 from python.runfiles import Runfiles
 
 # pylint: disable-next=import-error
-from private.compiler import compile_main, init_logging, parse_args, rlocation
+from private.compiler import (
+    compile_main,
+    init_logging,
+    parse_args,
+    rlocation,
+    verify_main,
+)
+from req_compile.worker import WORKER_FLAG, worker_main
 
 _WARNING = """\
 
@@ -24,6 +31,10 @@ Please run the following command to update it:
 def main() -> None:
     """The main entrypoint."""
 
+    if WORKER_FLAG in sys.argv[1:]:
+        worker_main(main, sys.argv[0])
+        return
+
     runfiles = Runfiles.Create()
     if not runfiles:
         raise EnvironmentError("Failed to locate runfiles.")
@@ -38,7 +49,10 @@ def main() -> None:
     init_logging(args.verbose)
 
     try:
-        compile_main(args, runfiles)
+        if args.verify:
+            verify_main(args, runfiles)
+        else:
+            compile_main(args, runfiles)
     except SystemExit as exc:
         if exc.code == 1:
             print(
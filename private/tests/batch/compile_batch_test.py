@@ -0,0 +1,90 @@
+"""Test compiling the jobs of a batch manifest with the Bazel compiler."""
+
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+# pylint: disable-next=import-error
+from private.compiler import compile_batch
+
+
+def _write_wheel(directory: Path, name: str, version: str) -> None:
+    """Write a wheel that only holds its metadata."""
+    dist_info = f"{name}-{version}.dist-info"
+    with zipfile.ZipFile(directory / f"{name}-{version}-py3-none-any.whl", "w") as whl:
+        whl.writestr(
+            f"{dist_info}/METADATA",
+            f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n",
+        )
+        whl.writestr(
+            f"{dist_info}/WHEEL",
+            "Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+        )
+        whl.writestr(f"{dist_info}/RECORD", "")
+
+
+class CompileBatchTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cwd = os.getcwd()
+        self.tmp_dir = (
+            tempfile.TemporaryDirectory()
+        )  # pylint: disable=consider-using-with
+        os.chdir(self.tmp_dir.name)
+
+        Path("wheels").mkdir()
+        _write_wheel(Path("wheels"), "first", "1.0")
+        _write_wheel(Path("wheels"), "second", "2.0")
+        Path("first.in").write_text("--find-links wheels\nfirst\n", encoding="utf-8")
+        Path("second.in").write_text("--find-links wheels\nsecond\n", encoding="utf-8")
+        Path("first.txt").write_text("", encoding="utf-8")
+        Path("second.txt").write_text("", encoding="utf-8")
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def _write_manifest(self, options: list) -> Path:
+        manifest = Path("batch.json")
+        manifest.write_text(
+            json.dumps(
+                {
+                    "options": options,
+                    "jobs": [
+                        {"inputs": ["first.in"], "output": "first.txt"},
+                        {
+                            "name": "second",
+                            "inputs": ["second.in"],
+                            "output": "second.txt",
+                            "options": ["--hashes"],
+                        },
+                    ],
+                }
+            ),
+            encoding="utf-8",
+        )
+        return manifest
+
+    def test_writes_outputs(self) -> None:
+        results = compile_batch(self._write_manifest(["--no-index"]))
+
+        self.assertEqual(set(results), {"first.txt", "second"})
+        for result in results.values():
+            self.assertNotIsInstance(result, Exception)
+        first = Path("first.txt").read_text(encoding="utf-8")
+        second = Path("second.txt").read_text(encoding="utf-8")
+        self.assertRegex(first, r"(?m)^first==1\.0 ")
+        self.assertRegex(second, r"(?m)^second==2\.0 ")
+        self.assertIn("--hash=sha256:", second)
+
+    def test_rejects_unsupported_options(self) -> None:
+        manifest = self._write_manifest(["--index-url", "https://example.com/simple"])
+        with self.assertRaisesRegex(ValueError, "--index-url"):
+            compile_batch(manifest)
+        self.assertEqual(Path("first.txt").read_text(encoding="utf-8"), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
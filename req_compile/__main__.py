@@ -3,4 +3,4 @@
 import req_compile.cmdline
 
 if __name__ == "__main__":
-    req_compile.cmdline.compile_main()
+    req_compile.cmdline.main()
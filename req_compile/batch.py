@@ -0,0 +1,246 @@
+"""Compiling many requirement sets in one process.
+
+A batch manifest lists compile jobs, each with its inputs, constraints, output and
+options. Compiling them in one process shares the index page and metadata caches
+between all of them. Within shared_repositories(), the index, find-links and source
+repositories are also built once and used by every job with the same options.
+
+The manifest is a JSON document::
+
+    {
+        "options": ["--index-url", "https://example.com/simple"],
+        "jobs": [
+            {
+                "name": "app",
+                "inputs": ["app/requirements.in"],
+                "constraints": ["constraints.txt"],
+                "output": "app/requirements.txt",
+                "options": ["--hashes"]
+            }
+        ]
+    }
+
+Paths are relative to the working directory, as on the command line. The top-level
+options apply to every job.
+"""
+
+import contextvars
+import io
+import json
+import logging
+import sys
+import threading
+from contextlib import contextmanager
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from req_compile.target import current_target
+from req_compile.utils import KeyedLocks
+
+T = TypeVar("T")
+
+
+class BatchJob(NamedTuple):
+    """One compile of a batch."""
+
+    name: str
+    inputs: List[str]
+    constraints: List[str]
+    output: str
+    options: List[str]
+
+    def argv(self) -> List[str]:
+        """The req-compile arguments of the job."""
+        args = list(self.options) + list(self.inputs)
+        for constraint in self.constraints:
+            args += ["--constraints", constraint]
+        return args
+
+
+def _string_list(value: Any, what: str) -> List[str]:
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{what} must be a list of strings")
+    return value
+
+
+def read_batch_manifest(path: str) -> List[BatchJob]:
+    """Read the jobs of a batch manifest.
+
+    Top-level options are put ahead of each job's own options.
+
+    Raises:
+        ValueError: If the manifest can't be read or is malformed.
+    """
+    try:
+        with open(path, encoding="utf-8") as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError) as ex:
+        raise ValueError(f"Could not read batch manifest {path}: {ex}") from ex
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("jobs"), list):
+        raise ValueError(f"Batch manifest {path} must be an object with a list of jobs")
+
+    common_options = _string_list(manifest.get("options", []), "options")
+    jobs: List[BatchJob] = []
+    names = set()
+    for index, job in enumerate(manifest["jobs"]):
+        if not isinstance(job, dict):
+            raise ValueError(f"Job {index} of {path} must be an object")
+        output = job.get("output")
+        if not isinstance(output, str):
+            raise ValueError(f"Job {index} of {path} has no output")
+        name = job.get("name", output)
+        if name in names:
+            raise ValueError(f"Job name {name} is used twice in {path}")
+        names.add(name)
+        jobs.append(
+            BatchJob(
+                name=name,
+                inputs=_string_list(job.get("inputs", []), f"inputs of job {name}"),
+                constraints=_string_list(
+                    job.get("constraints", []), f"constraints of job {name}"
+                ),
+                output=output,
+                options=common_options
+                + _string_list(job.get("options", []), f"options of job {name}"),
+            )
+        )
+    return jobs
+
+
+# The standard output and standard error of the job running in this context.
+_JOB_OUTPUT: contextvars.ContextVar[Optional[Tuple[IO[str], IO[str]]]] = (
+    contextvars.ContextVar("job_output", default=None)
+)
+# The lowest level of the log records of the job running in this context.
+_JOB_LOG_LEVEL: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "job_log_level", default=None
+)
+
+
+class _RoutedStream(io.TextIOBase):
+    """Writes to the output of the current job, or to the process' stream."""
+
+    def __init__(self, index: int, default: IO[str]) -> None:
+        super().__init__()
+        self._index = index
+        self._default = default
+
+    def _stream(self) -> IO[str]:
+        output = _JOB_OUTPUT.get()
+        return self._default if output is None else output[self._index]
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:  # type: ignore[override]
+        return self._stream().write(text)
+
+    def flush(self) -> None:
+        self._stream().flush()
+
+
+@contextmanager
+def routed_output() -> Iterator[None]:
+    """Route sys.stdout and sys.stderr to the output of the job writing to them.
+
+    Output written outside of job_output() goes to the streams as they were.
+    """
+    saved = sys.stdout, sys.stderr
+    sys.stdout = _RoutedStream(0, saved[0])  # type: ignore[assignment]
+    sys.stderr = _RoutedStream(1, saved[1])  # type: ignore[assignment]
+    try:
+        yield
+    finally:
+        sys.stdout, sys.stderr = saved
+
+
+@contextmanager
+def job_output(
+    stdout: IO[str], stderr: IO[str], log_level: int = logging.CRITICAL
+) -> Iterator[None]:
+    """Send what this context writes to sys.stdout and sys.stderr to a job's output.
+
+    Only takes effect within routed_output(). Threads started by the job write to
+    the process' streams.
+
+    Args:
+        stdout: The job's standard output.
+        stderr: The job's standard error.
+        log_level: The lowest level of the records JobLogFilter lets through in
+            this context.
+    """
+    output_token = _JOB_OUTPUT.set((stdout, stderr))
+    level_token = _JOB_LOG_LEVEL.set(log_level)
+    try:
+        yield
+    finally:
+        _JOB_LOG_LEVEL.reset(level_token)
+        _JOB_OUTPUT.reset(output_token)
+
+
+class JobLogFilter(logging.Filter):
+    """Drop the log records below the log level of the job logging them.
+
+    Records logged outside of job_output() are kept.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        level = _JOB_LOG_LEVEL.get()
+        return level is None or record.levelno >= level
+
+
+_SHARED_REPOS: Optional[Dict[str, Any]] = None
+_SHARED_REPOS_LOCK = threading.Lock()
+_SHARED_REPO_LOCKS = KeyedLocks()
+
+
+@contextmanager
+def shared_repositories() -> Iterator[None]:
+    """Share the repositories built by shared_repository() in this block."""
+    global _SHARED_REPOS  # pylint: disable=global-statement
+    with _SHARED_REPOS_LOCK:
+        outermost = _SHARED_REPOS is None
+        if outermost:
+            _SHARED_REPOS = {}
+    try:
+        yield
+    finally:
+        if outermost:
+            with _SHARED_REPOS_LOCK:
+                _SHARED_REPOS = None
+
+
+def shared_repository(factory: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Build a repository, or reuse the one built with the same arguments.
+
+    Repositories are only reused within shared_repositories(), by compiles for the
+    same target environment. They must not depend on anything else.
+    """
+    shared = _SHARED_REPOS
+    if shared is None:
+        return factory(*args, **kwargs)
+    key = repr(
+        (
+            factory.__module__,
+            factory.__qualname__,
+            args,
+            sorted(kwargs.items()),
+            current_target(),
+        )
+    )
+    with _SHARED_REPO_LOCKS(key):
+        try:
+            return shared[key]
+        except KeyError:
+            repo = shared[key] = factory(*args, **kwargs)
+            return repo
@@ -8,30 +8,43 @@ import os
 import shutil
 import sys
 import tempfile
+import traceback
 import urllib.parse
 import warnings
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from itertools import repeat
 from pathlib import Path
-from typing import IO, Any, Iterable, List, Mapping, Optional, Sequence, Set, Union
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import packaging.requirements
+import packaging.version
 
-import req_compile.compile
 import req_compile.dists
 import req_compile.errors
-import req_compile.metadata
-import req_compile.metadata.metadata
-import req_compile.repos.pypi
 from req_compile import utils
-from req_compile.compile import AllOnlyBinarySet, perform_compile
 from req_compile.config import read_pip_default_index
 from req_compile.containers import DistInfo, RequirementContainer, RequirementsFile
+from req_compile.dists import DependencyNode, DistributionCollection
 from req_compile.errors import NoCandidateException
-from req_compile.repos.findlinks import FindLinksRepository
-from req_compile.repos.multi import MultiRepository, PooledCandidateMultiRepository
-from req_compile.repos.pypi import IndexType, PyPIRepository
+from req_compile.repos.discovery import DISCOVERY_MODES
 from req_compile.repos.repository import (
     CantUseReason,
     DistributionType,
@@ -39,20 +52,19 @@ from req_compile.repos.repository import (
     RepositoryInitializationError,
     sort_candidates,
 )
-from req_compile.repos.solution import (
-    DependencyNode,
-    DistributionCollection,
-    SolutionRepository,
-)
-from req_compile.repos.source import SourceRepository
+from req_compile.target import TargetEnvironment, parse_target, use_target
 from req_compile.utils import (
     NormName,
+    map_concurrently,
     normalize_project_name,
     parse_requirement,
     req_iter_from_lines,
 )
 from req_compile.versions import is_possible
 
+if TYPE_CHECKING:
+    from req_compile.repos.pypi import IndexType
+
 # Blacklist of requirements that will be filtered out of the output
 BLACKLIST: Iterable[str] = []
 
@@ -257,6 +269,9 @@ def _dump_repo_candidates(
         req (str):
         repos (Repository):
     """
+    # pylint: disable=import-outside-toplevel
+    from req_compile.compile import MAX_DOWNGRADE
+
     print("Found the following candidates, none of which will work:", file=sys.stderr)
     for repo in repos:
         candidates = list(repo.get_candidates(req))
@@ -267,7 +282,7 @@ def _dump_repo_candidates(
                 if not req.specifier.contains(candidate.version):
                     continue
                 attempted_versions.add(candidate.version)
-                if len(attempted_versions) > req_compile.compile.MAX_DOWNGRADE:
+                if len(attempted_versions) > MAX_DOWNGRADE:
                     remainder = len(candidates) - num
                     if remainder > 1:
                         print(
@@ -316,8 +331,11 @@ def _create_dist_from_path(path: str) -> RequirementContainer:
     Returns:
         A requirement container to compiling requirements for this path.
     """
+    # pylint: disable=import-outside-toplevel
+    from req_compile.metadata import extract_metadata
+
     try:
-        dist = req_compile.metadata.extract_metadata(path)
+        dist = extract_metadata(path)
     except req_compile.errors.MetadataError:
         dist = None
 
@@ -358,6 +376,9 @@ def _blacklist_filter(req: DependencyNode) -> bool:
 
 
 def _is_not_from_source(dist: DependencyNode) -> bool:
+    # pylint: disable=import-outside-toplevel
+    from req_compile.repos.source import SourceRepository
+
     return (
         dist.metadata is not None
         and dist.metadata.origin is not None
@@ -373,32 +394,53 @@ def _non_source_req_filter(req: DependencyNode) -> bool:
     return _blacklist_filter(req) and not _is_not_from_source(req)
 
 
+def _requirement_filter(
+    repo: Repository, remove_non_source: bool, remove_source: bool
+) -> Callable[[DependencyNode], bool]:
+    """The filter of the requirements to write out of a solution."""
+    if not (remove_source or remove_non_source):
+        return _blacklist_filter
+    # pylint: disable=import-outside-toplevel
+    from req_compile.repos.source import SourceRepository
+
+    if not any(isinstance(r, SourceRepository) for r in repo):
+        raise ValueError("Cannot remove results from source, no source provided.")
+    if remove_non_source:
+        return _non_source_req_filter
+    return _source_req_filter
+
+
 class ExplanationRender:
     def __init__(self, node: DependencyNode, multiline):
         self.node = node
         self.multiline = multiline
 
     def __str__(self):
-        write_to = StringIO()
-        constraints = req_compile.dists.build_explanation(self.node)
+        return _format_explanation(
+            req_compile.dists.build_explanation(self.node), self.multiline
+        )
 
-        if len(constraints) == 1:
-            if self.multiline:
-                write_to.write("via ")
-            write_to.write(f"{next(iter(constraints))}")
-        else:
-            if self.multiline:
-                write_to.write("via\n")
-            for idx, constraint in enumerate(
-                sorted(constraints, key=lambda val: val.lower())
-            ):
-                if self.multiline:
-                    write_to.write("    #   ")
-                write_to.write(constraint)
-                if idx != len(constraints) - 1:
-                    write_to.write("\n" if self.multiline else ", ")
 
-        return write_to.getvalue()
+def _format_explanation(constraints: Collection[str], multiline: bool) -> str:
+    """Format the constraints a requirement was included for as a comment."""
+    write_to = StringIO()
+    if len(constraints) == 1:
+        if multiline:
+            write_to.write("via ")
+        write_to.write(f"{next(iter(constraints))}")
+    else:
+        if multiline:
+            write_to.write("via\n")
+        for idx, constraint in enumerate(
+            sorted(constraints, key=lambda val: val.lower())
+        ):
+            if multiline:
+                write_to.write("    #   ")
+            write_to.write(constraint)
+            if idx != len(constraints) - 1:
+                write_to.write("\n" if multiline else ", ")
+
+    return write_to.getvalue()
 
 
 class DirectiveType(enum.Enum):
@@ -413,12 +455,15 @@ class DirectiveType(enum.Enum):
     FIND_LINKS = 2
     """`--find-links`"""
 
-    def to_index_type(self) -> Optional[IndexType]:
+    def to_index_type(self) -> Optional["IndexType"]:
         """Convert the directive type to a pypi IndexType
 
         Returns:
             None if the current type is not an index type.
         """
+        # pylint: disable=import-outside-toplevel
+        from req_compile.repos.pypi import IndexType
+
         if self == DirectiveType.INDEX_URL:
             return IndexType.INDEX_URL
         elif self == DirectiveType.EXTRA_INDEX_URL:
@@ -449,7 +494,9 @@ def write_requirements_file(
     no_directives: Optional[Union[bool, Sequence[DirectiveType]]] = None,
     hashes: bool = False,
     multiline: bool = True,
-    write_to: IO[str] = sys.stdout,
+    write_to: Optional[IO[str]] = None,
+    lock_to: Optional[IO[str]] = None,
+    all_platform_hashes: bool = False,
 ) -> None:
     """
     Write a text requirements file with various options
@@ -474,20 +521,29 @@ def write_requirements_file(
         hashes: If True, include hashes in the output.
         multiline: If True, output in a multi-line format. If None, allow the format to be
             selected dynamically.
-        write_to (file-like object): Object that implements "write" that takes a string
+        write_to (file-like object): Object that implements "write" that takes a string.
+            Defaults to standard output.
+        lock_to: If given, also write a structured lock of the solution to this output.
+            It is used in place of the requirements file when loading it as a solution,
+            as long as the requirements file is unchanged.
+        all_platform_hashes: If True, include the hashes of the pinned versions' files
+            for every platform, so the solution installs on other machines with
+            --require-hashes. Implies hashes.
     """
+    # pylint: disable=import-outside-toplevel
+    from req_compile.lock import pin_hashes, write_lock_file
+
+    if write_to is None:
+        write_to = sys.stdout
+    hashes = hashes or all_platform_hashes
     if multiline is None and (hashes or urls):
         multiline = True
 
-    req_filter = _blacklist_filter
-    if remove_source or remove_non_source:
-        if not any(isinstance(r, SourceRepository) for r in repo):
-            raise ValueError("Cannot remove results from source, no source provided.")
+    if lock_to is not None:
+        output = write_to
+        write_to = StringIO()
 
-        if remove_non_source:
-            req_filter = _non_source_req_filter
-        else:
-            req_filter = _source_req_filter
+    req_filter = _requirement_filter(repo, remove_non_source, remove_source)
 
     if annotate_source:
         assert (
@@ -533,12 +589,13 @@ def write_requirements_file(
         else:
             pass_one_write_to.write(f"{node.metadata.name}=={node.metadata.version}")
 
-        if hashes and node.metadata.hash:
-            if multiline:
-                pass_one_write_to.write(" \\\n    ")
-            else:
-                pass_one_write_to.write(" ")
-            pass_one_write_to.write(f"--hash={node.metadata.hash}")
+        if hashes:
+            for pin_hash in pin_hashes(node, all_platform_hashes):
+                if multiline:
+                    pass_one_write_to.write(" \\\n    ")
+                else:
+                    pass_one_write_to.write(" ")
+                pass_one_write_to.write(f"--hash={pin_hash}")
 
         if not no_comments:
             comment = StringIO()
@@ -583,20 +640,30 @@ def write_requirements_file(
         solution_and_data = [
             (solution, data) for solution, _, data in solution_none_and_data
         ]
-        if not solution_and_data:
-            return
-
-        max_solution = max(len(solution) for solution, _ in solution_and_data)
-        any_comments = any(data.strip("# ") for _, data, in solution_and_data)
-
-        for solution, data in solution_and_data:
-            if any_comments:
-                write_to.write(solution.ljust(max_solution + 2, " "))
-                write_to.write(data)
-                write_to.write("\n")
-            else:
-                write_to.write(solution)
-                write_to.write("\n")
+        if solution_and_data:
+            max_solution = max(len(solution) for solution, _ in solution_and_data)
+            any_comments = any(data.strip("# ") for _, data, in solution_and_data)
+
+            for solution, data in solution_and_data:
+                if any_comments:
+                    write_to.write(solution.ljust(max_solution + 2, " "))
+                    write_to.write(data)
+                    write_to.write("\n")
+                else:
+                    write_to.write(solution)
+                    write_to.write("\n")
+
+    if lock_to is not None:
+        assert isinstance(write_to, StringIO)
+        solution_text = write_to.getvalue()
+        output.write(solution_text)
+        write_lock_file(
+            results.visit_nodes(roots),
+            solution_text,
+            lock_to,
+            node_filter=req_filter,
+            all_platform_hashes=all_platform_hashes,
+        )
 
 
 def _generate_repo_header(
@@ -650,6 +717,10 @@ def _write_index_directives(
         excludes: Directive types to exclude.
         write_to: Output to write to.
     """
+    # pylint: disable=import-outside-toplevel
+    from req_compile.repos.findlinks import FindLinksRepository
+    from req_compile.repos.pypi import IndexType, PyPIRepository
+
     exclude_index_types = [
         exc.to_index_type() for exc in excludes if exc.to_index_type() is not None
     ]
@@ -682,11 +753,24 @@ def build_repo(
     extra_index_urls: Optional[Iterable[str]] = None,
     no_index: bool = False,
     allow_prerelease: bool = False,
+    lazy_sources: bool = False,
+    source_parallelism: int = 1,
+    source_discovery: str = "walk",
+    lock_file: Optional[str] = None,
 ) -> Repository:
+    # pylint: disable=import-outside-toplevel
+    from req_compile.batch import shared_repository
+    from req_compile.repos.findlinks import FindLinksRepository
+    from req_compile.repos.multi import MultiRepository, PooledCandidateMultiRepository
+    from req_compile.repos.pypi import IndexType, PyPIRepository
+    from req_compile.repos.solution import SolutionRepository
+    from req_compile.repos.source import SourceRepository
+
     pooled_repos: List[Repository] = []
     if find_links:
         pooled_repos.extend(
-            FindLinksRepository(
+            shared_repository(
+                FindLinksRepository,
                 find_link,
                 allow_prerelease=allow_prerelease,
                 relative_to=(
@@ -699,7 +783,8 @@ def build_repo(
         if not index_urls:
             default_index_url = read_pip_default_index() or "https://pypi.org/simple"
             pooled_repos.append(
-                PyPIRepository(
+                shared_repository(
+                    PyPIRepository,
                     default_index_url,
                     wheeldir,
                     allow_prerelease=allow_prerelease,
@@ -708,7 +793,8 @@ def build_repo(
             )
         else:
             pooled_repos.extend(
-                PyPIRepository(
+                shared_repository(
+                    PyPIRepository,
                     index_url,
                     wheeldir,
                     allow_prerelease=allow_prerelease,
@@ -718,7 +804,8 @@ def build_repo(
             )
         if extra_index_urls is not None:
             pooled_repos.extend(
-                PyPIRepository(
+                shared_repository(
+                    PyPIRepository,
                     index_url,
                     wheeldir,
                     allow_prerelease=allow_prerelease,
@@ -729,13 +816,25 @@ def build_repo(
 
     repos: List[Repository] = []
     if solutions:
+        # Solutions are always used first, so they are loaded right away.
         repos.extend(
-            SolutionRepository(solution, excluded_packages=upgrade_packages)
-            for solution in solutions
+            map_concurrently(
+                lambda solution: SolutionRepository(
+                    solution, excluded_packages=upgrade_packages, lock_file=lock_file
+                ),
+                solutions,
+            )
         )
     if sources:
         repos.extend(
-            SourceRepository(source, excluded_paths=excluded_sources)
+            shared_repository(
+                SourceRepository,
+                source,
+                excluded_paths=excluded_sources,
+                parallelism=source_parallelism,
+                lazy=lazy_sources,
+                discovery=source_discovery,
+            )
             for source in sources
         )
 
@@ -775,6 +874,9 @@ class SplitProjectsFilter(argparse.Action):
         option_string: Optional[str] = None,
     ) -> None:
         """Parse the string into a set, checking for special cases."""
+        # pylint: disable=import-outside-toplevel
+        from req_compile.compile import AllOnlyBinarySet
+
         # Set the AllOnlyBinarySet to ensure all projects match the set.
         assert isinstance(values, str)
         if values == ":all:" or not values:
@@ -787,7 +889,27 @@ class SplitProjectsFilter(argparse.Action):
             )
 
 
-def compile_main(raw_args: Optional[Sequence[str]] = None) -> None:
+class CompileResult(NamedTuple):
+    """The solution for one target environment."""
+
+    results: DistributionCollection
+    roots: Set[DependencyNode]
+    repo: Repository
+
+
+class TargetCompileError(Exception):
+    """Compiling for one of the target environments failed."""
+
+    def __init__(
+        self, target: Optional[TargetEnvironment], repo: Repository, parent: Exception
+    ) -> None:
+        super().__init__(str(parent))
+        self.target = target
+        self.repo = repo
+        self.parent = parent
+
+
+def _compile_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Req-Compile: Python requirements compiler"
     )
@@ -824,6 +946,30 @@ def compile_main(raw_args: Optional[Sequence[str]] = None) -> None:
         metavar="package_name",
         help="Package to omit from solutions. Use this to upgrade packages.",
     )
+    group.add_argument(
+        "--incremental",
+        default=False,
+        action="store_true",
+        help="Only resolve again the requirements affected by changes to the inputs "
+        "or by --upgrade-package since the first --solution. The rest of the solution "
+        "is reused without checking it against the repositories.",
+    )
+    group.add_argument(
+        "--verify",
+        default=None,
+        metavar="solution_file",
+        help="Only check that an existing solution satisfies the inputs and "
+        "constraints, using the pins and explanations it records. No repository "
+        "is used. Exits with 1 if the solution is out of date.",
+    )
+    group.add_argument(
+        "--batch",
+        default=None,
+        metavar="manifest_file",
+        help="Compile each job of a JSON batch manifest, concurrently and sharing "
+        "repositories and caches, writing each solution to the job's output. Other "
+        "arguments apply to every job. See req_compile.batch for the format.",
+    )
     group.add_argument(
         "--remove-source",
         default=False,
@@ -892,6 +1038,13 @@ def compile_main(raw_args: Optional[Sequence[str]] = None) -> None:
         action="store_true",
         help="Write hashes of the exact files used during solving to the solution.",
     )
+    group.add_argument(
+        "--all-platform-hashes",
+        action="store_true",
+        help="Write hashes of the files of each pinned version for every platform, "
+        "not only those used during solving. Digests advertised by the index are "
+        "used, files are only downloaded if it has none. Implies --hashes.",
+    )
     group.add_argument(
         "--multiline",
         action="store_true",
@@ -904,6 +1057,15 @@ def compile_main(raw_args: Optional[Sequence[str]] = None) -> None:
         action="store_false",
         help="Force output the solution in a single-line per requirement format.",
     )
+    group.add_argument(
+        "--lock-file",
+        default=None,
+        metavar="lock_file",
+        help="Also write a structured lock of the solution to this file. It is used "
+        "when loading a --solution it was written with. A lock named after the "
+        "solution, e.g. requirements.lock.json for requirements.txt, is used without "
+        "this option.",
+    )
     group.add_argument(
         "--only-binary",
         action=SplitProjectsFilter,
@@ -914,10 +1076,51 @@ def compile_main(raw_args: Optional[Sequence[str]] = None) -> None:
     )
     add_logging_args(parser)
     add_repo_args(parser)
+    add_target_args(parser)
+    return parser
 
-    args = parser.parse_args(args=raw_args)
-    logger = logging.getLogger("req_compile")
 
+def main() -> None:
+    """The entrypoint of the req-compile command.
+
+    Compiles in a running daemon if REQ_COMPILE_DAEMON is set, see
+    req_compile.daemon. The daemon itself is started with `req-compile-daemon`.
+    """
+    # pylint: disable=import-outside-toplevel
+    from req_compile.daemon import run_in_daemon, use_daemon
+
+    argv = sys.argv[1:]
+    if use_daemon():
+        args = _compile_parser().parse_args(args=argv)
+        stdin = None
+        if "-" in argv or (
+            not args.requirement_files and not args.batch and not sys.stdin.isatty()
+        ):
+            stdin = sys.stdin.read()
+        if run_in_daemon(("req_compile.cmdline", "compile_main"), argv, stdin=stdin):
+            return
+        if stdin is not None:
+            sys.stdin = StringIO(stdin)
+    compile_main(argv)
+
+
+def compile_main(raw_args: Optional[Sequence[str]] = None) -> None:
+    args = _compile_parser().parse_args(args=raw_args)
+
+    if args.batch:
+        # Each job of the batch has its own log level, see _batch_main.
+        common_args = list(sys.argv[1:] if raw_args is None else raw_args)
+        for index, arg in enumerate(common_args):
+            if arg == "--batch":
+                del common_args[index : index + 2]
+                break
+            if arg.startswith("--batch="):
+                del common_args[index]
+                break
+        _batch_main(args.batch, common_args)
+        return
+
+    logger = logging.getLogger("req_compile")
     if args.verbose:
         logging.basicConfig(level=logging.DEBUG, stream=sys.stderr)
         logger.setLevel(logging.DEBUG)
@@ -926,11 +1129,29 @@ def compile_main(raw_args: Optional[Sequence[str]] = None) -> None:
     else:
         logging.basicConfig(level=logging.CRITICAL, stream=sys.stderr)
 
+    _compile_args(args)
+
+
+def _compile_args(args: argparse.Namespace, download_dir: Optional[str] = None) -> None:
+    """Compile the requirements given by parsed req-compile arguments.
+
+    Args:
+        args: The parsed arguments.
+        download_dir: Directory to download distributions to if there is no
+            --wheel-dir. Defaults to REQ_COMPILE_DOWNLOAD_DIR, or a temporary
+            directory.
+    """
     wheeldir = args.wheel_dir
+    # Setup requirements are only downloaded to a wheeldir the user asked for.
+    download_setup_reqs = bool(wheeldir)
+    if not wheeldir:
+        # A long-lived process such as the daemon keeps its downloads, so their
+        # metadata stays cached.
+        wheeldir = download_dir or os.environ.get("REQ_COMPILE_DOWNLOAD_DIR")
     if wheeldir:
         try:
             if not os.path.exists(wheeldir):
-                os.mkdir(wheeldir)
+                os.makedirs(wheeldir)
         except OSError:
             pass
         delete_wheeldir = False
@@ -938,6 +1159,34 @@ def compile_main(raw_args: Optional[Sequence[str]] = None) -> None:
         wheeldir = tempfile.mkdtemp()
         delete_wheeldir = True
 
+    try:
+        targets = targets_from_args(args)
+    except ValueError as ex:
+        print(f"ERROR: {ex}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.lock_file and len(targets) > 1:
+        print(
+            "ERROR: --lock-file cannot be used with several --target", file=sys.stderr
+        )
+        sys.exit(1)
+
+    if args.annotate and len(targets) > 1 and not args.target_output_dir:
+        print(
+            "ERROR: --annotate cannot be used with several --target written to one "
+            "file, use --target-output-dir",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    if args.verify and len(targets) > 1:
+        print("ERROR: --verify cannot be used with several --target", file=sys.stderr)
+        sys.exit(1)
+
+    if args.incremental and not args.solutions:
+        print("ERROR: --incremental requires a --solution", file=sys.stderr)
+        sys.exit(1)
+
     input_args = args.requirement_files
     if not input_args:
         # Check to see whether stdin is hooked up to piped data or the console
@@ -1007,95 +1256,498 @@ def compile_main(raw_args: Optional[Sequence[str]] = None) -> None:
             )
             constraint_reqs.append(extra_constraint)
 
-    repo = build_repo(
-        args.solutions,
-        args.upgrade_packages,
-        args.sources,
-        args.excluded_sources,
-        args.find_links,
-        args.index_urls,
-        wheeldir,
-        extra_index_urls=args.extra_index_urls,
-        no_index=args.no_index,
-        allow_prerelease=args.allow_prerelease,
+    if args.verify:
+        _verify_main(args.verify, input_reqs, constraint_reqs, targets[0])
+
+    compiled: List[Tuple[Optional[TargetEnvironment], CompileResult]] = []
+    try:
+        if len(targets) == 1:
+            compiled.append(
+                (
+                    targets[0],
+                    _compile_for_target(
+                        targets[0],
+                        args,
+                        input_reqs,
+                        constraint_reqs,
+                        wheeldir,
+                        download_setup_reqs=download_setup_reqs,
+                    ),
+                )
+            )
+        else:
+            # The targets share the index page and metadata caches, so most of the
+            # network and extraction work is only done once.
+            with ThreadPoolExecutor(
+                max_workers=min(len(targets), os.cpu_count() or 1)
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _compile_for_target,
+                        target,
+                        args,
+                        input_reqs,
+                        constraint_reqs,
+                        wheeldir,
+                        download_setup_reqs=download_setup_reqs,
+                    )
+                    for target in targets
+                ]
+                compiled.extend(
+                    (target, future.result())
+                    for target, future in zip(targets, futures)
+                )
+    except TargetCompileError as ex:
+        with use_target(ex.target):
+            _report_compile_error(ex, args)
+        sys.exit(1)
+    finally:
+        if delete_wheeldir:
+            shutil.rmtree(wheeldir)
+
+    no_directives = ALL_DIRECTIVES if args.no_directives else [DirectiveType.FIND_LINKS]
+    write_args = {
+        "annotate_source": args.annotate,
+        "urls": args.urls,
+        "input_reqs": input_reqs,
+        "remove_non_source": args.remove_non_source,
+        "remove_source": args.remove_source,
+        "no_pins": args.no_pins,
+        "no_comments": args.no_comments,
+        "no_explanations": args.no_explanations,
+        "no_directives": no_directives,
+        "hashes": args.hashes,
+        "all_platform_hashes": args.all_platform_hashes,
+        "multiline": args.multiline,
+    }
+    # Explanations are built from the requirements that apply to each target, so
+    # solutions are written with their target active.
+    if len(compiled) == 1:
+        target, (results, roots, repo) = compiled[0]
+        with use_target(target):
+            if args.lock_file:
+                with open(args.lock_file, "w", encoding="utf-8") as lock_handle:
+                    write_requirements_file(
+                        results, roots, repo=repo, lock_to=lock_handle, **write_args
+                    )
+            else:
+                write_requirements_file(results, roots, repo=repo, **write_args)
+    elif args.target_output_dir:
+        os.makedirs(args.target_output_dir, exist_ok=True)
+        for target, (results, roots, repo) in compiled:
+            assert target is not None
+            output = os.path.join(args.target_output_dir, f"{target.name}.txt")
+            with open(output, "w", encoding="utf-8") as handle, use_target(target):
+                write_requirements_file(
+                    results, roots, repo=repo, write_to=handle, **write_args
+                )
+    else:
+        write_merged_requirements_file(
+            [(target, result) for target, result in compiled if target is not None],
+            urls=args.urls,
+            remove_non_source=args.remove_non_source,
+            remove_source=args.remove_source,
+            no_pins=args.no_pins,
+            no_comments=args.no_comments,
+            no_explanations=args.no_explanations,
+            hashes=args.hashes,
+            no_directives=no_directives,
+            multiline=args.multiline,
+            all_platform_hashes=args.all_platform_hashes,
+        )
+
+
+def _batch_main(manifest: str, common_args: Sequence[str]) -> None:
+    """Compile the jobs of a batch manifest and write their solutions.
+
+    The jobs run concurrently, with their output kept apart. Each job's messages are
+    reported after all of them finished, exiting with 1 if any failed.
+    """
+    # pylint: disable=import-outside-toplevel
+    from req_compile.batch import (
+        BatchJob,
+        JobLogFilter,
+        job_output,
+        read_batch_manifest,
+        routed_output,
+        shared_repositories,
     )
+
     try:
-        results, roots = perform_compile(
-            input_reqs,
-            repo,
-            extras=args.extras,
-            constraint_reqs=constraint_reqs,
-            remove_constraints=args.remove_constraints,
-            only_binary=args.only_binary,
+        jobs = read_batch_manifest(manifest)
+    except ValueError as ex:
+        print(f"ERROR: {ex}", file=sys.stderr)
+        sys.exit(1)
+
+    # Jobs without a --wheel-dir share one download directory, so they can share
+    # their index repositories.
+    download_dir = os.environ.get("REQ_COMPILE_DOWNLOAD_DIR")
+    delete_download_dir = not download_dir
+    if not download_dir:
+        download_dir = tempfile.mkdtemp()
+    logger = logging.getLogger("req_compile")
+
+    def run_job(job: BatchJob) -> Tuple[int, str]:
+        argv = list(common_args) + job.argv()
+        output = StringIO()
+        errors = StringIO()
+        verify = None
+        with job_output(output, errors):
+            try:
+                args = _compile_parser().parse_args(argv)
+                verify = args.verify
+                if args.verbose:
+                    logger.setLevel(logging.DEBUG)
+                with job_output(
+                    output,
+                    errors,
+                    log_level=logging.DEBUG if args.verbose else logging.CRITICAL,
+                ):
+                    _compile_args(args, download_dir=download_dir)
+                exit_code = 0
+            except SystemExit as ex:
+                if ex.code is None or isinstance(ex.code, int):
+                    exit_code = ex.code or 0
+                else:
+                    print(ex.code, file=sys.stderr)
+                    exit_code = 1
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+                exit_code = 1
+        if exit_code == 0 and not verify:
+            with open(job.output, "w", encoding="utf-8") as handle:
+                handle.write(output.getvalue())
+        return exit_code, errors.getvalue()
+
+    saved_level, saved_propagate = logger.level, logger.propagate
+    try:
+        with shared_repositories(), routed_output(), ThreadPoolExecutor(
+            max_workers=max(1, min(len(jobs), os.cpu_count() or 1))
+        ) as executor:
+            # The records of each job go to its own error output, at its own level.
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+            handler.addFilter(JobLogFilter())
+            handler.addFilter(IndentFilter())
+            logger.addHandler(handler)
+            logger.propagate = False
+            try:
+                results = list(executor.map(run_job, jobs))
+            finally:
+                logger.removeHandler(handler)
+    finally:
+        logger.setLevel(saved_level)
+        logger.propagate = saved_propagate
+        if delete_download_dir:
+            shutil.rmtree(download_dir)
+
+    failed = []
+    for job, (exit_code, errors) in zip(jobs, results):
+        if exit_code:
+            failed.append(job.name)
+            print(f"ERROR: Failed to compile {job.name}", file=sys.stderr)
+        elif errors:
+            print(f"{job.name}:", file=sys.stderr)
+        for line in errors.splitlines():
+            print(f"  {line}", file=sys.stderr)
+    if failed:
+        print(
+            "ERROR: {} of {} jobs failed: {}".format(
+                len(failed), len(jobs), ", ".join(failed)
+            ),
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+def _compile_for_target(
+    target: Optional[TargetEnvironment],
+    args: argparse.Namespace,
+    input_reqs: Sequence[RequirementContainer],
+    constraint_reqs: Sequence[RequirementContainer],
+    wheeldir: str,
+    download_setup_reqs: bool = False,
+) -> CompileResult:
+    """Compile the inputs for a target environment.
+
+    Args:
+        target: The environment to compile for, or None for the running interpreter.
+        args: Parsed command line arguments.
+        input_reqs: Requirements to compile.
+        constraint_reqs: Constraints to apply.
+        wheeldir: Directory to download distributions to.
+        download_setup_reqs: Whether to also download the setup requirements of the
+            chosen source distributions to the wheeldir.
+
+    Raises:
+        TargetCompileError: If the inputs could not be compiled.
+    """
+    # pylint: disable=import-outside-toplevel
+    from req_compile.compile import perform_compile
+    from req_compile.repos.solution import SolutionRepository
+
+    logger = logging.getLogger("req_compile")
+    with use_target(target):
+        if target is not None:
+            logger.info("Compiling for %s", target)
+        repo = build_repo(
+            args.solutions,
+            args.upgrade_packages,
+            args.sources,
+            args.excluded_sources,
+            args.find_links,
+            args.index_urls,
+            wheeldir,
+            extra_index_urls=args.extra_index_urls,
+            no_index=args.no_index,
+            allow_prerelease=args.allow_prerelease,
+            lazy_sources=args.lazy_sources,
+            source_parallelism=args.source_parallelism,
+            source_discovery=args.source_discovery,
+            lock_file=args.lock_file,
         )
+        previous_solution = None
+        if args.incremental:
+            previous_solution = next(
+                (
+                    solution_repo
+                    for solution_repo in repo
+                    if isinstance(solution_repo, SolutionRepository)
+                ),
+                None,
+            )
+        try:
+            results, roots = perform_compile(
+                input_reqs,
+                repo,
+                extras=args.extras,
+                constraint_reqs=constraint_reqs,
+                remove_constraints=args.remove_constraints,
+                only_binary=args.only_binary,
+                previous_solution=previous_solution,
+            )
+        except (
+            RepositoryInitializationError,
+            req_compile.errors.NoCandidateException,
+            req_compile.errors.MetadataError,
+        ) as ex:
+            raise TargetCompileError(target, repo, ex)
+
+        if download_setup_reqs:
+            _download_setup_requirements(results, roots, repo)
+    return CompileResult(results, roots, repo)
+
+
+def _verify_main(
+    solution_file: str,
+    input_reqs: Sequence[RequirementContainer],
+    constraint_reqs: Sequence[RequirementContainer],
+    target: Optional[TargetEnvironment],
+) -> None:
+    """Check a solution for a target against the inputs and exit with the result."""
+    # pylint: disable=import-outside-toplevel
+    from req_compile.repos.solution import SolutionRepository
+    from req_compile.verify import verify_solution
+
+    try:
+        solution_repo = SolutionRepository(solution_file)
     except RepositoryInitializationError as ex:
-        logger.exception("Error initialization repository")
-        print("Error initializing {}: {}".format(ex.type.__name__, ex), file=sys.stderr)
+        print(f"ERROR: {ex}", file=sys.stderr)
         sys.exit(1)
-    except req_compile.errors.NoCandidateException as ex:
+
+    with use_target(target):
+        problems = verify_solution(solution_repo, input_reqs, constraint_reqs)
+    for problem in problems:
+        print(f"ERROR: {problem}", file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+def _report_compile_error(error: TargetCompileError, args: argparse.Namespace) -> None:
+    logger = logging.getLogger("req_compile")
+    ex = error.parent
+    if error.target is not None:
+        print(f"Failed to compile for {error.target}", file=sys.stderr)
+    if isinstance(ex, RepositoryInitializationError):
+        logger.error("Error initialization repository", exc_info=ex)
+        print("Error initializing {}: {}".format(ex.type.__name__, ex), file=sys.stderr)
+    elif isinstance(ex, req_compile.errors.NoCandidateException):
         assert ex.results is not None
         _generate_no_candidate_display(
-            ex.req, repo, ex.results, ex, only_binary=args.only_binary
+            ex.req, error.repo, ex.results, ex, only_binary=args.only_binary
         )
-        sys.exit(1)
-    except req_compile.errors.MetadataError as ex:
+    elif isinstance(ex, req_compile.errors.MetadataError):
         assert ex.results is not None
-        _generate_no_candidate_display(parse_requirement(ex.name), repo, ex.results, ex)
-        sys.exit(1)
-    finally:
-        if delete_wheeldir:
-            shutil.rmtree(wheeldir)
+        _generate_no_candidate_display(
+            parse_requirement(ex.name), error.repo, ex.results, ex
+        )
 
-    if not delete_wheeldir:
-        # Download all the setup requires if applicable
-        for node in itertools.chain(results.visit_nodes(roots), roots):
-            if node.metadata is None:
-                continue
 
-            if (
-                node.metadata.candidate is not None
-                and node.metadata.candidate.type
-                not in (
-                    DistributionType.SOURCE,
-                    DistributionType.SDIST,
-                )
-            ):
-                continue
+def _download_setup_requirements(
+    results: DistributionCollection, roots: Set[DependencyNode], repo: Repository
+) -> None:
+    """Download all the setup requires of the chosen source distributions."""
+    # pylint: disable=import-outside-toplevel
+    from req_compile.compile import perform_compile
 
-            logger.info("Downloading setup requirements for %s", node.metadata)
-            # Include wheel automatically if a source dist was selected at all.
-            # This is because pip will attempt to build a wheel for the given
-            # source dist when installing it.
-            setup_meta = DistInfo(
-                node.metadata.name + "-setup",
-                None,
-                reqs=node.metadata.setup_reqs + [parse_requirement("wheel")],
-                meta=True,
+    logger = logging.getLogger("req_compile")
+    for node in itertools.chain(results.visit_nodes(roots), roots):
+        if node.metadata is None:
+            continue
+
+        if (
+            node.metadata.candidate is not None
+            and node.metadata.candidate.type
+            not in (
+                DistributionType.SOURCE,
+                DistributionType.SDIST,
             )
-            # Compiling will cause wheels to be downloaded to the wheeldir.
-            # Note: each can be compiled separately to make sure all of their
-            #  separately required versions of projects are available in the
-            #  output wheeldir.
-            perform_compile([setup_meta], repo)
-
-    write_requirements_file(
-        results,
-        roots,
-        annotate_source=args.annotate,
-        urls=args.urls,
-        input_reqs=input_reqs,
-        repo=repo,
-        remove_non_source=args.remove_non_source,
-        remove_source=args.remove_source,
-        no_pins=args.no_pins,
-        no_comments=args.no_comments,
-        no_explanations=args.no_explanations,
-        no_directives=(
-            ALL_DIRECTIVES if args.no_directives else [DirectiveType.FIND_LINKS]
-        ),
-        hashes=args.hashes,
-        multiline=args.multiline,
-    )
+        ):
+            continue
+
+        logger.info("Downloading setup requirements for %s", node.metadata)
+        # Include wheel automatically if a source dist was selected at all.
+        # This is because pip will attempt to build a wheel for the given
+        # source dist when installing it.
+        setup_meta = DistInfo(
+            node.metadata.name + "-setup",
+            None,
+            reqs=node.metadata.setup_reqs + [parse_requirement("wheel")],
+            meta=True,
+        )
+        # Compiling will cause wheels to be downloaded to the wheeldir.
+        # Note: each can be compiled separately to make sure all of their
+        #  separately required versions of projects are available in the
+        #  output wheeldir.
+        perform_compile([setup_meta], repo)
+
+
+class _MergedPin(NamedTuple):
+    """A pin of the merged solution of several targets."""
+
+    targets: List[TargetEnvironment]
+    hashes: Set[str]
+    constraints: Dict[str, None]
+    links: Dict[str, None]
+
+
+def write_merged_requirements_file(
+    compiled: Sequence[Tuple[TargetEnvironment, CompileResult]],
+    urls: bool = False,
+    remove_non_source: bool = False,
+    remove_source: bool = False,
+    no_pins: bool = False,
+    no_comments: bool = False,
+    no_explanations: bool = False,
+    hashes: bool = False,
+    no_directives: Optional[Sequence[DirectiveType]] = None,
+    multiline: Optional[bool] = True,
+    write_to: Optional[IO[str]] = None,
+    all_platform_hashes: bool = False,
+) -> None:
+    """Write one requirements file covering the solutions of several targets.
+
+    Pins shared by all targets are written as is. Pins that differ are qualified with
+    an environment marker selecting the targets they belong to. The comments of a pin
+    combine what it is required by, and its URLs, on all of its targets.
+
+    Args:
+        compiled: The solution of each target.
+        urls: If True, include URLs that supplied the requirements in the output.
+        remove_non_source: Requirements that don't come from source directories will
+            be omitted.
+        remove_source: Requirements that come from source directories will be
+            omitted.
+        no_pins: If True, omit the solved version from the requirement lines.
+        no_comments: If True, omit the comment containing the reverse dependencies.
+        no_explanations: If True, omit the constraints explanations.
+        hashes: If True, include the hashes of all targets' files for each pin.
+        no_directives: Omit a set of specified directives (`--index-url`, etc).
+        multiline: If True, output in a multi-line format. If None, allow the format
+            to be selected dynamically.
+        write_to: Output to write to. Defaults to standard output.
+        all_platform_hashes: If True, include the hashes of the pinned versions' files
+            for every platform, not only those of the targets. Implies hashes.
+    """
+    # pylint: disable=import-outside-toplevel
+    from req_compile.lock import pin_hashes
+
+    if write_to is None:
+        write_to = sys.stdout
+    hashes = hashes or all_platform_hashes
+    if multiline is None:
+        multiline = hashes or urls
+
+    pins: Dict[Tuple[str, str], _MergedPin] = {}
+    for target, (results, roots, repo) in compiled:
+        req_filter = _requirement_filter(repo, remove_non_source, remove_source)
+        # Explanations are built from the requirements that apply to the target.
+        with use_target(target):
+            for node in results.visit_nodes(roots):
+                if node.metadata is None or node.metadata.meta:
+                    continue
+                if not req_filter(node):
+                    continue
+                line = node.metadata.name
+                if not no_pins:
+                    line += f"=={node.metadata.version}"
+                pin = pins.setdefault(
+                    (node.metadata.name.lower(), line),
+                    _MergedPin([], set(), {}, {}),
+                )
+                pin.targets.append(target)
+                if hashes:
+                    pin.hashes.update(pin_hashes(node, all_platform_hashes))
+                if no_comments:
+                    continue
+                if not no_explanations:
+                    pin.constraints.update(
+                        dict.fromkeys(req_compile.dists.build_explanation(node))
+                    )
+                link = node.metadata.candidate.link
+                if urls and link is not None:
+                    pin.links[urllib.parse.urljoin(link[0], link[1])] = None
+
+    if compiled:
+        _write_index_directives(
+            list(compiled[0][1].repo), no_directives or [], write_to
+        )
+
+    lines = []
+    for (_, line), pin in sorted(pins.items()):
+        if len(pin.targets) != len(compiled):
+            if len(pin.targets) == 1:
+                marker = pin.targets[0].marker()
+            else:
+                marker = " or ".join(f"({target.marker()})" for target in pin.targets)
+            line += f" ; {marker}"
+        hash_lines = [f"--hash={pin_hash}" for pin_hash in sorted(pin.hashes)]
+        comments = list(pin.links)
+        if pin.constraints:
+            comments.insert(0, _format_explanation(pin.constraints, multiline))
+        lines.append((line, hash_lines, comments))
+
+    if multiline:
+        for line, hash_lines, comments in lines:
+            write_to.write(line)
+            for hash_line in hash_lines:
+                write_to.write(f" \\\n    {hash_line}")
+            for comment in comments:
+                write_to.write(f"\n    # {comment}")
+            write_to.write("\n")
+        return
+
+    joined = [
+        (" ".join([line] + hash_lines), comments)
+        for line, hash_lines, comments in lines
+    ]
+    width = max((len(line) for line, comments in joined if comments), default=0) + 2
+    for line, comments in joined:
+        if comments:
+            write_to.write(line.ljust(width, " "))
+            write_to.write("# " + " ".join(comments))
+        else:
+            write_to.write(line)
+        write_to.write("\n")
 
 
 def add_logging_args(parser: argparse.ArgumentParser) -> None:
@@ -1142,6 +1794,30 @@ def add_repo_args(parser: argparse.ArgumentParser) -> None:
         default=[],
         help="Directories to exclude when searching for projects. Applies recursively",
     )
+    group.add_argument(
+        "--lazy-sources",
+        action="store_true",
+        help="Only read the metadata of projects in source directories once they are "
+        "required. Projects are found by the name in their pyproject.toml, setup.cfg "
+        "or setup.py, or else by their directory name.",
+    )
+    group.add_argument(
+        "--source-parallelism",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Number of threads, and of worker processes for projects with a setup.py, "
+        "used to read the projects in source directories.",
+    )
+    group.add_argument(
+        "--source-discovery",
+        choices=DISCOVERY_MODES,
+        default="walk",
+        help="How to find the projects in source directories. 'walk' visits every "
+        "directory. 'git' lists the files git knows about and 'scan' skips what "
+        ".gitignore files ignore. 'auto' uses git in a git working tree, and scans "
+        "otherwise. Default: walk.",
+    )
     group.add_argument(
         "-f",
         "--find-links",
@@ -1185,5 +1861,79 @@ def add_repo_args(parser: argparse.ArgumentParser) -> None:
     )
 
 
+def add_target_args(parser: argparse.ArgumentParser) -> None:
+    """Add arguments describing the environment to compile for"""
+    group = parser.add_argument_group("target environment")
+    group.add_argument(
+        "--target-python",
+        default=None,
+        metavar="version",
+        help="Python version to compile for, e.g. 3.10. Defaults to the running Python",
+    )
+    group.add_argument(
+        "--target-platform",
+        action="append",
+        dest="target_platforms",
+        default=[],
+        metavar="platform_tag",
+        help="Platform tag to compile for, e.g. manylinux_2_28_x86_64, macosx_11_0_arm64 "
+        "or win_amd64. Older compatible tags are implied. Defaults to this platform",
+    )
+    group.add_argument(
+        "--target-abi",
+        action="append",
+        dest="target_abis",
+        default=[],
+        metavar="abi_tag",
+        help="ABI tag supported by the target, e.g. cp310. Defaults to the ABIs "
+        "of the target Python",
+    )
+    group.add_argument(
+        "--target",
+        action="append",
+        dest="targets",
+        default=[],
+        metavar="PYTHON[:PLATFORM[:ABI]]",
+        help="Compile for several targets in parallel, e.g. --target 3.12:win_amd64 "
+        "--target 3.12:manylinux_2_28_x86_64. Unless --target-output-dir is given, "
+        "a single solution with environment markers on differing pins is written",
+    )
+    group.add_argument(
+        "--target-output-dir",
+        default=None,
+        metavar="directory",
+        help="Write one solution per --target to this directory instead",
+    )
+
+
+def target_from_args(args: argparse.Namespace) -> Optional[TargetEnvironment]:
+    """Build the target environment requested on the command line, if any."""
+    if not (args.target_python or args.target_platforms or args.target_abis):
+        return None
+    try:
+        return TargetEnvironment.create(
+            python_version=args.target_python,
+            platforms=args.target_platforms,
+            abis=args.target_abis,
+        )
+    except packaging.version.InvalidVersion as ex:
+        raise ValueError(f"Invalid --target-python: {ex}")
+
+
+def targets_from_args(
+    args: argparse.Namespace,
+) -> List[Optional[TargetEnvironment]]:
+    """All target environments requested on the command line. None stands for
+    the running interpreter."""
+    if not args.targets:
+        return [target_from_args(args)]
+    if args.target_python or args.target_platforms or args.target_abis:
+        raise ValueError(
+            "--target cannot be combined with --target-python, --target-platform "
+            "or --target-abi"
+        )
+    return [parse_target(spec) for spec in args.targets]
+
+
 if __name__ == "__main__":
-    compile_main()
+    main()
@@ -6,7 +6,7 @@ import logging
 import operator
 import os
 from collections import defaultdict
-from typing import Dict, Iterable, Mapping, Optional, Set, Tuple
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
 
 import packaging.requirements
 
@@ -16,9 +16,11 @@ from req_compile.containers import RequirementContainer
 from req_compile.dists import DependencyNode, DistributionCollection
 from req_compile.errors import MetadataError, NoCandidateException
 from req_compile.repos.repository import Repository
+from req_compile.repos.solution import SolutionRepository
 from req_compile.repos.source import SourceRepository
 from req_compile.utils import (
     NormName,
+    cache_stats,
     is_pinned_requirement,
     merge_requirements,
     normalize_project_name,
@@ -310,6 +312,7 @@ def perform_compile(
     allow_circular_dependencies: bool = True,
     only_binary: Optional[Set[NormName]] = None,
     max_downgrade: Optional[int] = None,
+    previous_solution: Optional[SolutionRepository] = None,
 ) -> Tuple[DistributionCollection, Set[DependencyNode]]:
     """Perform a compilation using the given inputs and constraints.
 
@@ -327,12 +330,28 @@ def perform_compile(
         allow_circular_dependencies: Whether to allow circular dependencies
         only_binary: Set of projects that should only consider binary distributions.
         max_downgrade: The maximum number of version downgrades that will be allowed for conflicts.
+        previous_solution: A solution of earlier inputs to compile incrementally from.
+            Only the requirements reachable from inputs that changed since, or from
+            packages excluded from the solution, are resolved again. The rest of
+            the previous solution is reused as is.
 
     Returns:
         the solution and root nodes used to generate it
     """
     results = req_compile.dists.DistributionCollection()
 
+    if previous_solution is not None:
+        input_reqs = list(input_reqs)
+        constraint_reqs = list(constraint_reqs) if constraint_reqs is not None else None
+        if remove_constraints and constraint_reqs:
+            # The previous solution doesn't record the constraints, so changes to
+            # them can't be detected.
+            LOG.info("Constraints are removed from solutions, compiling everything")
+        else:
+            _splice_solution(
+                results, previous_solution, input_reqs + (constraint_reqs or [])
+            )
+
     constraint_nodes = set()
     nodes = set()
     all_pinned = True
@@ -393,9 +412,99 @@ def perform_compile(
         # The same is done in the exception block above
         _add_constraints(all_pinned, constraint_reqs, results)
 
+    LOG.debug("Cache statistics: %s", cache_stats())
     return results, roots
 
 
+def _splice_solution(
+    results: DistributionCollection,
+    previous: SolutionRepository,
+    containers: Iterable[RequirementContainer],
+) -> None:
+    """Add the parts of a previous solution that are unaffected by changed inputs.
+
+    The requirements of the inputs are compared to the root requirements recorded
+    in the previous solution. Everything reachable from a changed, added or removed
+    root, or from a package excluded from the solution, is left out so that it is
+    resolved again.
+
+    Args:
+        results: The solution being built.
+        previous: The previous solution.
+        containers: The inputs and constraints of this compile.
+    """
+    new_roots: Dict[NormName, packaging.requirements.Requirement] = {}
+    changed: Set[NormName] = {
+        normalize_project_name(name) for name in previous.excluded_packages
+    }
+    for container in containers:
+        if not container.meta:
+            # Projects are read from source again and may have changed.
+            changed.add(normalize_project_name(container.name))
+            continue
+        for req in container.requires():
+            name = normalize_project_name(req.name)
+            new_roots[name] = merge_requirements(new_roots.get(name), req)
+
+    for name in set(new_roots) | set(previous.root_reqs):
+        new_req = new_roots.get(name)
+        old_req = previous.root_reqs.get(name)
+        if (
+            new_req is None
+            or old_req is None
+            or set(new_req.specifier) != set(old_req.specifier)
+            or new_req.extras != old_req.extras
+            or str(new_req.marker) != str(old_req.marker)
+        ):
+            changed.add(name)
+
+    solution = previous.solution
+    dirty = set(
+        solution.visit_nodes(
+            [solution.nodes[name] for name in changed if name in solution.nodes]
+        )
+    )
+    dirty.update(solution.nodes[name] for name in changed if name in solution.nodes)
+
+    clean_roots = [
+        solution.nodes[name]
+        for name in new_roots
+        if name not in changed and name in solution.nodes
+    ]
+    clean = (set(solution.visit_nodes(clean_roots)) | set(clean_roots)) - dirty
+
+    # Add dependencies before the nodes depending on them, so each node is complete
+    # as soon as it is added.
+    ordered: List[DependencyNode] = []
+    visited: Set[DependencyNode] = set()
+    for root in sorted(clean):
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                ordered.append(node)
+                continue
+            if node in visited:
+                continue
+            visited.add(node)
+            stack.append((node, True))
+            stack.extend(
+                (dep, False)
+                for dep in sorted(node.dependencies, reverse=True)
+                if dep in clean
+            )
+
+    for node in ordered:
+        assert node.metadata is not None
+        results.add_dist(node.metadata, None, None)
+    LOG.info(
+        "Reusing %d of %d distributions from the previous solution, %d changed",
+        len(ordered),
+        len(solution),
+        len(changed),
+    )
+
+
 def _add_constraints(
     all_pinned: bool,
     constraint_reqs: Optional[Iterable[RequirementContainer]],
@@ -3,12 +3,12 @@ import os
 import sys
 from typing import Iterable, Optional
 
-import appdirs  # type: ignore
-
 CONFIG_BASENAME = "pip.ini" if sys.platform == "win32" else "pip.conf"
 
 
 def _get_config_paths() -> Iterable[str]:
+    import appdirs  # type: ignore  # pylint: disable=import-outside-toplevel
+
     user_dir = appdirs.user_config_dir(
         "pip", appauthor=False, roaming=True  # type: ignore[arg-type]
     )
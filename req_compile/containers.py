@@ -1,46 +1,95 @@
 import itertools
 import os
 from pathlib import Path
-from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import packaging.requirements
 import packaging.version
 from packaging.requirements import InvalidRequirement
 
-from req_compile.utils import reduce_requirements, req_iter_from_file
+from req_compile.markers import evaluate_marker
+from req_compile.target import TargetEnvironment, current_target
+from req_compile.utils import (
+    parse_requirements,
+    parse_version,
+    reduce_requirements,
+    req_iter_from_file,
+)
 
 
 def req_uses_extra(
-    req: packaging.requirements.Requirement, extra: Optional[str]
+    req: packaging.requirements.Requirement,
+    extra: Optional[str],
+    environment: Optional[Mapping[str, str]] = None,
 ) -> bool:
     """Determine if this requirement would be used with the given extra.
 
     If a distribution is requested with one of its extras, this filter will determine
     if the given requirement in its install requirements is provided. All base
     requirements that don't require the extra will also be included.
+
+    Args:
+        req: The requirement to check.
+        extra: The extra being requested, if any.
+        environment: Marker variables of the target environment. Defaults to the
+            running interpreter.
     """
-    if extra and not req.marker:
-        return False
-    keep_req = True
-    if req.marker:
-        extras = {"extra": ""}
-        if extra:
-            extras = {"extra": extra}
-        keep_req = req.marker.evaluate(extras)
-    return keep_req
+    if not req.marker:
+        return not extra
+    return evaluate_marker(req.marker, extra, environment)
 
 
 class RequirementContainer:
-    """A container for a list of requirements."""
+    """A container for a list of requirements.
+
+    Requirements may be given as raw strings, in which case they are only parsed
+    when first used. The requirements applicable to each extra are computed once
+    and memoized, so the container must be modified through ``reqs`` assignment or
+    ``add_requirement``.
+    """
+
+    __slots__ = (
+        "name",
+        "_reqs",
+        "_raw_reqs",
+        "_requires_cache",
+        "setup_reqs",
+        "origin",
+        "meta",
+        "version",
+        "hash",
+        "candidate",
+    )
 
     def __init__(
         self,
         name: str,
         reqs: Iterable[packaging.requirements.Requirement],
         meta: bool = False,
+        raw_reqs: Optional[Iterable[str]] = None,
     ) -> None:
         self.name = name
-        self.reqs = list(reqs) if reqs else []
+        self._reqs: Optional[List[packaging.requirements.Requirement]] = (
+            list(reqs) if reqs else []
+        )
+        self._raw_reqs: Optional[List[str]] = None
+        if raw_reqs is not None:
+            self._reqs = None
+            self._raw_reqs = list(raw_reqs)
+        self._requires_cache: Dict[
+            Tuple[Optional[str], Optional[TargetEnvironment]],
+            List[packaging.requirements.Requirement],
+        ] = {}
         # Store setup requirements for use when populating a wheeldir.
         self.setup_reqs: List[packaging.requirements.Requirement] = []
         self.origin: Any = None
@@ -49,15 +98,64 @@ class RequirementContainer:
         self.hash: Optional[str] = None
         self.candidate: Any = None
 
+    @property
+    def reqs(self) -> List[packaging.requirements.Requirement]:
+        """All requirements of this container, regardless of extras or markers."""
+        if self._reqs is None:
+            assert self._raw_reqs is not None
+            self._reqs = list(parse_requirements(self._raw_reqs))
+            self._raw_reqs = None
+        return self._reqs
+
+    @reqs.setter
+    def reqs(self, reqs: Iterable[packaging.requirements.Requirement]) -> None:
+        self._reqs = list(reqs)
+        self._raw_reqs = None
+        self._requires_cache.clear()
+
+    def add_requirement(self, req: packaging.requirements.Requirement) -> None:
+        """Add a requirement to this container."""
+        self.reqs.append(req)
+        self._requires_cache.clear()
+
+    def __copy__(self) -> "RequirementContainer":
+        """Copy the container. The copy has its own requirement lists and cache."""
+        result = self.__class__.__new__(self.__class__)
+        for cls in type(self).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(self, slot):
+                    setattr(result, slot, getattr(self, slot))
+        if self._reqs is not None:
+            result._reqs = list(self._reqs)
+        result._requires_cache = {}
+        result.setup_reqs = list(self.setup_reqs)
+        return result
+
     def __iter__(self) -> Iterator[packaging.requirements.Requirement]:
         return iter(self.reqs)
 
     def requires(
         self, extra: Optional[str] = None
-    ) -> Iterable[packaging.requirements.Requirement]:
-        return reduce_requirements(
-            req for req in self.reqs if req_uses_extra(req, extra)
+    ) -> List[packaging.requirements.Requirement]:
+        """The reduced requirements that apply when the given extra is requested.
+
+        Environment markers are evaluated for the current target environment.
+        The returned list is shared between calls and must not be modified.
+        """
+        target = current_target()
+        key = (extra, target)
+        try:
+            return self._requires_cache[key]
+        except KeyError:
+            pass
+        environment = target.marker_environment() if target is not None else None
+        result = list(
+            reduce_requirements(
+                req for req in self.reqs if req_uses_extra(req, extra, environment)
+            )
         )
+        self._requires_cache[key] = result
+        return result
 
     def to_definition(
         self, extras: Optional[Iterable[str]]
@@ -91,6 +189,8 @@ def reqs_from_files(
 class RequirementsFile(RequirementContainer):
     """Represents a requirements file - a text file containing a list of requirements"""
 
+    __slots__ = ("parameters",)
+
     def __init__(
         self,
         filename: str,
@@ -132,12 +232,15 @@ class RequirementsFile(RequirementContainer):
 class DistInfo(RequirementContainer):
     """Metadata describing a distribution of a project"""
 
+    __slots__ = ("source",)
+
     def __init__(
         self,
         name: str,
         version: Optional[packaging.version.Version],
         reqs: Iterable[packaging.requirements.Requirement],
         meta: bool = False,
+        raw_reqs: Optional[Iterable[str]] = None,
     ) -> None:
         """
         Args:
@@ -145,8 +248,9 @@ class DistInfo(RequirementContainer):
             version: Parsed version of the project
             reqs: The list of requirements for the project
             meta: Whether or not hte requirement is a meta-requirement
+            raw_reqs: Requirement strings to parse on first use, instead of reqs
         """
-        super(DistInfo, self).__init__(name, reqs, meta=meta)
+        super(DistInfo, self).__init__(name, reqs, meta=meta, raw_reqs=raw_reqs)
         self.version = version
         self.source = None
 
@@ -171,9 +275,36 @@ class DistInfo(RequirementContainer):
         )
 
 
+def metadata_to_dict(metadata: RequirementContainer) -> Dict[str, Any]:
+    """Describe extracted metadata with plain data, e.g. to store it as JSON."""
+    return {
+        "name": metadata.name,
+        "version": str(metadata.version) if metadata.version is not None else None,
+        "reqs": [str(req) for req in metadata.reqs],
+        "setup_reqs": [str(req) for req in metadata.setup_reqs],
+    }
+
+
+def metadata_from_dict(data: Mapping[str, Any]) -> DistInfo:
+    """Recreate metadata described by metadata_to_dict.
+
+    Requirements are only parsed when first used.
+    """
+    metadata = DistInfo(
+        data["name"],
+        parse_version(data["version"]) if data["version"] is not None else None,
+        [],
+        raw_reqs=data["reqs"],
+    )
+    metadata.setup_reqs = list(parse_requirements(data["setup_reqs"]))
+    return metadata
+
+
 class EggInfoDistInfo(DistInfo):
     """Parse metadata from an .egg-info directory."""
 
+    __slots__ = ()
+
     def __init__(self, egg_info_dir: str, project_name: Optional[str] = None) -> None:
         name = project_name or ""
         version: Optional[packaging.version.Version] = None
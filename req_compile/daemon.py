@@ -0,0 +1,696 @@
+"""A long-running process that serves compiles with warm caches.
+
+Each run of req-compile starts a new interpreter, imports its dependencies and begins
+with empty caches: index pages are fetched again, archives are downloaded and have
+their metadata extracted again, and source trees are scanned again. The daemon keeps
+one process alive and runs the compiles sent to it over a Unix domain socket, so all
+of this is shared between them.
+
+A request names an entry point, such as req_compile.cmdline:compile_main, and carries
+the client's arguments, working directory, environment and standard input. The daemon
+runs the entry point as if it were the client and returns what it wrote and its exit
+code. Requests are run one at a time, as they change process-wide state such as the
+working directory.
+
+Clients only use the daemon when REQ_COMPILE_DAEMON is set, and only a daemon
+running the same req-compile code and dependency versions with the same Python
+version on the same platform, as these decide the solutions. Otherwise, or if no daemon is running, they compile in
+their own process.
+
+Requests carry the client's environment, which may hold credentials, so the socket
+is kept in a directory only its user can access. Clients check that the socket and
+its directory belong to them before sending anything, and both ends check the user
+of the process at the other end where the platform tells.
+"""
+
+import argparse
+import contextvars
+import hashlib
+import importlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+LOG = logging.getLogger("req_compile.daemon")
+
+USE_DAEMON_ENV = "REQ_COMPILE_DAEMON"
+SOCKET_ENV = "REQ_COMPILE_DAEMON_SOCKET"
+NO_DAEMON_ENV = "REQ_COMPILE_NO_DAEMON"
+
+# Messages are JSON documents, prefixed with their length.
+_LENGTH = struct.Struct(">I")
+
+# The struct ucred returned for SO_PEERCRED: pid, uid and gid.
+_PEERCRED = struct.Struct("3i")
+
+# An entry point: a module name, or the path of a Python file, and a function in it.
+Entry = Tuple[str, str]
+
+# Distributions whose code takes part in compiling, by the name they are imported as.
+_DEPENDENCIES = ("appdirs", "overrides", "packaging", "requests", "setuptools", "toml")
+
+
+def supported() -> bool:
+    """Whether the daemon can be used on this platform."""
+    return hasattr(socket, "AF_UNIX") and hasattr(os, "getuid")
+
+
+def default_socket_path() -> str:
+    """The socket the daemon listens on, unless told otherwise.
+
+    REQ_COMPILE_DAEMON_SOCKET is used if set. Otherwise the socket is in a directory
+    private to the user: req-compile in XDG_RUNTIME_DIR, or req-compile-<uid> in the
+    temporary directory.
+    """
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        directory = os.path.join(runtime_dir, "req-compile")
+    else:
+        directory = os.path.join(
+            tempfile.gettempdir(), "req-compile-{}".format(os.getuid())
+        )
+    return os.path.join(directory, "daemon.sock")
+
+
+def _private_directory_problem(directory: str) -> Optional[str]:
+    """Why a directory can't hold the socket, or None if only its user can access it."""
+    try:
+        dir_stat = os.stat(directory)
+    except OSError as ex:
+        return str(ex)
+    if not stat.S_ISDIR(dir_stat.st_mode):
+        return f"{directory} is not a directory"
+    if dir_stat.st_uid != os.getuid():
+        return f"{directory} is owned by another user"
+    if dir_stat.st_mode & 0o077:
+        return f"{directory} can be accessed by other users"
+    return None
+
+
+def _socket_problem(socket_path: str) -> Optional[str]:
+    """Why a socket can't be trusted to be this user's daemon, or None if it can."""
+    problem = _private_directory_problem(os.path.dirname(os.path.abspath(socket_path)))
+    if problem is not None:
+        return problem
+    try:
+        socket_stat = os.lstat(socket_path)
+    except OSError as ex:
+        return str(ex)
+    if not stat.S_ISSOCK(socket_stat.st_mode):
+        return f"{socket_path} is not a socket"
+    if socket_stat.st_uid != os.getuid():
+        return f"{socket_path} is owned by another user"
+    return None
+
+
+def _peer_uid(sock: socket.socket) -> Optional[int]:
+    """The user of the process at the other end of a socket, if the platform tells."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _PEERCRED.size)
+    return _PEERCRED.unpack(credentials)[1]
+
+
+def _dependency_version(name: str) -> str:
+    """The installed version of a dependency, without importing it.
+
+    Falls back to where the dependency would be imported from, if it has no
+    distribution metadata, as is the case for some Bazel toolchains.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from importlib import metadata
+
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        pass
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None or spec.origin is None:
+        return "missing"
+    return spec.origin
+
+
+@lru_cache(maxsize=None)
+def code_fingerprint() -> str:
+    """Digest of what decides the solutions: this package's code, the versions of its
+    dependencies and the interpreter."""
+    digest = hashlib.sha256(
+        " ".join(
+            (
+                platform.python_implementation(),
+                platform.python_version(),
+                sys.platform,
+                platform.machine(),
+            )
+        ).encode("utf-8")
+    )
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for root, dirs, files in os.walk(package_dir):
+        dirs[:] = sorted(name for name in dirs if name != "__pycache__")
+        for name in sorted(files):
+            if not name.endswith(".py"):
+                continue
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, package_dir).encode("utf-8"))
+            with open(path, "rb") as handle:
+                digest.update(handle.read())
+    for name in _DEPENDENCIES:
+        digest.update(f"\0{name}=={_dependency_version(name)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _send(sock: socket.socket, message: Dict[str, Any]) -> None:
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _receive(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    header = _receive_exactly(sock, _LENGTH.size)
+    if header is None:
+        return None
+    data = _receive_exactly(sock, _LENGTH.unpack(header)[0])
+    if data is None:
+        return None
+    return json.loads(data.decode("utf-8"))
+
+
+def _connect(socket_path: str) -> Optional[socket.socket]:
+    """Connect to the daemon, if one of this user is listening on the socket."""
+    if not supported() or not os.path.lexists(socket_path):
+        return None
+    problem = _socket_problem(socket_path)
+    if problem is not None:
+        LOG.warning("Not using the daemon socket %s: %s", socket_path, problem)
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        peer_uid = _peer_uid(sock)
+    except OSError:
+        sock.close()
+        return None
+    if peer_uid is not None and peer_uid != os.getuid():
+        LOG.warning(
+            "Not using the daemon socket %s: it is served by another user", socket_path
+        )
+        sock.close()
+        return None
+    return sock
+
+
+def request_daemon(
+    entry: Entry,
+    argv: Sequence[str],
+    stdin: Optional[str] = None,
+    socket_path: Optional[str] = None,
+) -> Optional[Tuple[str, str, int]]:
+    """Run an entry point in the daemon.
+
+    The request carries this process' environment, so it is only sent to a socket
+    that this user owns, in a directory private to them.
+
+    Args:
+        entry: The entry point to run. It is called without arguments, with sys.argv
+            set to the client's program name followed by argv.
+        argv: Command line arguments.
+        stdin: Contents of standard input, if the entry point reads it. Otherwise
+            standard input appears to be a terminal.
+        socket_path: Socket of the daemon. Defaults to default_socket_path().
+
+    Returns:
+        What the entry point wrote to standard output and standard error, and its
+        exit code. None if no compatible daemon is running.
+    """
+    sock = _connect(socket_path or default_socket_path())
+    if sock is None:
+        return None
+    with sock:
+        try:
+            _send(
+                sock,
+                {
+                    "command": "run",
+                    "fingerprint": code_fingerprint(),
+                    "entry": list(entry),
+                    "prog": os.path.basename(sys.argv[0]) if sys.argv else "",
+                    "argv": list(argv),
+                    "cwd": os.getcwd(),
+                    "env": dict(os.environ),
+                    "sys_path": list(sys.path),
+                    "stdin": stdin,
+                },
+            )
+            response = _receive(sock)
+        except (OSError, ValueError) as ex:
+            LOG.debug("Could not use the daemon: %s", ex)
+            return None
+    if response is None or "error" in response:
+        LOG.debug(
+            "Not using the daemon: %s",
+            response["error"] if response else "no response",
+        )
+        return None
+    return response["stdout"], response["stderr"], response["exit_code"]
+
+
+def use_daemon() -> bool:
+    """Whether to send compiles to the daemon.
+
+    The daemon is only used when REQ_COMPILE_DAEMON is set, and never when
+    REQ_COMPILE_NO_DAEMON is, which the daemon sets for the runs it serves.
+    """
+    return bool(os.environ.get(USE_DAEMON_ENV)) and not os.environ.get(NO_DAEMON_ENV)
+
+
+def run_in_daemon(
+    entry: Entry, argv: Sequence[str], stdin: Optional[str] = None
+) -> bool:
+    """Run an entry point in the daemon as if it ran in this process.
+
+    Nothing is done unless use_daemon() is True. The entry point's output is written
+    to this process' standard output and standard error, and a failing exit code is
+    exited with.
+
+    Returns:
+        Whether the daemon ran the entry point. If not, the caller runs it itself.
+    """
+    if not use_daemon():
+        return False
+    result = request_daemon(entry, argv, stdin=stdin)
+    if result is None:
+        return False
+    stdout, stderr, exit_code = result
+    sys.stdout.write(stdout)
+    sys.stdout.flush()
+    sys.stderr.write(stderr)
+    sys.stderr.flush()
+    if exit_code:
+        sys.exit(exit_code)
+    return True
+
+
+class _Input(io.StringIO):
+    """Standard input of a request."""
+
+    def __init__(self, contents: Optional[str]) -> None:
+        super().__init__(contents or "")
+        self._isatty = contents is None
+
+    def isatty(self) -> bool:
+        return self._isatty
+
+
+# Loggers of the process hosting the runs, configured by it.
+_HOST_LOGGERS = ("req_compile.daemon", "req_compile.worker")
+
+
+def _reset_logging() -> None:
+    """Undo the logging configuration of an entry point, such as basicConfig."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(logging.WARNING)
+    for name, logger in list(logging.Logger.manager.loggerDict.items()):
+        if (
+            isinstance(logger, logging.Logger)
+            and name.startswith("req_compile")
+            and name not in _HOST_LOGGERS
+        ):
+            logger.setLevel(logging.NOTSET)
+            for log_filter in list(logger.filters):
+                logger.removeFilter(log_filter)
+
+
+class WarmRunner:
+    """Runs entry points in this process one after another, as if each ran alone.
+
+    Each run gets its own arguments, working directory, environment, standard streams,
+    logging configuration, target environment and HTTP session. The caches of
+    req-compile are kept between runs.
+    """
+
+    def __init__(self, cache_dir: str, page_ttl: float = 300.0) -> None:
+        """Constructor.
+
+        Args:
+            cache_dir: Directory to keep downloads and source tree scans in, unless
+                a run's environment says otherwise.
+            page_ttl: Seconds after which fetched index pages are dropped, so new
+                releases are seen.
+        """
+        self.cache_dir = cache_dir
+        self.page_ttl = page_ttl
+        self._pages_time = time.monotonic()
+
+    def _expire_pages(self) -> None:
+        # pylint: disable-next=import-outside-toplevel
+        from req_compile.repos import pypi
+
+        now = time.monotonic()
+        if now - self._pages_time > self.page_ttl:
+            pypi._PAGES.cache_clear()  # pylint: disable=protected-access
+            pypi._scan_page_links.cache_clear()  # pylint: disable=protected-access
+            self._pages_time = now
+
+    @staticmethod
+    def _close_session() -> None:
+        # Only close a session a run made, without importing requests otherwise.
+        pypi = sys.modules.get("req_compile.repos.pypi")
+        if pypi is not None:
+            pypi.close_shared_session()
+
+    @staticmethod
+    def _call(function: Callable[[], Any]) -> int:
+        try:
+            function()
+        except SystemExit as ex:
+            if ex.code is None:
+                return 0
+            if isinstance(ex.code, int):
+                return ex.code
+            print(ex.code, file=sys.stderr)
+            return 1
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            return 1
+        return 0
+
+    def run(
+        self,
+        function: Callable[[], Any],
+        prog: str,
+        argv: Sequence[str],
+        cwd: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+        stdin: Optional[str] = None,
+        sys_path: Sequence[str] = (),
+    ) -> Tuple[str, str, int]:
+        """Run an entry point.
+
+        Args:
+            function: The entry point. It is called without arguments.
+            prog: Program name, sys.argv[0] during the run.
+            argv: Command line arguments, the rest of sys.argv during the run.
+            cwd: Working directory of the run. Defaults to the current one.
+            env: Environment of the run. Defaults to the current one.
+            stdin: Contents of standard input. If None, standard input appears to be a
+                terminal.
+            sys_path: Entries to add to sys.path during the run.
+
+        Returns:
+            What the entry point wrote to standard output and standard error, and its
+            exit code.
+        """
+        self._expire_pages()
+
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        saved_env = dict(os.environ)
+        saved_cwd = os.getcwd()
+        saved_argv = sys.argv
+        saved_path = list(sys.path)
+        saved_stdin = sys.stdin
+        try:
+            if env is not None:
+                os.environ.clear()
+                os.environ.update(env)
+            os.environ[NO_DAEMON_ENV] = "1"
+            os.environ.setdefault(
+                "REQ_COMPILE_SOURCE_CACHE_DIR", os.path.join(self.cache_dir, "sources")
+            )
+            os.environ.setdefault(
+                "REQ_COMPILE_DOWNLOAD_DIR", os.path.join(self.cache_dir, "downloads")
+            )
+            sys.path.extend(path for path in sys_path if path not in sys.path)
+            sys.argv = [prog] + list(argv)
+            sys.stdin = _Input(stdin)
+            if cwd is not None:
+                os.chdir(cwd)
+            _reset_logging()
+
+            LOG.info("Running %s in %s", " ".join(sys.argv), os.getcwd())
+            start = time.monotonic()
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                # Entry points may set the target environment for the rest of the
+                # context, keep that to this run.
+                exit_code = contextvars.copy_context().run(self._call, function)
+            LOG.info("Finished with %d in %.2fs", exit_code, time.monotonic() - start)
+        finally:
+            self._close_session()
+            _reset_logging()
+            os.chdir(saved_cwd)
+            sys.stdin = saved_stdin
+            sys.path[:] = saved_path
+            sys.argv = saved_argv
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+        return stdout.getvalue(), stderr.getvalue(), exit_code
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Serves requests to run entry points, one at a time."""
+
+    request_queue_size = 64
+
+    def __init__(
+        self, socket_path: str, cache_dir: str, page_ttl: float = 300.0
+    ) -> None:
+        """Constructor.
+
+        Args:
+            socket_path: Socket to listen on. Only the current user can connect. Its
+                directory must be private to the user.
+            cache_dir: Directory to keep downloads and source tree scans in, unless
+                a request's environment says otherwise.
+            page_ttl: Seconds after which fetched index pages are dropped, so new
+                releases are seen.
+        """
+        self.runner = WarmRunner(cache_dir, page_ttl=page_ttl)
+        self._entries: Dict[Tuple[str, str, int], Callable[[], Any]] = {}
+        super().__init__(socket_path, _RequestHandler)
+
+    def server_bind(self) -> None:
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def handle_request_message(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle one request and return the response."""
+        command = request.get("command")
+        if command == "stop":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {}
+        if command != "run":
+            return {"error": f"Unknown command {command!r}"}
+        if request.get("fingerprint") != code_fingerprint():
+            return {"error": "The daemon runs different code or a different Python"}
+
+        sys_path = request["sys_path"]
+        saved_path = list(sys.path)
+        sys.path.extend(path for path in sys_path if path not in sys.path)
+        try:
+            function = self._load_entry(tuple(request["entry"]))
+        except Exception as ex:  # pylint: disable=broad-except
+            return {"error": f"Could not load {request['entry']}: {ex}"}
+        finally:
+            sys.path[:] = saved_path
+
+        stdout, stderr, exit_code = self.runner.run(
+            function,
+            request["prog"],
+            request["argv"],
+            cwd=request["cwd"],
+            env=request["env"],
+            stdin=request.get("stdin"),
+            sys_path=sys_path,
+        )
+        return {"stdout": stdout, "stderr": stderr, "exit_code": exit_code}
+
+    def _load_entry(self, entry: Entry) -> Callable[[], Any]:
+        module_name, function_name = entry
+        if not module_name.endswith(".py"):
+            return getattr(importlib.import_module(module_name), function_name)
+
+        # Scripts are loaded again if they change.
+        key = (module_name, function_name, os.stat(module_name).st_mtime_ns)
+        try:
+            return self._entries[key]
+        except KeyError:
+            pass
+        spec = importlib.util.spec_from_file_location(
+            "_req_compile_daemon_{}".format(
+                hashlib.sha256(module_name.encode("utf-8")).hexdigest()[:16]
+            ),
+            module_name,
+        )
+        assert spec is not None and spec.loader is not None
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        function = self._entries[key] = getattr(module, function_name)
+        return function
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    server: DaemonServer
+
+    def handle(self) -> None:
+        peer_uid = _peer_uid(self.request)
+        if peer_uid is not None and peer_uid != os.getuid():
+            LOG.warning("Refusing a request of user %d", peer_uid)
+            return
+        try:
+            request = _receive(self.request)
+        except (OSError, ValueError) as ex:
+            LOG.warning("Could not read request: %s", ex)
+            return
+        if request is None:
+            return
+        try:
+            _send(self.request, self.server.handle_request_message(request))
+        except OSError as ex:
+            LOG.warning("Could not send response: %s", ex)
+
+
+def stop_daemon(socket_path: Optional[str] = None) -> bool:
+    """Ask a running daemon to exit.
+
+    Returns:
+        Whether a daemon was running.
+    """
+    sock = _connect(socket_path or default_socket_path())
+    if sock is None:
+        return False
+    with sock:
+        _send(sock, {"command": "stop"})
+        _receive(sock)
+    return True
+
+
+def daemon_main(raw_args: Optional[Sequence[str]] = None) -> None:
+    """The entrypoint of the req-compile-daemon command."""
+    parser = argparse.ArgumentParser(
+        prog="req-compile-daemon",
+        description="Serve req-compile runs from one process, keeping its caches warm. "
+        "req-compile sends its compiles to the daemon when REQ_COMPILE_DAEMON is set.",
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Unix domain socket to listen on, in a directory only the current user "
+        "can access. Defaults to REQ_COMPILE_DAEMON_SOCKET, or daemon.sock in a "
+        "req-compile directory of XDG_RUNTIME_DIR or the temporary directory.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory to keep downloads and source tree scans in. By default a "
+        "temporary directory removed when the daemon exits.",
+    )
+    parser.add_argument(
+        "--page-ttl",
+        type=float,
+        default=300.0,
+        metavar="SECONDS",
+        help="Fetch index pages again after this many seconds, to see new releases.",
+    )
+    parser.add_argument(
+        "--stop",
+        action="store_true",
+        help="Stop the running daemon and exit.",
+    )
+    args = parser.parse_args(args=raw_args)
+
+    if not supported():
+        print("ERROR: Unix domain sockets are not supported here", file=sys.stderr)
+        sys.exit(1)
+
+    socket_path = args.socket or default_socket_path()
+
+    if args.stop:
+        if not stop_daemon(socket_path):
+            print(f"ERROR: No daemon is listening on {socket_path}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    try:
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+    except OSError as ex:
+        print(f"ERROR: Could not create {socket_dir}: {ex}", file=sys.stderr)
+        sys.exit(1)
+    problem = _private_directory_problem(socket_dir)
+    if problem is not None:
+        print(f"ERROR: Cannot listen on {socket_path}: {problem}", file=sys.stderr)
+        sys.exit(1)
+
+    sock = _connect(socket_path)
+    if sock is not None:
+        sock.close()
+        print(f"ERROR: A daemon is already listening on {socket_path}", file=sys.stderr)
+        sys.exit(1)
+    if os.path.lexists(socket_path):
+        os.remove(socket_path)
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    LOG.addHandler(handler)
+    LOG.setLevel(logging.INFO)
+    LOG.propagate = False
+
+    # Import everything a compile uses once, up front.
+    importlib.import_module("req_compile.cmdline")
+    code_fingerprint()
+
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="req-compile-daemon-")
+    try:
+        with DaemonServer(socket_path, cache_dir, page_ttl=args.page_ttl) as server:
+            LOG.info("Listening on %s", socket_path)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+    finally:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        if not args.cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    daemon_main()
@@ -9,6 +9,7 @@ from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Union
 import packaging.requirements
 
 from req_compile.containers import RequirementContainer
+from req_compile.markers import compile_marker
 from req_compile.repos import Repository
 from req_compile.utils import (
     NormName,
@@ -27,6 +28,8 @@ class DependencyNode:
     is it resolved to a concrete version sourced from a Repository.
     """
 
+    __slots__ = ("key", "metadata", "dependencies", "reverse_deps", "repo", "complete")
+
     def __init__(self, key: NormName, metadata: Optional[RequirementContainer]) -> None:
         self.key = key
         self.metadata = metadata
@@ -115,22 +118,24 @@ class DependencyNode:
         It is not enough to check if simply all dependencies are complete, because they may
         directly or transitively depend on this node.
         """
-        self_cycle = set()
-        if self.metadata is not None:
-            self_cycle = _get_cycle(self)
-        if not self_cycle:
-            self_cycle = {self}
-
-        cycle_complete = True
-        for node in self_cycle:
-            if node.metadata is None:
-                cycle_complete = False
-                break
-
         old_value = self.complete
-        self.complete = cycle_complete and all(
-            dep.complete for dep in set(self.dependencies) if dep not in self_cycle
-        )
+        if self.metadata is None or any(
+            dep.metadata is None for dep in self.dependencies
+        ):
+            # An unsolved node can't be part of a cycle, so there is no need to
+            # search for one.
+            self.complete = False
+        elif all(dep.complete or dep is self for dep in self.dependencies):
+            # Anything reachable from a complete dependency is solved, including
+            # this node if it is part of a cycle.
+            self.complete = True
+        else:
+            self_cycle = _get_cycle(self) or {self}
+            self.complete = all(
+                node.metadata is not None for node in self_cycle
+            ) and all(
+                dep.complete for dep in set(self.dependencies) if dep not in self_cycle
+            )
         if old_value == self.complete:
             return
 
@@ -206,13 +211,7 @@ def _process_constraint_req(
     extras: Set[str] = set()
     # Determine which extras, if any, were the reason this req was included.
     if req.marker:
-        for marker in req.marker._markers:  # pylint: disable=protected-access
-            if (
-                isinstance(marker, tuple)
-                and marker[0].value == "extra"
-                and marker[1].value == "=="
-            ):
-                extras.add(marker[2].value.strip().lower())
+        extras = set(compile_marker(req.marker).extras)
     source = node.metadata.name + (
         ("[" + ",".join(sorted(extras)) + "]") if extras else ""
     )
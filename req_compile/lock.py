@@ -0,0 +1,151 @@
+"""Structured lock files written alongside solutions.
+
+A solution's dependency graph can be rebuilt from its "via" explanations, but that
+means parsing comments line by line. A lock file records the same solution
+explicitly: every pin with its hashes, URL and origin, and every edge with the
+requirement that caused it. The lock stores a digest of the
+solution it was written with, so it is only used while the two agree.
+"""
+
+import hashlib
+import json
+import urllib.parse
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, List, Optional, Union
+
+from req_compile.dists import DependencyNode
+
+LOCK_FORMAT_VERSION = 1
+
+
+def lock_file_path(solution: Union[str, Path]) -> Path:
+    """The path of the lock file belonging to a solution file.
+
+    For example, the lock of requirements.txt is requirements.lock.json.
+    """
+    return Path(solution).with_suffix(".lock.json")
+
+
+def solution_digest(text: str) -> str:
+    """Digest of a solution's contents, recorded in its lock file."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pin_hashes(node: DependencyNode, all_platforms: bool = False) -> List[str]:
+    """The hashes to record for a pin.
+
+    Args:
+        node: The pinned node.
+        all_platforms: If True, also include the hashes of the pinned version's files
+            for every other platform, as its repository knows them.
+
+    Returns:
+        The hash of the file that was solved with first, followed by any others.
+    """
+    assert node.metadata is not None
+    hashes = [node.metadata.hash] if node.metadata.hash else []
+    if all_platforms and node.metadata.origin is not None:
+        for dist_hash in node.metadata.origin.get_hashes(
+            node.metadata.name, node.metadata.version
+        ):
+            if dist_hash not in hashes:
+                hashes.append(dist_hash)
+    return hashes
+
+
+def write_lock_file(
+    nodes: Iterable[DependencyNode],
+    solution_text: str,
+    write_to: IO[str],
+    node_filter: Optional[Callable[[DependencyNode], bool]] = None,
+    all_platform_hashes: bool = False,
+) -> None:
+    """Write the lock file of a solution.
+
+    Args:
+        nodes: The nodes of the solution, as written to the solution file.
+        solution_text: The contents of the solution file.
+        write_to: Output to write to.
+        node_filter: Nodes for which this returns False are left out, as they
+            were from the solution file.
+        all_platform_hashes: If True, record the hashes of the pinned versions' files
+            for every platform, not only the file that was solved with.
+    """
+    pinned = {
+        node
+        for node in nodes
+        if node.metadata is not None
+        and not node.metadata.meta
+        and (node_filter is None or node_filter(node))
+    }
+
+    entries: Dict[str, Dict[str, Any]] = {}
+    for node in sorted(pinned):
+        assert node.metadata is not None
+        url = None
+        link = node.metadata.candidate.link if node.metadata.candidate else None
+        if link is not None and link[1] is not None:
+            url = urllib.parse.urljoin(link[0] or "", link[1])
+
+        via = []
+        for reverse_dep in sorted(node.reverse_deps):
+            if reverse_dep.metadata is None:
+                continue
+            reason = reverse_dep.dependencies.get(node)
+            via.append(
+                {
+                    "source": reverse_dep.metadata.name,
+                    "requirement": (
+                        str(reason) if reason is not None else node.metadata.name
+                    ),
+                }
+            )
+
+        entries[node.key] = {
+            "name": node.metadata.name,
+            "version": str(node.metadata.version),
+            "hashes": pin_hashes(node, all_platform_hashes),
+            "url": url,
+            "origin": (
+                repr(node.metadata.origin) if node.metadata.origin is not None else None
+            ),
+            "via": via,
+        }
+
+    json.dump(
+        {
+            "version": LOCK_FORMAT_VERSION,
+            "solution_sha256": solution_digest(solution_text),
+            "nodes": entries,
+        },
+        write_to,
+        indent=2,
+        sort_keys=True,
+    )
+    write_to.write("\n")
+
+
+def read_lock_file(
+    path: Union[str, Path], solution_text: str
+) -> Optional[Dict[str, Any]]:
+    """Read the lock file of a solution, if it matches the solution.
+
+    Args:
+        path: Path of the lock file.
+        solution_text: The current contents of the solution file.
+
+    Returns:
+        The lock, or None if there is no usable lock for this solution.
+    """
+    try:
+        with open(path, encoding="utf-8") as handle:
+            lock = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(lock, dict)
+        or lock.get("version") != LOCK_FORMAT_VERSION
+        or lock.get("solution_sha256") != solution_digest(solution_text)
+    ):
+        return None
+    return lock
@@ -0,0 +1,157 @@
+"""Cached evaluation of environment markers.
+
+Evaluating a marker with packaging rebuilds the default environment and walks the
+marker's syntax tree on every call. Requirements are evaluated against the same
+handful of extras over and over while compiling, so each distinct marker is compiled
+once into a CompiledMarker that memoizes its results.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Hashable, Mapping, Optional, Set, Tuple
+
+import packaging.markers
+from packaging.utils import canonicalize_name
+
+# Upper bound of distinct marker strings to keep compiled.
+MARKER_CACHE_SIZE = 8192
+
+
+class CompiledMarker:
+    """A marker with memoized evaluation results.
+
+    Extras that a marker does not compare against all evaluate the same as no extra
+    at all, so they share a single cached result. A marker that only tests extras
+    is reduced to a set membership check.
+    """
+
+    __slots__ = ("marker", "extras", "_extra_values", "_only_extras", "_results")
+
+    def __init__(self, marker: packaging.markers.Marker) -> None:
+        self.marker = marker
+        syntax = marker._markers  # pylint: disable=protected-access
+        equal_extras: Set[str] = set()
+        all_extras: Set[str] = set()
+        normalizable, only_extras = _collect_extras(syntax, equal_extras, all_extras)
+
+        self.extras: FrozenSet[str] = frozenset(equal_extras)
+        """Extras this marker compares for equality."""
+
+        # If extras are used in ways other than plain comparisons, results can't be
+        # shared between extras, so every extra must be evaluated on its own.
+        self._extra_values: Optional[FrozenSet[str]] = (
+            frozenset(all_extras) if normalizable else None
+        )
+        # Markers like `extra == "a" or extra == "b"` need no environment at all.
+        self._only_extras = (
+            only_extras
+            and normalizable
+            and all(item == "or" for item in syntax if not isinstance(item, tuple))
+        )
+        self._results: Dict[Tuple[str, Hashable], bool] = {}
+
+    def __call__(
+        self,
+        extra: Optional[str] = None,
+        environment: Optional[Mapping[str, str]] = None,
+    ) -> bool:
+        """Evaluate the marker.
+
+        Args:
+            extra: The extra being requested, if any.
+            environment: Marker variables overriding the current interpreter's.
+        """
+        extra = canonicalize_name(extra) if extra else ""
+        if self._extra_values is not None and extra not in self._extra_values:
+            extra = ""
+
+        if self._only_extras:
+            return extra in self.extras
+
+        env_key: Hashable = None
+        if environment is not None:
+            env_key = tuple(sorted(environment.items()))
+        key = (extra, env_key)
+        try:
+            return self._results[key]
+        except KeyError:
+            pass
+
+        env: Dict[str, str] = dict(environment) if environment is not None else {}
+        env["extra"] = extra
+        result = self.marker.evaluate(env)
+        self._results[key] = result
+        return result
+
+
+def _collect_extras(
+    markers: Any, equal_extras: Set[str], all_extras: Set[str]
+) -> Tuple[bool, bool]:
+    """Gather the extras a marker's syntax tree compares against.
+
+    Returns:
+        Whether all uses of "extra" are == or != comparisons with a literal, and whether
+            every comparison in the tree is against "extra".
+    """
+    normalizable = True
+    only_extras = True
+    for item in markers:
+        if isinstance(item, list):
+            inner_normalizable, inner_only_extras = _collect_extras(
+                item, equal_extras, all_extras
+            )
+            normalizable = normalizable and inner_normalizable
+            only_extras = only_extras and inner_only_extras
+        elif isinstance(item, tuple):
+            lhs, oper, rhs = item
+            if isinstance(lhs, packaging.markers.Variable) and lhs.value == "extra":
+                value = rhs
+            elif isinstance(rhs, packaging.markers.Variable) and rhs.value == "extra":
+                value = lhs
+            else:
+                only_extras = False
+                continue
+
+            if oper.value not in ("==", "!=") or isinstance(
+                value, packaging.markers.Variable
+            ):
+                normalizable = False
+                only_extras = False
+                continue
+            # Normalized the same as the extra the marker is evaluated with.
+            extra = canonicalize_name(value.value)
+            all_extras.add(extra)
+            if oper.value == "==":
+                equal_extras.add(extra)
+            else:
+                only_extras = False
+    return normalizable, only_extras
+
+
+@lru_cache(maxsize=MARKER_CACHE_SIZE)
+def _compile_marker_text(text: str) -> CompiledMarker:
+    return CompiledMarker(packaging.markers.Marker(text))
+
+
+def compile_marker(marker: packaging.markers.Marker) -> CompiledMarker:
+    """Fetch the compiled form of a marker, shared by all markers with the same text."""
+    return _compile_marker_text(str(marker))
+
+
+def marker_cache_info() -> Any:
+    """Statistics of the compiled marker cache, as functools' cache_info()."""
+    return _compile_marker_text.cache_info()
+
+
+def evaluate_marker(
+    marker: packaging.markers.Marker,
+    extra: Optional[str] = None,
+    environment: Optional[Mapping[str, str]] = None,
+) -> bool:
+    """Evaluate a marker, reusing the result of earlier identical evaluations.
+
+    Args:
+        marker: The marker to evaluate.
+        extra: The extra being requested, if any.
+        environment: Marker variables overriding the current interpreter's.
+    """
+    return compile_marker(marker)(extra, environment)
@@ -1,9 +1,11 @@
 import logging
+import mmap
 import os
-import re
+import struct
 import zipfile
+import zlib
 from contextlib import closing
-from typing import Iterable, Optional
+from typing import Iterable, NamedTuple, Optional, Tuple, Union
 
 from req_compile import utils
 from req_compile.containers import DistInfo
@@ -12,6 +14,37 @@ from req_compile.errors import MetadataError
 LOG = logging.getLogger("req_compile.metadata.dist_info")
 
 
+_METADATA_SUFFIX = ".dist-info/METADATA"
+
+# Zip structures, per the PKWARE APPNOTE.
+_EOCD = struct.Struct("<4sHHHHLLH")
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_EOCD64_LOCATOR = struct.Struct("<4sLQL")
+_EOCD64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_EOCD64 = struct.Struct("<4sQHHLLQQQQ")
+_EOCD64_SIGNATURE = b"PK\x06\x06"
+_CENTRAL_DIR = struct.Struct("<4sHHHHHHLLLHHHHHLL")
+_CENTRAL_DIR_SIGNATURE = b"PK\x01\x02"
+_LOCAL_HEADER = struct.Struct("<4sHHHHHLLLHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_ZIP64_EXTRA_ID = 0x0001
+_MAX_COMMENT = 0xFFFF
+_MAX_NAME = 0xFFFF
+
+# Number of METADATA entries inspected searching backwards, before walking the whole
+# central directory instead. Only wheels vendoring many other dist-infos reach it.
+_MAX_BACKWARD_MATCHES = 16
+
+
+def _is_project_dist_info(project_name: str, info: str) -> bool:
+    """Whether a zip path is the METADATA of a dist-info directory named for the project"""
+    dist_info_dir = info[: -len(_METADATA_SUFFIX)].rpartition("/")[2]
+    return (
+        dist_info_dir.startswith(project_name + "-")
+        and len(dist_info_dir) > len(project_name) + 1
+    )
+
+
 def _find_dist_info_metadata(
     project_name: str, namelist: Iterable[str]
 ) -> Optional[str]:
@@ -25,21 +58,226 @@ def _find_dist_info_metadata(
     Returns:
         (str) The best zip path that matches this project
     """
-    for best_match in (
-        r"^(.+/)?{}-.+\.dist-info/METADATA$".format(project_name),
-        r"^.*\.dist-info/METADATA",
+    best_effort = None
+    for info in namelist:
+        if not info.endswith(_METADATA_SUFFIX):
+            continue
+        if _is_project_dist_info(project_name, info):
+            LOG.debug("Found dist-info in the zip: %s", info)
+            return info
+        if best_effort is None:
+            best_effort = info
+
+    if best_effort is not None:
+        LOG.debug("Found dist-info in the zip: %s (best effort)", best_effort)
+    return best_effort
+
+
+class _CentralDirectory(NamedTuple):
+    """Location of a zip's central directory within a mapped file"""
+
+    start: int
+    end: int
+    # Number of bytes prepended to the archive, e.g. for self-extracting zips.
+    prefix: int
+
+
+def _locate_central_directory(data: mmap.mmap) -> _CentralDirectory:
+    """Find the central directory by reading the end of central directory record(s)"""
+    eocd_pos = data.rfind(
+        _EOCD_SIGNATURE, max(0, len(data) - _EOCD.size - _MAX_COMMENT)
+    )
+    if eocd_pos == -1 or eocd_pos + _EOCD.size > len(data):
+        raise zipfile.BadZipFile("File is not a zip file")
+    _, _, _, _, _, cd_size, cd_offset, _ = _EOCD.unpack_from(data, eocd_pos)
+    record_pos = eocd_pos
+
+    locator_pos = eocd_pos - _EOCD64_LOCATOR.size
+    if (
+        locator_pos >= 0
+        and data[locator_pos : locator_pos + 4] == _EOCD64_LOCATOR_SIGNATURE
     ):
-        for info in namelist:
-            if re.match(best_match, info):
-                LOG.debug(
-                    "Found dist-info in the zip: %s (with regex %s)", info, best_match
+        eocd64_pos = locator_pos - _EOCD64.size
+        if eocd64_pos < 0 or data[eocd64_pos : eocd64_pos + 4] != _EOCD64_SIGNATURE:
+            raise zipfile.BadZipFile("Corrupt zip64 end of central directory")
+        _, _, _, _, _, _, _, _, cd_size, cd_offset = _EOCD64.unpack_from(
+            data, eocd64_pos
+        )
+        record_pos = eocd64_pos
+
+    prefix = record_pos - cd_size - cd_offset
+    if prefix < 0:
+        raise zipfile.BadZipFile("Bad central directory size or offset")
+    return _CentralDirectory(prefix + cd_offset, record_pos, prefix)
+
+
+def _find_metadata_entry(
+    data: mmap.mmap, central_dir: _CentralDirectory, project_name: str
+) -> Optional[Tuple[str, int]]:
+    """Search the central directory backwards for the dist-info METADATA entry.
+
+    Metadata is written at the end of a wheel, so searching from the end of the
+    central directory usually finds it after inspecting a single entry. If it isn't
+    found among the last few METADATA entries, the central directory is walked from
+    the start instead, so the search never takes more than linear time.
+
+    Returns:
+        The name of the entry and the position of its central directory header
+    """
+    suffix = _METADATA_SUFFIX.encode("ascii")
+    best_effort = None
+    search_end = central_dir.end
+    for _ in range(_MAX_BACKWARD_MATCHES):
+        suffix_pos = data.rfind(suffix, central_dir.start, search_end)
+        if suffix_pos == -1:
+            break
+        search_end = suffix_pos
+        name_end = suffix_pos + len(suffix)
+
+        # Walk back to the header owning this filename, if there is one. It can't
+        # be further back than the longest filename a header can hold.
+        window_start = max(central_dir.start, name_end - _CENTRAL_DIR.size - _MAX_NAME)
+        header_pos = data.rfind(_CENTRAL_DIR_SIGNATURE, window_start, suffix_pos)
+        while header_pos != -1:
+            name_len = _CENTRAL_DIR.unpack_from(data, header_pos)[10]
+            if header_pos + _CENTRAL_DIR.size + name_len == name_end:
+                break
+            header_pos = data.rfind(_CENTRAL_DIR_SIGNATURE, window_start, header_pos)
+        if header_pos == -1:
+            continue
+
+        info = data[header_pos + _CENTRAL_DIR.size : name_end].decode(
+            "utf-8", "replace"
+        )
+        if _is_project_dist_info(project_name, info):
+            LOG.debug("Found dist-info in the zip: %s", info)
+            return info, header_pos
+        if best_effort is None:
+            best_effort = info, header_pos
+    else:
+        return _walk_metadata_entries(data, central_dir, project_name)
+
+    if best_effort is not None:
+        LOG.debug("Found dist-info in the zip: %s (best effort)", best_effort[0])
+    return best_effort
+
+
+def _walk_metadata_entries(
+    data: mmap.mmap, central_dir: _CentralDirectory, project_name: str
+) -> Optional[Tuple[str, int]]:
+    """Walk the central directory forwards, header by header, for the METADATA entry.
+
+    Returns:
+        The name of the entry and the position of its central directory header
+    """
+    names = {}
+    header_pos = central_dir.start
+    while header_pos + _CENTRAL_DIR.size <= central_dir.end:
+        header = _CENTRAL_DIR.unpack_from(data, header_pos)
+        if header[0] != _CENTRAL_DIR_SIGNATURE:
+            raise zipfile.BadZipFile("Bad magic number for central directory")
+        name_len, extra_len, comment_len = header[10:13]
+        name_pos = header_pos + _CENTRAL_DIR.size
+        info = data[name_pos : name_pos + name_len].decode("utf-8", "replace")
+        if info.endswith(_METADATA_SUFFIX):
+            names[info] = header_pos
+        header_pos = name_pos + name_len + extra_len + comment_len
+
+    metadata_name = _find_dist_info_metadata(project_name, names)
+    if metadata_name is None:
+        return None
+    return metadata_name, names[metadata_name]
+
+
+def _read_member(
+    data: mmap.mmap, central_dir: _CentralDirectory, header_pos: int
+) -> Optional[bytes]:
+    """Read and inflate a single member given its central directory header.
+
+    Returns:
+        The contents of the member, or None if it is stored in a way this reader
+        does not handle.
+    """
+    header = _CENTRAL_DIR.unpack_from(data, header_pos)
+    flags, compression = header[3:5]
+    compressed_size, uncompressed_size, name_len, extra_len = header[8:12]
+    local_offset = header[16]
+    if flags & 0x1:
+        # Encrypted
+        return None
+
+    sizes = [uncompressed_size, compressed_size, local_offset]
+    if 0xFFFFFFFF in sizes:
+        extra_pos = header_pos + _CENTRAL_DIR.size + name_len
+        extra_end = extra_pos + extra_len
+        while extra_pos + 4 <= extra_end:
+            extra_id, size = struct.unpack_from("<HH", data, extra_pos)
+            if extra_id == _ZIP64_EXTRA_ID:
+                # Only the fields saturated in the header are present, in order.
+                values = iter(
+                    struct.unpack_from("<{}Q".format(size // 8), data, extra_pos + 4)
                 )
-                return info
+                sizes = [
+                    next(values, field) if field == 0xFFFFFFFF else field
+                    for field in sizes
+                ]
+                break
+            extra_pos += 4 + size
+        _, compressed_size, local_offset = sizes
+
+    local_pos = central_dir.prefix + local_offset
+    if data[local_pos : local_pos + 4] != _LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile("Bad magic number for file header")
+    local_name_len, local_extra_len = _LOCAL_HEADER.unpack_from(data, local_pos)[9:]
+    data_pos = local_pos + _LOCAL_HEADER.size + local_name_len + local_extra_len
+    raw = data[data_pos : data_pos + compressed_size]
 
+    if compression == zipfile.ZIP_STORED:
+        return raw
+    if compression == zipfile.ZIP_DEFLATED:
+        return zlib.decompress(raw, -zlib.MAX_WBITS)
     return None
 
 
-def _fetch_from_wheel(wheel: str) -> Optional[DistInfo]:
+def _read_wheel_metadata(wheel: Union[str, "os.PathLike[str]"]) -> Optional[bytes]:
+    """Read the METADATA from a wheel without loading its full listing.
+
+    The wheel is memory mapped and its central directory is searched from the end,
+    so only the METADATA entry is parsed and inflated.
+
+    Raises:
+        zipfile.BadZipFile if the wheel is not a valid zip file.
+
+    Returns:
+        The raw METADATA contents, or None if the wheel has none.
+    """
+    project_name = os.path.basename(wheel).split("-")[0]
+    with open(wheel, "rb") as handle:
+        try:
+            data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as ex:
+            # Empty files cannot be mapped
+            raise zipfile.BadZipFile(str(ex)) from ex
+
+    with closing(data):
+        try:
+            central_dir = _locate_central_directory(data)
+            entry = _find_metadata_entry(data, central_dir, project_name)
+            if entry is None:
+                return None
+            info, header_pos = entry
+            contents = _read_member(data, central_dir, header_pos)
+        except (struct.error, zlib.error) as ex:
+            raise zipfile.BadZipFile(str(ex)) from ex
+
+    if contents is None:
+        LOG.debug("Falling back to zipfile to read %s", info)
+        with zipfile.ZipFile(wheel, "r") as zfile:
+            contents = zfile.read(info)
+    return contents
+
+
+def _fetch_from_wheel(wheel: Union[str, "os.PathLike[str]"]) -> Optional[DistInfo]:
     """
     Fetch metadata from a wheel file
     Args:
@@ -48,21 +286,10 @@ def _fetch_from_wheel(wheel: str) -> Optional[DistInfo]:
     Returns:
         (DistInfo, None) The metadata for this zip, or None if it could not be found or parsed
     """
-    project_name = os.path.basename(wheel).split("-")[0]
-
-    result = None
-    zfile = None
     try:
-        zfile = zipfile.ZipFile(wheel, "r")
-        with closing(zfile):
-            # Reverse since metadata details are supposed to be written at the end of the zip
-            infos = list(reversed(zfile.namelist()))
-            result = _find_dist_info_metadata(project_name, infos)
-
-            if result is not None:
-                return _parse_flat_metadata(
-                    zfile.read(result).decode("utf-8", "ignore")
-                )
+        contents = _read_wheel_metadata(wheel)
+        if contents is not None:
+            return _parse_flat_metadata(contents.decode("utf-8", "ignore"))
         LOG.warning("Could not find .dist-info/METADATA in the zip archive")
     except zipfile.BadZipfile as ex:
         LOG.warning("Bad zip file: %s", ex)
@@ -87,4 +314,4 @@ def _parse_flat_metadata(contents: str) -> DistInfo:
         raise MetadataError(
             "unknown", version, ValueError("Missing name metadata for package")
         )
-    return DistInfo(name, version, list(utils.parse_requirements(raw_reqs)))
+    return DistInfo(name, version, [], raw_reqs=raw_reqs)
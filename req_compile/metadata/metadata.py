@@ -1,3 +1,4 @@
+import copy
 import functools
 import logging
 import os
@@ -10,7 +11,7 @@ from req_compile.containers import RequirementContainer
 from req_compile.errors import MetadataError
 from req_compile.repos.repository import Repository
 
-from ..utils import parse_version
+from ..utils import InternTable, KeyedLocks, parse_version
 from .dist_info import _fetch_from_wheel
 from .extractor import NonExtractor, TarExtractor, ZipExtractor
 from .pyproject import fetch_from_pyproject
@@ -19,11 +20,22 @@ from .source import _fetch_from_source
 LOG = logging.getLogger("req_compile.metadata")
 
 
+# Metadata of distribution archives, shared by all repositories and compiles in this
+# process. Keyed on the archive's path, size and modification time.
+ARCHIVE_METADATA = InternTable(
+    int(os.environ.get("REQ_COMPILE_METADATA_CACHE_SIZE", "4096"))
+)
+_ARCHIVE_LOCKS = KeyedLocks()
+
+
 def extract_metadata(
     filename: str, allow_run_setup_py: bool = True, origin: Optional[Repository] = None
 ) -> RequirementContainer:
     """Extract a DistInfo from a file or directory
 
+    Metadata of archives is extracted once per process, even when compiling for
+    several targets in parallel. Each call returns its own copy.
+
     Args:
         filename: File or path to extract metadata from
         allow_run_setup_py: Whether this call is permitted to run setup.py files
@@ -32,6 +44,28 @@ def extract_metadata(
     Returns:
         (RequirementContainer) the result of the metadata extraction
     """
+    if not os.path.isfile(filename):
+        result = _extract_metadata(filename, allow_run_setup_py)
+    else:
+        stat = os.stat(filename)
+        key = (
+            os.path.abspath(filename),
+            stat.st_size,
+            stat.st_mtime_ns,
+            allow_run_setup_py,
+        )
+        with _ARCHIVE_LOCKS(key):
+            template = ARCHIVE_METADATA.get(key)
+            if template is None:
+                template = ARCHIVE_METADATA.intern(
+                    key, _extract_metadata(filename, allow_run_setup_py)
+                )
+        result = copy.copy(template)
+    result.origin = origin
+    return result
+
+
+def _extract_metadata(filename: str, allow_run_setup_py: bool) -> RequirementContainer:
     LOG.info("Extracting metadata for %s", filename)
     basename, ext = os.path.splitext(filename)
     result: Optional[RequirementContainer] = None
@@ -75,9 +109,6 @@ def extract_metadata(
             os.path.abspath(filename), NonExtractor, run_setup_py=allow_run_setup_py
         )
 
-    if result is not None:
-        result.origin = origin
-
     if result is None:
         raise MetadataError(basename, None, ValueError("Could not extract metadata"))
 
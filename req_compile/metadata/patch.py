@@ -2,11 +2,16 @@
 
 import contextlib
 import sys
+import threading
 import types
 from typing import Any, Iterator, Optional, Tuple, Union
 
 PatchToken = Tuple[types.ModuleType, str, Any]
 
+# Patches apply to the whole process. Code that patches the modules, or relies on
+# the working directory, holds this so threads don't interleave their patches.
+PATCH_LOCK = threading.RLock()
+
 
 def begin_patch(
     module: Union[str, types.ModuleType], member: str, new_value: Any
@@ -6,20 +6,18 @@ import os
 import shutil
 import sys
 import tempfile
-import threading
 from io import StringIO
 from typing import Any, List, Mapping, Optional, Tuple
 
 import packaging.requirements
-import toml
 
 from ..containers import DistInfo
 from ..utils import parse_requirements
 from .dist_info import _fetch_from_wheel, _parse_flat_metadata
-from .patch import patch
+from .patch import PATCH_LOCK, patch
 
 LOG = logging.getLogger("req_compile.metadata.source")
-LOCK = threading.Lock()
+LOCK = PATCH_LOCK
 
 
 def _create_build_backend(build_system: Mapping) -> Any:
@@ -100,6 +98,8 @@ def fetch_from_pyproject(
 ) -> Tuple[Optional[DistInfo], List[packaging.requirements.Requirement]]:
     """Fetch metadata from pyproject.toml either by relying on the backend to provide metadata, or by building
     a wheel and extracting the metadata"""
+    import toml  # pylint: disable=import-outside-toplevel
+
     try:
         pyproject = toml.load(os.path.join(source_file, "pyproject.toml"))
     except toml.TomlDecodeError as ex:
@@ -5,29 +5,6 @@ from __future__ import annotations
 
 import configparser
 import functools
-import sys
-from types import ModuleType
-
-try:
-    import imp  # type: ignore  # pylint: disable=deprecated-module
-except ImportError:
-    # Python 3.12+ removed imp; provide a shim since setup.py files may use imp.load_source().
-    imp = ModuleType("imp")
-
-    def _load_source(name: str, pathname: str, _file: object = None) -> ModuleType:  # type: ignore[misc]
-        import importlib.util as _ilu  # pylint: disable=import-outside-toplevel
-
-        spec = _ilu.spec_from_file_location(name, pathname)
-        if spec is None or spec.loader is None:
-            raise ImportError(f"Cannot load {name} from {pathname}")
-        mod = _ilu.module_from_spec(spec)
-        sys.modules[name] = mod
-        spec.loader.exec_module(mod)
-        return mod
-
-    imp.load_source = _load_source  # type: ignore[assignment]
-    sys.modules["imp"] = imp
-
 import io
 import logging
 import os
@@ -36,6 +13,7 @@ import pathlib
 import re
 import shutil
 import subprocess
+import sys
 import tarfile
 import tempfile
 import threading
@@ -45,6 +23,7 @@ from contextlib import closing
 from importlib.abc import Loader, MetaPathFinder
 from importlib.machinery import ModuleSpec
 from io import BytesIO, StringIO
+from types import ModuleType
 from typing import (
     IO,
     Any,
@@ -61,7 +40,6 @@ from typing import (
 
 import packaging.requirements
 import packaging.version
-import setuptools  # type: ignore
 
 from req_compile import utils
 from req_compile.errors import MetadataError
@@ -70,7 +48,7 @@ from req_compile.filename import parse_source_filename
 from ..containers import DistInfo, EggInfoDistInfo, RequirementContainer
 from .dist_info import _fetch_from_wheel
 from .extractor import Extractor, NonExtractor
-from .patch import PatchToken, begin_patch, end_patch, patch
+from .patch import PATCH_LOCK, PatchToken, begin_patch, end_patch, patch
 
 LOG = logging.getLogger("req_compile.metadata.source")
 
@@ -207,7 +185,7 @@ def _fetch_from_setup_py(
             os.path, 'abspath', _fake_abspath,
     )
     # fmt: on
-    with patches:
+    with PATCH_LOCK, patches:
         setup_file = find_in_archive(extractor, "setup.py", max_depth=1)
 
         if name == "setuptools":
@@ -533,7 +511,7 @@ class FakeModule(ModuleType):
         if item == "__path__":
             return []
         if item == "setup":
-            return setuptools.setup
+            return sys.modules["setuptools"].setup
         return FakeModule(item)
 
 
@@ -574,6 +552,33 @@ def remove_encoding_lines(contents: str) -> str:
     return "\n".join(lines)
 
 
+def _load_source(name: str, pathname: str, _file: object = None) -> ModuleType:
+    import importlib.util as _ilu  # pylint: disable=import-outside-toplevel
+
+    spec = _ilu.spec_from_file_location(name, pathname)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot load {name} from {pathname}")
+    mod = _ilu.module_from_spec(spec)
+    sys.modules[name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _imp_module() -> ModuleType:
+    """The imp module, which setup.py files may use for imp.load_source().
+
+    Python 3.12+ removed imp, a shim providing load_source() is installed instead.
+    """
+    try:
+        # pylint: disable-next=deprecated-module,import-outside-toplevel
+        import imp  # type: ignore
+    except ImportError:
+        imp = ModuleType("imp")
+        imp.load_source = _load_source  # type: ignore[assignment]
+        sys.modules["imp"] = imp
+    return imp
+
+
 def import_contents(modname: str, filename: str, contents: str) -> ModuleType:
     module = ModuleType(modname)
     if filename.endswith("__init__.py"):
@@ -622,6 +627,7 @@ def _parse_setup_py(
     import multiprocessing
 
     import requests
+    import setuptools  # type: ignore
 
     try:
         import importlib.util  # noqa
@@ -723,9 +729,9 @@ def _parse_setup_py(
     module_from_spec_patch = begin_patch(
         "importlib.util", "module_from_spec", fake_module_from_spec
     )
-    load_source_patch: Optional[PatchToken] = None
-    if imp is not None:
-        load_source_patch = begin_patch(imp, "load_source", fake_load_source)
+    load_source_patch: Optional[PatchToken] = begin_patch(
+        _imp_module(), "load_source", fake_load_source
+    )
 
     class ArchiveMetaHook(Loader, MetaPathFinder):
         def __init__(self) -> None:
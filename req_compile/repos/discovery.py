@@ -0,0 +1,276 @@
+"""Fast listing of the files that identify projects in a source tree.
+
+Walking a large tree with os.walk visits every directory in it, including virtual
+environments, build outputs and data directories. The listings here only return the
+files a source repository cares about, either from git's view of the tree, or from a
+scan that skips what the tree's .gitignore files ignore. walk_listing then replays a
+listing as an os.walk-style top-down walk, so the rules deciding which directories
+are projects apply unchanged.
+"""
+
+import logging
+import os
+import re
+import subprocess
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import (
+    Callable,
+    DefaultDict,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+)
+
+LOG = logging.getLogger("req_compile.repository.discovery")
+
+# Ways of finding the projects in a tree. "walk" visits every directory. "git" lists
+# the files git knows about, "scan" visits the directories the tree's .gitignore
+# files don't ignore, and "auto" uses git in a git working tree and scans otherwise.
+DISCOVERY_MODES = ("walk", "git", "scan", "auto")
+
+# A .gitignore pattern: the directory it applies below, relative to the top of the
+# scan, its regex, whether it is negated and whether it only matches directories.
+IgnoreRule = Tuple[str, Pattern, bool, bool]
+
+
+def _translate_pattern(pattern: str) -> str:
+    """Translate a .gitignore glob into a regex matching a relative path."""
+    parts = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            parts.append("(?:.*/)?")
+            index += 3
+            continue
+        if pattern.startswith("/**", index) and index + 3 == len(pattern):
+            parts.append("/.*")
+            index += 3
+            continue
+        if char == "*":
+            if pattern.startswith("**", index):
+                parts.append(".*")
+                index += 2
+                continue
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", index + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                parts.append("[" + pattern[index + 1 : end].replace("!", "^", 1) + "]")
+                index = end
+        elif char == "\\" and index + 1 < len(pattern):
+            index += 1
+            parts.append(re.escape(pattern[index]))
+        else:
+            parts.append(re.escape(char))
+        index += 1
+    return "".join(parts)
+
+
+def parse_gitignore(contents: str, base: str) -> List[IgnoreRule]:
+    """Parse the patterns of a .gitignore file.
+
+    Args:
+        contents: Contents of the file.
+        base: Directory containing the file, relative to the top of the scan, with
+            forward slashes. Empty for the top itself.
+
+    Returns:
+        The rules of the file, in order.
+    """
+    rules: List[IgnoreRule] = []
+    for line in contents.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # Patterns with a slash are relative to the .gitignore, others match at any
+        # depth below it.
+        anchored = "/" in line
+        line = line.lstrip("/")
+        regex = _translate_pattern(line)
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        rules.append((base, re.compile(regex + r"\Z"), negate, dir_only))
+    return rules
+
+
+def is_ignored(rules: Iterable[IgnoreRule], rel_path: str, is_dir: bool) -> bool:
+    """Whether a path is ignored by a set of rules. The last matching rule wins."""
+    ignored = False
+    for base, regex, negate, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        if base:
+            if not rel_path.startswith(base + "/"):
+                continue
+            path = rel_path[len(base) + 1 :]
+        else:
+            path = rel_path
+        if regex.match(path):
+            ignored = not negate
+    return ignored
+
+
+def list_git_files(top: str) -> Optional[List[str]]:
+    """List the files git knows about below a directory.
+
+    Tracked files and untracked files that aren't ignored are listed. Tracked files
+    that were deleted from the working tree are not.
+
+    Returns:
+        Paths relative to the directory with forward slashes, or None if the directory
+        isn't in a git working tree or git can't be run.
+    """
+    try:
+        output = subprocess.run(
+            [
+                "git",
+                "-C",
+                top,
+                "ls-files",
+                "-z",
+                "--cached",
+                "--others",
+                "--exclude-standard",
+            ],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return sorted(
+        {path for path in output.decode("utf-8", "surrogateescape").split("\0") if path}
+    )
+
+
+def scan_files(
+    top: str,
+    keep: Callable[[str], bool],
+    prune: Callable[[str], bool],
+    parallelism: int = 1,
+) -> List[str]:
+    """Scan a directory for files, honoring the .gitignore files in it.
+
+    Args:
+        top: Directory to scan.
+        keep: Whether to list a file or directory, given its relative path.
+        prune: Whether to skip a directory, given its relative path.
+        parallelism: Number of threads scanning subtrees.
+
+    Returns:
+        Paths of the kept files and directories relative to top, with forward
+        slashes.
+    """
+
+    def scan_dir(
+        rel_dir: str, rules: Tuple[IgnoreRule, ...]
+    ) -> Tuple[List[str], List[Tuple[str, Tuple[IgnoreRule, ...]]]]:
+        full_dir = os.path.join(top, *rel_dir.split("/")) if rel_dir else top
+        try:
+            with open(
+                os.path.join(full_dir, ".gitignore"), encoding="utf-8", errors="replace"
+            ) as handle:
+                rules = rules + tuple(parse_gitignore(handle.read(), rel_dir))
+        except OSError:
+            pass
+
+        files: List[str] = []
+        subdirs: List[Tuple[str, Tuple[IgnoreRule, ...]]] = []
+        try:
+            with os.scandir(full_dir) as entries:
+                for entry in entries:
+                    rel_path = rel_dir + "/" + entry.name if rel_dir else entry.name
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if is_ignored(rules, rel_path, is_dir):
+                        continue
+                    # Directories are kept like files, e.g. for marker directories.
+                    if keep(rel_path):
+                        files.append(rel_path)
+                    if is_dir and not prune(rel_path):
+                        subdirs.append((rel_path, rules))
+        except OSError as ex:
+            LOG.debug("Could not scan %s: %s", full_dir, ex)
+        return files, subdirs
+
+    found: List[str] = []
+    if parallelism <= 1:
+        queue: Deque[Tuple[str, Tuple[IgnoreRule, ...]]] = deque([("", ())])
+        while queue:
+            files, subdirs = scan_dir(*queue.popleft())
+            found.extend(files)
+            queue.extend(subdirs)
+        return sorted(found)
+
+    with ThreadPoolExecutor(parallelism) as executor:
+        pending: Set[Future] = {executor.submit(scan_dir, "", ())}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                found.extend(files)
+                pending.update(
+                    executor.submit(scan_dir, rel_dir, rules)
+                    for rel_dir, rules in subdirs
+                )
+    return sorted(found)
+
+
+def walk_listing(
+    top: str, paths: Iterable[str]
+) -> Iterator[Tuple[str, List[str], List[str]]]:
+    """Walk the directories of a file listing top-down, like os.walk.
+
+    Only directories leading to a listed file are visited. As with os.walk, removing
+    entries from the yielded list of directories skips them.
+
+    Args:
+        top: Directory the paths are relative to.
+        paths: Relative file paths, with forward slashes.
+    """
+    tree: DefaultDict[str, Tuple[Set[str], Set[str]]] = defaultdict(
+        lambda: (set(), set())
+    )
+    tree[""]  # pylint: disable=pointless-statement
+    for path in paths:
+        parent, _, name = path.rpartition("/")
+        tree[parent][1].add(name)
+        while parent:
+            grandparent, _, dirname = parent.rpartition("/")
+            known = grandparent in tree and dirname in tree[grandparent][0]
+            tree[grandparent][0].add(dirname)
+            if known:
+                break
+            parent = grandparent
+
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        subdirs, files = tree[rel_dir]
+        dirs = sorted(subdirs)
+        root = os.path.join(top, *rel_dir.split("/")) if rel_dir else top
+        yield root, dirs, sorted(files)
+        stack.extend(
+            rel_dir + "/" + dirname if rel_dir else dirname
+            for dirname in reversed(dirs)
+        )
@@ -1,19 +1,50 @@
+import hashlib
+import json
+import logging
 import os
-from hashlib import sha256
+import tempfile
+import threading
+import time
+from collections import defaultdict
 from pathlib import Path
-from typing import Any, List, Optional, Sequence, Tuple, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import packaging.requirements
+import packaging.version
 from overrides import overrides
 
 import req_compile.metadata
 import req_compile.metadata.metadata
 import req_compile.repos.repository
 from req_compile import utils
-from req_compile.containers import RequirementContainer
+from req_compile.containers import (
+    RequirementContainer,
+    metadata_from_dict,
+    metadata_to_dict,
+)
 from req_compile.repos import Repository, RepositoryInitializationError
 from req_compile.repos.repository import Candidate
 
+LOG = logging.getLogger("req_compile.repository.findlinks")
+
+# Digests and metadata of the archives in a find-links directory are kept next to
+# them, one small file per archive, so they are only computed once per archive.
+SIDECAR_DIR = ".req-compile"
+SIDECAR_VERSION = 1
+
+
+def _sidecar_root(path: str) -> str:
+    """Directory holding the sidecar files of a find-links directory.
+
+    Find-links directories that are shared or read-only can keep their sidecars in a
+    user cache instead, set with REQ_COMPILE_FINDLINKS_CACHE_DIR.
+    """
+    cache_dir = os.environ.get("REQ_COMPILE_FINDLINKS_CACHE_DIR")
+    if cache_dir:
+        path_key = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()
+        return os.path.join(cache_dir, path_key[:16])
+    return os.path.join(path, SIDECAR_DIR)
+
 
 class FindLinksRepository(Repository):
     """
@@ -33,8 +64,12 @@ class FindLinksRepository(Repository):
             if relative_to
             else None
         )
-        self.links: List[Candidate] = []
-        self._find_all_links()
+        self._links: List[Candidate] = []
+        self._links_by_name: Dict[utils.NormName, List[Candidate]] = {}
+        self._sidecar_root = _sidecar_root(self.path)
+        # The directory is only listed once a distribution is asked for.
+        self._listed = False
+        self._list_lock = threading.Lock()
 
     def __repr__(self) -> str:
         return "--find-links {}".format(self.relative_path or self.path)
@@ -49,39 +84,117 @@ class FindLinksRepository(Repository):
     def __hash__(self) -> int:
         return hash("findlinks") ^ hash(self.path)
 
+    @property
+    def links(self) -> List[Candidate]:
+        """All distributions in the directory."""
+        self.initialize()
+        return self._links
+
+    @property
+    def initialized(self) -> bool:
+        return self._listed
+
+    @overrides
+    def initialize(self) -> None:
+        """List the distributions in the directory, if that's not done yet."""
+        if self._listed:
+            return
+        with self._list_lock:
+            if not self._listed:
+                start = time.perf_counter()
+                self._find_all_links()
+                self._listed = True
+                self.logger.info(
+                    "Listed %s in %.3f seconds", self.path, time.perf_counter() - start
+                )
+
     def _find_all_links(self) -> None:
         if not os.path.exists(self.path):
             raise RepositoryInitializationError(
                 FindLinksRepository, "Directory {} not found.".format(self.path)
             )
-        for filename in os.listdir(self.path):
-            full_path = os.path.join(self.path, filename)
-            candidate = req_compile.repos.repository.filename_to_candidate(
-                (
-                    str(self.relative_path) if self.relative_path else self.path,
-                    os.path.join(self.relative_path or self.path, filename),
-                ),
-                full_path,
+        links_by_name: Dict[utils.NormName, List[Candidate]] = defaultdict(list)
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                candidate = req_compile.repos.repository.filename_to_candidate(
+                    (
+                        str(self.relative_path) if self.relative_path else self.path,
+                        os.path.join(self.relative_path or self.path, entry.name),
+                    ),
+                    entry.path,
+                )
+                if candidate is not None:
+                    links_by_name[utils.normalize_project_name(candidate.name)].append(
+                        candidate
+                    )
+
+        for name, candidates in links_by_name.items():
+            candidates.sort(key=lambda candidate: candidate.filename or "")
+            self._links_by_name[name] = candidates
+            self._links.extend(candidates)
+
+    def _sidecar_path(self, filename: str) -> str:
+        return os.path.join(self._sidecar_root, filename + ".json")
+
+    def _read_sidecar(self, filename: str, stat: os.stat_result) -> Dict[str, Any]:
+        """The cached digest and metadata of an archive, if it is unchanged."""
+        try:
+            with open(self._sidecar_path(filename), encoding="utf-8") as handle:
+                entry = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        if (
+            not isinstance(entry, dict)
+            or entry.get("version") != SIDECAR_VERSION
+            or entry.get("size") != stat.st_size
+            or entry.get("mtime_ns") != stat.st_mtime_ns
+        ):
+            return {}
+        return entry
+
+    def _write_sidecar(
+        self, filename: str, stat: os.stat_result, entry: Dict[str, Any]
+    ) -> None:
+        entry.update(
+            version=SIDECAR_VERSION, size=stat.st_size, mtime_ns=stat.st_mtime_ns
+        )
+        temp_path = None
+        try:
+            os.makedirs(self._sidecar_root, exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(
+                dir=self._sidecar_root, prefix=".", suffix=".tmp"
             )
-            if candidate is not None:
-                self.links.append(candidate)
+            with os.fdopen(handle, "w", encoding="utf-8") as out:
+                json.dump(entry, out)
+            os.replace(temp_path, self._sidecar_path(filename))
+        except OSError as ex:
+            # A read-only directory only loses the cache.
+            LOG.debug("Could not write sidecar for %s: %s", filename, ex)
+            if temp_path is not None:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+
+    def _file_hash(self, filename: str) -> str:
+        full_path = os.path.join(self.path, filename)
+        stat = os.stat(full_path)
+        entry = self._read_sidecar(filename, stat)
+        if "sha256" not in entry:
+            entry["sha256"] = utils.hash_file(full_path)
+            self._write_sidecar(filename, stat, entry)
+        return entry["sha256"]
 
     @overrides
     def get_candidates(
         self, req: Optional[packaging.requirements.Requirement]
     ) -> Sequence[Candidate]:
-        project_name = None
-        if req is not None:
-            project_name = utils.normalize_project_name(req.name)
-        results = []
-        for candidate in self.links:
-            if (
-                req is None
-                or utils.normalize_project_name(candidate.name) == project_name
-            ):
-                results.append(candidate)
-
-        return results
+        if req is None:
+            return list(self.links)
+        self.initialize()
+        return list(self._links_by_name.get(utils.normalize_project_name(req.name), []))
 
     @overrides
     def resolve_candidate(
@@ -90,21 +203,44 @@ class FindLinksRepository(Repository):
         if candidate.filename is None:
             raise ValueError("Candidate not found on disk: {}".format(candidate))
 
-        filename = os.path.join(self.path, candidate.filename)
-        hasher = sha256()
-        dist_info = req_compile.metadata.extract_metadata(filename, origin=self)
-        with open(filename, "rb") as handle:
-            while True:
-                block = handle.read(4096)
-                if not block:
-                    break
-                hasher.update(block)
-        dist_info.hash = "sha256:" + hasher.hexdigest()
+        full_path = os.path.join(self.path, candidate.filename)
+        stat = os.stat(full_path)
+        entry = self._read_sidecar(candidate.filename, stat)
+        updated = False
+        dist_info: RequirementContainer
+        if "metadata" in entry:
+            dist_info = metadata_from_dict(entry["metadata"])
+            dist_info.origin = self
+        else:
+            dist_info = req_compile.metadata.extract_metadata(full_path, origin=self)
+            entry["metadata"] = metadata_to_dict(dist_info)
+            updated = True
+        if "sha256" not in entry:
+            entry["sha256"] = utils.hash_file(full_path)
+            updated = True
+        if updated:
+            self._write_sidecar(candidate.filename, stat, entry)
+        dist_info.hash = entry["sha256"]
         return (
             dist_info,
             True,
         )
 
+    @overrides
+    def get_hashes(
+        self, name: str, version: packaging.version.Version
+    ) -> Sequence[str]:
+        self.initialize()
+        return sorted(
+            {
+                self._file_hash(candidate.filename)
+                for candidate in self._links_by_name.get(
+                    utils.normalize_project_name(name), []
+                )
+                if candidate.filename is not None and candidate.version == version
+            }
+        )
+
     @overrides
     def close(self) -> None:
         pass
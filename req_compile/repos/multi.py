@@ -7,6 +7,15 @@ from overrides import overrides
 from req_compile.containers import RequirementContainer
 from req_compile.errors import NoCandidateException
 from req_compile.repos.repository import Candidate, Repository
+from req_compile.utils import map_concurrently
+
+
+def initialize_repositories(repositories: Iterable[Repository]) -> None:
+    """Initialize the repositories that aren't yet, concurrently."""
+    map_concurrently(
+        lambda repo: repo.initialize(),
+        [repo for repo in repositories if not repo.initialized],
+    )
 
 
 class MultiRepository(Repository):
@@ -35,7 +44,12 @@ class MultiRepository(Repository):
         max_downgrade: Optional[int] = None,
     ) -> Tuple[RequirementContainer, bool]:
         last_ex = NoCandidateException(req)
-        for repo in self.repositories:
+        for idx, repo in enumerate(self.repositories):
+            # Once a repository is needed, the ones after it likely will be too.
+            if not all(inner.initialized for inner in repo):
+                initialize_repositories(
+                    itertools.chain(*(iter(later) for later in self.repositories[idx:]))
+                )
             try:
                 return repo.get_dist(
                     req,
@@ -50,6 +64,7 @@ class MultiRepository(Repository):
     def get_candidates(
         self, req: Optional[packaging.requirements.Requirement]
     ) -> Iterable[Candidate]:
+        initialize_repositories(self)
         candidates: List[Candidate] = []
         for repo in self.repositories:
             try:
@@ -69,6 +84,14 @@ class MultiRepository(Repository):
     def close(self) -> None:
         pass
 
+    @property
+    def initialized(self) -> bool:
+        return all(repo.initialized for repo in self)
+
+    @overrides
+    def initialize(self) -> None:
+        initialize_repositories(self)
+
 
 class PooledCandidateMultiRepository(MultiRepository):
     """Repository that pools all candidates for multiple repositories together."""
@@ -77,6 +100,7 @@ class PooledCandidateMultiRepository(MultiRepository):
     def get_candidates(
         self, req: Optional[packaging.requirements.Requirement]
     ) -> Iterable[Candidate]:
+        initialize_repositories(self)
         candidates: List[Candidate] = []
         for idx, repo in enumerate(self.repositories):
             try:
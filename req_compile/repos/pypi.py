@@ -1,28 +1,48 @@
 """Repository to handle pulling packages from online package indexes."""
 
+import codecs
 import enum
+import json
 import logging
 import os
 import re
 import sys
+import tempfile
+import threading
 import time
 import urllib
 import urllib.parse
 from functools import lru_cache
-from hashlib import sha256
 from html.parser import HTMLParser
 from pathlib import Path
-from typing import Any, List, Optional, Sequence, Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import packaging.requirements
 import packaging.version
-import requests
 from overrides import overrides
 
 from req_compile.containers import RequirementContainer
 from req_compile.errors import MetadataError
 from req_compile.metadata import extract_metadata
 from req_compile.repos.repository import Candidate, Repository, filename_to_candidate
+from req_compile.target import TargetEnvironment, current_target
+from req_compile.utils import InternTable, KeyedLocks, hash_file, link_hash
+
+if TYPE_CHECKING:
+    import requests
 
 LOG = logging.getLogger("req_compile.repository.pypi")
 
@@ -60,8 +80,26 @@ def check_python_compatibility(requires_python: str) -> bool:
         )
 
 
+def _python_versions() -> (
+    Tuple[
+        packaging.version.Version, packaging.version.Version, packaging.version.Version
+    ]
+):
+    """Full, major and major.minor versions of the Python being compiled for."""
+    target = current_target()
+    if target is None:
+        return SYS_PY_VERSION, SYS_PY_MAJOR, SYS_PY_MAJOR_MINOR
+    major, minor = target.major_minor
+    return (
+        target.python_version,
+        packaging.version.Version(str(major)),
+        packaging.version.Version("{}.{}".format(major, minor)),
+    )
+
+
 def _check_py_constraint(version_constraint: str) -> bool:
-    ref_version = SYS_PY_VERSION
+    sys_py_version, sys_py_major, sys_py_major_minor = _python_versions()
+    ref_version = sys_py_version
 
     version_part = re.split("[!=<>~]", version_constraint)[-1].strip()
     operator = version_constraint.replace(version_part, "").strip()
@@ -72,14 +110,14 @@ def _check_py_constraint(version_constraint: str) -> bool:
     if version_part.endswith(".*"):
         version_part = version_part.replace(".*", "")
         if dotted_parts == 3:
-            ref_version = SYS_PY_MAJOR_MINOR
+            ref_version = sys_py_major_minor
         elif dotted_parts == 2:
-            ref_version = SYS_PY_MAJOR
+            ref_version = sys_py_major
     else:
         if dotted_parts == 2:
-            ref_version = SYS_PY_MAJOR_MINOR
+            ref_version = sys_py_major_minor
         elif dotted_parts == 1:
-            ref_version = SYS_PY_MAJOR_MINOR
+            ref_version = sys_py_major_minor
             version_part += ".0"
 
     version = packaging.version.Version(version_part)
@@ -95,19 +133,67 @@ def _check_py_constraint(version_constraint: str) -> bool:
         raise ValueError("Unable to parse constraint {}".format(version_constraint))
 
 
+class PageLink(NamedTuple):
+    """A file linked to from a project's index page."""
+
+    href: str
+    filename: str
+    requires_python: Optional[str]
+
+
 class LinksHTMLParser(HTMLParser):
-    def __init__(self, url: str) -> None:
+    """Collects the links of an index page, as it is fed.
+
+    A link is complete once its anchor is closed, so pages can be fed in any pieces.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        check_requires_python: bool = True,
+        project_name: Optional[str] = None,
+    ) -> None:
+        """Constructor.
+
+        Args:
+            url: URL of the page.
+            check_requires_python: Whether dists leaves out files that don't support
+                the Python being compiled for.
+            project_name: If given, links to files of other projects are left out.
+        """
         super().__init__()
         self.url = url
-        self.dists: List[Candidate] = []
+        self.check_requires_python = check_requires_python
+        self.prefix = None if project_name is None else normalize(project_name) + "-"
+        self.links: List[PageLink] = []
         self.active_link: Optional[Tuple[str, Optional[str]]] = None
-        self.active_skip = False
+        self.active_requires_python: Optional[str] = None
+        self.active_text: List[str] = []
+
+    @property
+    def dists(self) -> List[Candidate]:
+        """Candidates for the links fed so far."""
+        return _page_candidates(
+            self.url, self.links + self._active_links(), self.check_requires_python
+        )
 
-    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+    def _active_links(self) -> List[PageLink]:
+        if self.active_link is None or self.active_link[1] is None:
+            return []
+        filename = "".join(self.active_text).strip()
+        if self.prefix is not None and not normalize(filename).startswith(self.prefix):
+            return []
+        return [PageLink(self.active_link[1], filename, self.active_requires_python)]
+
+    def _end_link(self) -> None:
+        self.links.extend(self._active_links())
         self.active_link = None
+        self.active_text = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._end_link()
         if tag == "a":
-            self.active_skip = False
-            requires_python = None
+            self.active_requires_python = None
             for attr in attrs:
                 if attr[0] == "href":
                     self.active_link = self.url, attr[1]
@@ -115,97 +201,294 @@ class LinksHTMLParser(HTMLParser):
                     attr[0] == "metadata-requires-python"
                     or attr[0] == "data-requires-python"
                 ):
-                    requires_python = attr[1]
+                    self.active_requires_python = attr[1]
 
-            if requires_python:
-                try:
-                    self.active_skip = not check_python_compatibility(requires_python)
-                except ValueError:
-                    LOG.error(
-                        'Failed to parse requires expression "%s" for requirement %s',
-                        requires_python,
-                        self.active_link,
-                    )
+    def handle_endtag(self, tag: str) -> None:
+        self._end_link()
 
     def handle_data(self, data: str) -> None:
-        if self.active_link is None or self.active_skip:
-            return
-        candidate = filename_to_candidate(self.active_link, data.strip())
-        if candidate is not None:
-            self.dists.append(candidate)
+        if self.active_link is not None:
+            self.active_text.append(data)
+
+    def close(self) -> None:
+        super().close()
+        self._end_link()
 
     def error(self, message: str) -> None:
         raise RuntimeError(message)
 
 
+def _skip_requires_python(requires_python: str, link: Any) -> bool:
+    try:
+        return not check_python_compatibility(requires_python)
+    except ValueError:
+        LOG.error(
+            'Failed to parse requires expression "%s" for requirement %s',
+            requires_python,
+            link,
+        )
+        return False
+
+
+# Prefer the JSON form of the simple API (PEP 691), which carries the digests of each
+# file as data. Indexes that don't support it return HTML.
+_SIMPLE_JSON_TYPE = "application/vnd.pypi.simple.v1+json"
+_ACCEPT = "{}, application/vnd.pypi.simple.v1+html;q=0.2, text/html;q=0.1".format(
+    _SIMPLE_JSON_TYPE
+)
+
+
+def _json_page_links(content: str, project_name: str) -> List[PageLink]:
+    """Links of a project page in the JSON form of the simple API.
+
+    The sha256 digest of each file, if the index provides it, is added to its link
+    as a #sha256= fragment, as the HTML form of the page does.
+    """
+    prefix = normalize(project_name) + "-"
+    links: List[PageLink] = []
+    for file_info in json.loads(content).get("files", []):
+        href = file_info.get("url")
+        filename = file_info.get("filename")
+        if not href or not filename or not normalize(filename).startswith(prefix):
+            continue
+        digest = (file_info.get("hashes") or {}).get("sha256")
+        if digest:
+            href = "{}#sha256={}".format(href.partition("#")[0], digest)
+        links.append(PageLink(href, filename, file_info.get("requires-python")))
+    return links
+
+
+def _page_candidates(
+    url: str, links: Iterable[PageLink], check_requires_python: bool = True
+) -> List[Candidate]:
+    """Candidates for the links of a page, for the Python being compiled for.
+
+    Args:
+        url: URL of the page, which links are relative to.
+        links: Links of the page.
+        check_requires_python: Whether to leave out files that don't support the
+            Python being compiled for.
+    """
+    # Most files of a project share a few requires-python specifiers.
+    skipped: Dict[str, bool] = {}
+    dists: List[Candidate] = []
+    for link in links:
+        if check_requires_python and link.requires_python:
+            skip = skipped.get(link.requires_python)
+            if skip is None:
+                skip = skipped[link.requires_python] = _skip_requires_python(
+                    link.requires_python, (url, link.href)
+                )
+            if skip:
+                continue
+        candidate = filename_to_candidate((url, link.href), link.filename)
+        if candidate is not None:
+            dists.append(candidate)
+    return dists
+
+
 def normalize(name: str) -> str:
     """Normalize per PEP-0503."""
     return re.sub(r"(\s|[-_.])+", "-", name).lower()
 
 
-@lru_cache(maxsize=None)
+# Links of index pages by index URL and normalized project name, shared by all
+# repositories and compiles in this process. Which links are usable depends on the
+# target environment, so only the links themselves are shared. The least recently
+# used pages are dropped, so long-running processes don't grow without limit.
+PAGE_CACHE_SIZE = int(os.environ.get("REQ_COMPILE_PAGE_CACHE_SIZE", "1024"))
+_PAGES = InternTable(PAGE_CACHE_SIZE)
+_PAGE_LOCKS = KeyedLocks()
+
+# Pages are read in pieces of this many bytes, and parsed as they arrive.
+_PAGE_CHUNK_SIZE = 64 * 1024
+
+
+def _stream_page_links(
+    response: "requests.Response", project_name: str
+) -> Iterator[PageLink]:
+    """Links to the files of a project on its index page, as the page is received.
+
+    Args:
+        response: Response to a streamed request for the page.
+        project_name: Project of the page. Links to files of other projects are
+            left out.
+    """
+    content_type = response.headers.get("Content-Type", "")
+    if content_type.split(";")[0].strip() == _SIMPLE_JSON_TYPE:
+        # There is no incremental JSON parser in the standard library.
+        yield from _json_page_links(response.content.decode("utf-8"), project_name)
+        return
+
+    parser = LinksHTMLParser(response.url, project_name=project_name)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in response.iter_content(chunk_size=_PAGE_CHUNK_SIZE):
+        parser.feed(decoder.decode(chunk))
+        yield from parser.links
+        parser.links.clear()
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield from parser.links
+
+
+def _fetch_page(
+    index_url: str,
+    project_name: str,
+    session: "requests.Session",
+    retries: int,
+    check_requires_python: bool = True,
+) -> List[Candidate]:
+    """Candidates for the files on a project's page of a Python index.
+
+    The page is fetched once per process. While it is fetched, candidates are made
+    from its links as they arrive, and the links are kept for later calls.
+
+    Args:
+        index_url: Base index URL to request from.
+        project_name: Project to fetch the page of.
+        session: Open requests session.
+        retries: Numer of times to retry.
+        check_requires_python: Whether to leave out files that don't support the
+            Python being compiled for.
+
+    Returns:
+        Candidates on this index's page.
+    """
+    key = (index_url, normalize(project_name))
+    with _PAGE_LOCKS(key):
+        page = _PAGES.get(key)
+        if page is not None:
+            return _page_candidates(page[0], page[1], check_requires_python)
+
+        url = "{index_url}/{project_name}".format(
+            index_url=index_url, project_name=key[1]
+        )
+        LOG.info("Fetching versions for %s from %s", project_name, url)
+        if session is None:
+            session = _shared_session()
+        while True:
+            response = session.get(url + "/", headers={"Accept": _ACCEPT}, stream=True)
+            if retries and 500 <= response.status_code < 600:
+                response.close()
+                time.sleep(0.1)
+                retries -= 1
+                continue
+            break
+
+        with response:
+            # Raise for any error status that's not 404
+            if response.status_code != 404:
+                response.raise_for_status()
+
+            links: List[PageLink] = []
+
+            def _received_links() -> Iterator[PageLink]:
+                for link in _stream_page_links(response, project_name):
+                    links.append(link)
+                    yield link
+
+            candidates = _page_candidates(
+                response.url, _received_links(), check_requires_python
+            )
+            _PAGES.intern(key, (response.url, links))
+        return candidates
+
+
+@lru_cache(maxsize=PAGE_CACHE_SIZE)
 def _scan_page_links(
-    index_url: str, project_name: str, session: requests.Session, retries: int
+    index_url: str,
+    project_name: str,
+    session: "requests.Session",
+    retries: int,
+    target: Optional[TargetEnvironment] = None,
 ) -> Sequence[Candidate]:
-    """Scan a Python index's HTML page for links for a given project.
+    """Scan a Python index's page for links for a given project.
 
     Args:
         index_url: Base index URL to request from.
         project_name: From to fetch candidates for.
         session: Open requests session.
         retries: Numer of times to retry.
+        target: The environment being compiled for. Filtering and ranking of the
+            candidates depends on it, so it is part of the cache key.
 
     Returns:
         Candidates on this index's page.
     """
+    del target  # Only part of the cache key.
+    return _fetch_page(index_url, project_name, session, retries)
+
+
+_SESSION: Optional["requests.Session"] = None
+_SESSION_LOCK = threading.Lock()
 
-    url = "{index_url}/{project_name}".format(
-        index_url=index_url, project_name=normalize(project_name)
-    )
-    LOG.info("Fetching versions for %s from %s", project_name, url)
-    if session is None:
-        session = requests
-    response = session.get(url + "/")
 
-    if retries and 500 <= response.status_code < 600:
-        time.sleep(0.1)
-        return _scan_page_links(index_url, project_name, session, retries - 1)
+def _shared_session() -> "requests.Session":
+    """The session of all repositories in this process, so connections are reused.
 
-    # Raise for any error status that's not 404
-    if response.status_code != 404:
-        response.raise_for_status()
+    requests is only imported once an index is used.
+    """
+    global _SESSION  # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            import requests  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+            _SESSION = requests.Session()
+        return _SESSION
+
+
+def close_shared_session() -> None:
+    """Close the shared session, so the next use of an index starts a new one.
+
+    Long-running processes call this between runs, so cookies and connections made
+    with the environment and credentials of one run aren't used by the next.
+    """
+    global _SESSION  # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
 
-    parser = LinksHTMLParser(response.url)
-    parser.feed(response.content.decode("utf-8"))
 
-    return parser.dists
+# Compiles for several targets share a wheeldir, only download each file once at a time.
+_DOWNLOAD_LOCKS = KeyedLocks()
+
+# Hashes of downloaded files whose links have no digest, by URL, so each is only
+# downloaded once per process to be hashed.
+_FILE_HASHES = InternTable(PAGE_CACHE_SIZE)
+
+
+def clear_page_caches() -> None:
+    """Forget the index pages and file hashes cached by this process."""
+    _scan_page_links.cache_clear()
+    _PAGES.cache_clear()
+    _FILE_HASHES.cache_clear()
 
 
 def _do_download(
     logger: logging.Logger,
     filename: str,
     link: Tuple[str, str],
-    session: requests.Session,
+    session: "requests.Session",
     wheeldir: str,
 ) -> Tuple[str, bool]:
-    url, resource = link
-    split_link = resource.split("#sha256=")
-    if len(split_link) > 1:
-        sha = split_link[1]
-    else:
-        sha = None
+    sha = link_hash(link[1])
 
     output_file = os.path.join(wheeldir, filename)
+    with _DOWNLOAD_LOCKS(output_file):
+        return _do_locked_download(logger, output_file, link, sha, session)
+
 
-    if sha is not None and os.path.exists(output_file):
-        hasher = sha256()
-        with open(output_file, "rb") as handle:
-            while True:
-                block = handle.read(4096)
-                if not block:
-                    break
-                hasher.update(block)
-        if hasher.hexdigest() == sha:
+def _do_locked_download(
+    logger: logging.Logger,
+    output_file: str,
+    link: Tuple[str, str],
+    sha: Optional[str],
+    session: "requests.Session",
+) -> Tuple[str, bool]:
+    url, resource = link
+    if sha is not None and sha.startswith("sha256:") and os.path.exists(output_file):
+        if hash_file(output_file) == sha:
             logger.info("Reusing %s", output_file)
             return output_file, True
         logger.debug("No hash match for downloaded file, removing")
@@ -216,7 +499,7 @@ def _do_download(
     full_link = urllib.parse.urljoin(url, resource)
     logger.info("Downloading %s -> %s", full_link, output_file)
     if session is None:
-        session = requests
+        session = _shared_session()
     response = session.get(full_link, stream=True)
 
     with open(output_file, "wb") as handle:
@@ -264,7 +547,10 @@ class PyPIRepository(Repository):
         self.retries = retries
         self.index_type = index_type
 
-        self.session = requests.Session()
+    @property
+    def session(self) -> "requests.Session":
+        """The HTTP session, only made once the index is used."""
+        return _shared_session()
 
     def __repr__(self) -> str:
         if self.index_type == IndexType.DEFAULT:
@@ -291,7 +577,9 @@ class PyPIRepository(Repository):
     ) -> Sequence[Candidate]:
         if req is None:
             return []
-        return _scan_page_links(self.index_url, req.name, self.session, self.retries)
+        return _scan_page_links(
+            self.index_url, req.name, self.session, self.retries, current_target()
+        )
 
     @overrides
     def resolve_candidate(
@@ -311,10 +599,7 @@ class PyPIRepository(Repository):
                 self.wheeldir,
             )
             dist_info = extract_metadata(filename, origin=self)
-            _, resource = candidate.link
-            if "#" in resource:
-                _, _, hash_pair = resource.partition("#")
-                dist_info.hash = hash_pair.replace("=", ":")
+            dist_info.hash = link_hash(candidate.link[1]) or hash_file(filename)
             return dist_info, cached
         except MetadataError:
             if not cached and filename is not None:
@@ -325,5 +610,46 @@ class PyPIRepository(Repository):
             raise
 
     @overrides
-    def close(self) -> None:
-        self.session.close()
+    def get_hashes(
+        self, name: str, version: packaging.version.Version
+    ) -> Sequence[str]:
+        """Hashes of every file of a version on the index, for all platforms.
+
+        Digests the index advertises are used as they are. Only files without one
+        are downloaded and hashed.
+        """
+        candidates = _fetch_page(
+            self.index_url,
+            name,
+            self.session,
+            self.retries,
+            check_requires_python=False,
+        )
+        hashes: Set[str] = set()
+        # The wheeldir may already be cleaned up when solutions are written.
+        with tempfile.TemporaryDirectory() as scratch_dir:
+            wheeldir = (
+                self.wheeldir
+                if self.wheeldir and os.path.isdir(self.wheeldir)
+                else scratch_dir
+            )
+            for candidate in candidates:
+                if candidate.version != version or candidate.filename is None:
+                    continue
+                advertised = link_hash(candidate.link[1])
+                if advertised is not None:
+                    hashes.add(advertised)
+                    continue
+                url = urllib.parse.urljoin(*candidate.link)
+                file_hash = _FILE_HASHES.get(url)
+                if file_hash is None:
+                    filename, _ = _do_download(
+                        self.logger,
+                        candidate.filename,
+                        candidate.link,
+                        self.session,
+                        wheeldir,
+                    )
+                    file_hash = _FILE_HASHES.intern(url, hash_file(filename))
+                hashes.add(file_hash)
+        return sorted(hashes)
@@ -11,6 +11,8 @@ import sysconfig
 from collections import defaultdict
 from typing import (
     Any,
+    Dict,
+    FrozenSet,
     Iterable,
     Iterator,
     List,
@@ -31,6 +33,12 @@ import req_compile.utils
 from req_compile.containers import RequirementContainer
 from req_compile.errors import NoCandidateException
 from req_compile.filename import parse_source_filename
+from req_compile.target import (
+    LEGACY_ALIASES,
+    MACOSX_REGEX,
+    MANYLINUX_REGEX,
+    current_target,
+)
 from req_compile.utils import (
     NormName,
     get_glibc_version,
@@ -48,18 +56,6 @@ INTERPRETER_TAGS = {
 INTERPRETER_TAG = INTERPRETER_TAGS.get(platform.python_implementation(), "cp")
 PY_VERSION_NUM = str(sys.version_info.major) + str(sys.version_info.minor)
 
-# PEP-600 legacy platform tags
-LEGACY_ALIASES = {
-    "manylinux1_x86_64": "manylinux_2_5_x86_64",
-    "manylinux1_i686": "manylinux_2_5_i686",
-    "manylinux2010_x86_64": "manylinux_2_12_x86_64",
-    "manylinux2010_i686": "manylinux_2_12_i686",
-    "manylinux2014_x86_64": "manylinux_2_17_x86_64",
-    "manylinux2014_i686": "manylinux_2_17_i686",
-}
-MANYLINUX_REGEX = r"manylinux_([0-9]+)_([0-9]+)_(.*)"
-MACOSX_REGEX = r"macosx_([0-9]+)_([0-9]+)_(.*)"
-
 
 def _get_platform_tags() -> Sequence[str]:
     if sys.platform == "darwin":
@@ -158,10 +154,161 @@ def _get_abi_tag() -> str:
     return INTERPRETER_TAG + PY_VERSION_NUM
 
 
-PLATFORM_TAGS = _get_platform_tags()
+PLATFORM_TAGS = tuple(_get_platform_tags())
 ABI_TAGS = ("abi" + str(sys.version_info.major), _get_abi_tag())
 
 
+class SupportedTags:
+    """Compatibility and priority of wheel filename tags for an interpreter.
+
+    Each lookup returns whether the tag is supported and the score used to rank
+    candidates. The tags the interpreter supports are computed up front, any other
+    tag found in a filename is evaluated once and remembered. Checking a wheel is
+    then a handful of dictionary lookups.
+    """
+
+    __slots__ = (
+        "key",
+        "interpreter",
+        "major",
+        "minor",
+        "probe_host",
+        "python",
+        "abi",
+        "platform",
+    )
+
+    def __init__(
+        self,
+        key: Tuple[str, Tuple[int, ...], Tuple[str, ...], Tuple[str, ...], bool],
+    ) -> None:
+        """
+        Args:
+            key: The interpreter tag, python major and minor version, ABI tags,
+                platform tags and whether the manylinux tags supported by
+                this system should be detected.
+        """
+        self.key = key
+        self.interpreter, (self.major, self.minor), _, _, self.probe_host = key
+        self.python: Dict[str, Tuple[bool, int]] = {}
+        self.abi: Dict[str, Tuple[bool, int]] = {}
+        self.platform: Dict[str, Tuple[bool, Optional[int]]] = {}
+
+        for impl in ("py", self.interpreter):
+            self.python_info("{}{}".format(impl, self.major))
+            for minor in range(self.minor + 1):
+                self.python_info("{}{}{}".format(impl, self.major, minor))
+
+        for abi in self.abi_tags:
+            self.abi_info(abi)
+
+        self.platform_info("any")
+        for plat in self.platform_tags:
+            self.platform_info(plat)
+        glibc_version = get_glibc_version() if self.probe_host else None
+        if glibc_version is not None:
+            arch = get_system_arch()
+            for minor in range(glibc_version[1] + 1):
+                self.platform_info(
+                    "manylinux_{}_{}_{}".format(glibc_version[0], minor, arch)
+                )
+            for legacy_tag in LEGACY_ALIASES:
+                self.platform_info(legacy_tag)
+
+    @property
+    def abi_tags(self) -> Tuple[str, ...]:
+        return self.key[2]
+
+    @property
+    def platform_tags(self) -> Tuple[str, ...]:
+        return self.key[3]
+
+    def python_info(self, tag: str) -> Tuple[bool, int]:
+        """Compatibility and score of a python tag, like cp37 or py3."""
+        try:
+            return self.python[tag]
+        except KeyError:
+            pass
+        impl, major, minor = _impl_major_minor(tag)
+        compatible = (
+            impl in ("py", self.interpreter)
+            and major == self.major
+            and minor <= self.minor
+        )
+        result = self.python[tag] = compatible, _py_version_score(tag)
+        return result
+
+    def abi_info(self, tag: str) -> Tuple[bool, int]:
+        """Compatibility and score of an ABI tag."""
+        try:
+            return self.abi[tag]
+        except KeyError:
+            pass
+        try:
+            result = True, self.abi_tags.index(tag)
+        except ValueError:
+            result = False, 0
+        self.abi[tag] = result
+        return result
+
+    def platform_info(self, tag: str) -> Tuple[bool, Optional[int]]:
+        """Compatibility and score of a platform tag. Platforms that
+        cannot be ranked have no score."""
+        try:
+            return self.platform[tag]
+        except KeyError:
+            pass
+        if tag == "any":
+            result: Tuple[bool, Optional[int]] = True, 0
+        else:
+            compatible = tag.lower() in self.platform_tags or (
+                self.probe_host and manylinux_tag_is_compatible_with_this_system(tag)
+            )
+            score: Optional[int] = None
+            manylinux_match = re.match(MANYLINUX_REGEX, LEGACY_ALIASES.get(tag, tag))
+            if manylinux_match is not None:
+                score = int(manylinux_match.group(1)) * 10 + int(
+                    manylinux_match.group(2)
+                )
+            elif tag.lower() in self.platform_tags:
+                score = len(self.platform_tags) - self.platform_tags.index(tag.lower())
+            result = compatible, score * 100 if score is not None else None
+        self.platform[tag] = result
+        return result
+
+
+# Interpreter tag, Python version, ABI tags, platform tags and whether the running
+# interpreter's platform is used.
+_TagsKey = Tuple[str, Tuple[int, ...], Tuple[str, ...], Tuple[str, ...], bool]
+_SUPPORTED_TAGS: Dict[_TagsKey, SupportedTags] = {}
+
+
+def supported_tags() -> SupportedTags:
+    """The tag table of the current target, or of the running interpreter."""
+    target = current_target()
+    key: _TagsKey
+    if target is None:
+        key = (
+            INTERPRETER_TAG,
+            tuple(sys.version_info[:2]),
+            ABI_TAGS,
+            PLATFORM_TAGS,
+            True,
+        )
+    else:
+        key = (
+            target.implementation,
+            target.major_minor,
+            target.abi_tags,
+            target.platform_tags or PLATFORM_TAGS,
+            not target.platform_tags,
+        )
+    try:
+        return _SUPPORTED_TAGS[key]
+    except KeyError:
+        return _SUPPORTED_TAGS.setdefault(key, SupportedTags(key))
+
+
 class RepositoryInitializationError(ValueError):
     """Failure to initialize a repository"""
 
@@ -177,6 +324,8 @@ class DistributionType(enum.IntEnum):
 
 
 class PythonVersionRequirement:
+    __slots__ = ()
+
     def check_compatibility(self) -> bool:
         raise NotImplementedError
 
@@ -199,11 +348,7 @@ def _impl_major_minor(py_version: str) -> Tuple[str, int, int]:
 
 
 def _is_py_version_compatible(py_version: str) -> bool:
-    impl, major, minor = _impl_major_minor(py_version)
-    if impl == "py" or impl == INTERPRETER_TAG:
-        if major == sys.version_info.major and minor <= sys.version_info.minor:
-            return True
-    return False
+    return supported_tags().python_info(py_version)[0]
 
 
 def _py_version_score(py_version: str) -> int:
@@ -231,6 +376,8 @@ def _py_version_score(py_version: str) -> int:
 
 
 class WheelVersionTags(PythonVersionRequirement):
+    __slots__ = ("py_versions",)
+
     def __init__(self, py_versions: Iterable[str]) -> None:
         assert not isinstance(py_versions, str)
         self.py_versions: Optional[Set[str]] = None
@@ -241,9 +388,8 @@ class WheelVersionTags(PythonVersionRequirement):
         if not self.py_versions:
             return True
 
-        return any(
-            _is_py_version_compatible(py_version) for py_version in self.py_versions
-        )
+        tags = supported_tags()
+        return any(tags.python_info(py_version)[0] for py_version in self.py_versions)
 
     def __str__(self) -> str:
         if not self.py_versions:
@@ -261,12 +407,29 @@ class WheelVersionTags(PythonVersionRequirement):
         """Calculate a score based on how specific the versions given are"""
         if not self.py_versions:
             return 0
-        return max(_py_version_score(py_version) for py_version in self.py_versions)
+        tags = supported_tags()
+        return max(tags.python_info(py_version)[1] for py_version in self.py_versions)
 
 
 class Candidate:  # pylint: disable=too-many-instance-attributes
     """A candidate representing come kind of distribution to resolve"""
 
+    __slots__ = (
+        "name",
+        "filename",
+        "version",
+        "py_version",
+        "abi",
+        "platforms",
+        "link",
+        "type",
+        "tag_score",
+        "sortkey",
+        "_extra_sort_info",
+        "preparsed",
+        "source",
+    )
+
     def __init__(
         self,
         name: str,
@@ -295,18 +458,16 @@ class Candidate:  # pylint: disable=too-many-instance-attributes
         self.version: packaging.version.Version = version or parse_version("0.0.0")
         self.py_version = py_version
         self.abi = abi
-        if isinstance(plats, str):
-            self.platforms = {plats}
-        else:
-            self.platforms = set(plats)
+        self.platforms: FrozenSet[str] = _platform_set(plats)
         self.link = link
         self.type = candidate_type
 
         # Sort based on tags to make sure the most specific distributions
         # are matched first
-        self._sortkey: Optional[
-            Tuple[packaging.version.Version, str, int, Tuple[int, int, int, int]]
-        ] = None
+        self.tag_score: Tuple[int, int, int, int] = self._compute_tag_score()
+        self.sortkey: Tuple[
+            packaging.version.Version, str, int, Tuple[int, int, int, int]
+        ]
         self.extra_sort_info = extra_sort_info
 
         self.preparsed: Optional[RequirementContainer] = None
@@ -315,45 +476,31 @@ class Candidate:  # pylint: disable=too-many-instance-attributes
         self.source: Optional[Repository] = None
 
     @property
-    def sortkey(
-        self,
-    ) -> Tuple[packaging.version.Version, str, int, Tuple[int, int, int, int]]:
-        if self._sortkey is None:
-            self._sortkey = (
-                self.version,
-                self.extra_sort_info,
-                self.type.value,
-                self.tag_score,
-            )
-        return self._sortkey
+    def extra_sort_info(self) -> Any:
+        return self._extra_sort_info
 
-    @property
-    def tag_score(self) -> Tuple[int, int, int, int]:
+    @extra_sort_info.setter
+    def extra_sort_info(self, value: Any) -> None:
+        self._extra_sort_info = value
+        self.sortkey = (
+            self.version,
+            value,
+            self.type.value,
+            self.tag_score,
+        )
+
+    def _compute_tag_score(self) -> Tuple[int, int, int, int]:
+        tags = supported_tags()
         py_version_score = (
             self.py_version.tag_score if self.py_version is not None else 0
         )
-        try:
-            abi_score = ABI_TAGS.index(self.abi) if self.abi is not None else 0
-        except ValueError:
-            abi_score = 0
+        abi_score = tags.abi_info(self.abi)[1] if self.abi is not None else 0
 
         plat_score = -1
         for plat in self.platforms:
-            if plat == "any":
-                plat_score = 0
-                continue
-            try:
-                plat = LEGACY_ALIASES.get(plat, plat)
-                manylinux_match = re.match(MANYLINUX_REGEX, plat)
-                if manylinux_match is not None:
-                    this_score = int(manylinux_match.groups()[0]) * 10 + int(
-                        manylinux_match.groups()[1]
-                    )
-                else:
-                    this_score = len(PLATFORM_TAGS) - PLATFORM_TAGS.index(plat.lower())
-                plat_score = max(plat_score, this_score * 100)
-            except ValueError:
-                pass
+            this_score = tags.platform_info(plat)[1]
+            if this_score is not None:
+                plat_score = max(plat_score, this_score)
 
         # Give a bonus to wheels that support more platforms
         if plat_score > 0:
@@ -403,6 +550,18 @@ class Candidate:  # pylint: disable=too-many-instance-attributes
         ).strip("\r\n")
 
 
+# Platform sets are shared between all candidates with the same platform tags.
+_PLATFORM_SETS: Dict[Tuple[str, ...], FrozenSet[str]] = {}
+
+
+def _platform_set(plats: Union[str, Iterable[str]]) -> FrozenSet[str]:
+    key = (plats,) if isinstance(plats, str) else tuple(plats)
+    try:
+        return _PLATFORM_SETS[key]
+    except KeyError:
+        return _PLATFORM_SETS.setdefault(key, frozenset(key))
+
+
 def filename_to_candidate(source: Any, filename: str) -> Optional[Candidate]:
     """Create a candidate from a given filename. The source is used to download the
     candidate if necessary.
@@ -500,18 +659,12 @@ def _tar_gz_filename_to_candidate(source: Tuple[str, str], filename: str) -> Can
 
 
 def _check_platform_compatibility(py_platforms: Iterable[str]) -> bool:
-    return (
-        "any" in py_platforms
-        or any(py_platform.lower() in PLATFORM_TAGS for py_platform in py_platforms)
-        or any(
-            manylinux_tag_is_compatible_with_this_system(py_platform)
-            for py_platform in py_platforms
-        )
-    )
+    tags = supported_tags()
+    return any(tags.platform_info(py_platform)[0] for py_platform in py_platforms)
 
 
 def _check_abi_compatibility(abi: str) -> bool:
-    return abi in ABI_TAGS
+    return supported_tags().abi_info(abi)[0]
 
 
 class CantUseReason(enum.Enum):
@@ -640,6 +793,36 @@ class Repository(metaclass=abc.ABCMeta):
     def close(self) -> None:
         """Clean up any open files or connections."""
 
+    @property
+    def initialized(self) -> bool:
+        """Whether the setup deferred until the repository is first used is done."""
+        return True
+
+    def initialize(self) -> None:
+        """Do the setup deferred until the repository is first used, if not done yet.
+
+        This is done on first use anyway. Calling it ahead of time allows setting up
+        several repositories concurrently.
+        """
+
+    def get_hashes(
+        self, name: str, version: packaging.version.Version
+    ) -> Sequence[str]:
+        """Hashes of all distribution files of a project version, for any platform.
+
+        Repositories return the digests they know without downloading, where possible.
+
+        Args:
+            name: Name of the project.
+            version: The version to get the hashes for.
+
+        Returns:
+            Hashes in the form used by --hash options, e.g. sha256:abc. Empty if the
+            repository can't provide them.
+        """
+        del name, version
+        return []
+
     def get_dist(
         self,
         req: packaging.requirements.Requirement,
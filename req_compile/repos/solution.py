@@ -1,9 +1,21 @@
 import os
 import sys
+import time
 from pathlib import Path
-from typing import Any, Iterable, Optional, Sequence, Tuple, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import packaging.requirements
+import packaging.version
 from overrides import overrides
 
 import req_compile.containers
@@ -12,9 +24,11 @@ import req_compile.utils
 from req_compile.containers import RequirementContainer
 from req_compile.dists import DependencyNode, DistributionCollection
 from req_compile.errors import NoCandidateException
+from req_compile.lock import lock_file_path, read_lock_file
 from req_compile.repos import RepositoryInitializationError
 from req_compile.repos.repository import Candidate, DistributionType, Repository
 from req_compile.repos.source import ReferenceSourceRepository
+from req_compile.utils import NormName, merge_requirements, normalize_project_name
 
 
 def _candidate_from_node(node: DependencyNode) -> Candidate:
@@ -32,10 +46,20 @@ class SolutionRepository(Repository):
         self,
         filename: Union[str, Path],
         excluded_packages: Optional[Iterable[str]] = None,
+        lock_file: Optional[Union[str, Path]] = None,
     ) -> None:
-        """Constructor."""
+        """Constructor.
+
+        Args:
+            filename: The solution file, or - for stdin.
+            excluded_packages: Projects to leave out of the solution.
+            lock_file: A lock file to load the solution from, if it was written
+                with this solution. The lock named after the solution is tried
+                after it.
+        """
         super(SolutionRepository, self).__init__("solution", allow_prerelease=True)
         self.filename = os.path.abspath(filename) if str(filename) != "-" else "-"
+        self.lock_file = lock_file
         self.excluded_packages = excluded_packages or []
         if excluded_packages:
             self.excluded_packages = [
@@ -47,6 +71,11 @@ class SolutionRepository(Repository):
         # hashes
         self._partial_line = ""
 
+        # Requirements of the inputs the solution was compiled from, by project.
+        self.root_reqs: Dict[NormName, packaging.requirements.Requirement] = {}
+        # Every hash recorded for a pin, by project.
+        self.hashes: Dict[NormName, List[str]] = {}
+
         if os.path.exists(filename) or self.filename == "-":
             self.load_from_file(self.filename)
         else:
@@ -96,21 +125,66 @@ class SolutionRepository(Repository):
     def close(self) -> None:
         pass
 
+    @overrides
+    def get_hashes(
+        self, name: str, version: packaging.version.Version
+    ) -> Sequence[str]:
+        key = normalize_project_name(name)
+        node = self.solution.nodes.get(key)
+        if node is None or node.metadata is None or node.metadata.version != version:
+            return []
+        return self.hashes.get(key, [])
+
     def load_from_file(self, filename: str) -> None:
+        start = time.perf_counter()
         self.solution = req_compile.dists.DistributionCollection()
+        self.root_reqs = {}
+        self.hashes = {}
 
         if filename == "-":
-            reqfile = sys.stdin
+            contents = sys.stdin.read()
         else:
-            reqfile = open(filename, encoding="utf-8")
-
-        try:
-            self._load_from_lines(reqfile.readlines(), meta_file=filename)
-        finally:
-            if reqfile is not sys.stdin:
-                reqfile.close()
+            with open(filename, encoding="utf-8") as reqfile:
+                contents = reqfile.read()
+
+        lock = None
+        lock_files = [] if self.lock_file is None else [self.lock_file]
+        if filename != "-":
+            lock_files.append(lock_file_path(filename))
+        for lock_file in lock_files:
+            lock = read_lock_file(lock_file, contents)
+            if lock is not None:
+                self.logger.debug("Loading solution from %s", lock_file)
+                break
+        if lock is not None:
+            self._load_from_lock(lock)
+        else:
+            self._load_from_lines(contents.splitlines(True), meta_file=filename)
 
         self._remove_nodes()
+        self.logger.info(
+            "Loaded %s in %.3f seconds", filename, time.perf_counter() - start
+        )
+
+    def _load_from_lock(self, lock: Mapping[str, Any]) -> None:
+        entries = lock["nodes"].values()
+        pins = {
+            entry["name"]: self._add_pin(
+                req_compile.utils.parse_requirement(
+                    "{}=={}".format(entry["name"], entry["version"])
+                ),
+                url=entry["url"],
+                dist_hashes=entry["hashes"],
+            )
+            for entry in entries
+        }
+        for entry in entries:
+            for via in entry["via"]:
+                self._add_via(
+                    pins[entry["name"]],
+                    via["source"],
+                    req_compile.utils.parse_requirement(via["requirement"]),
+                )
 
     def _load_from_lines(
         self, lines: Iterable[str], meta_file: Optional[str] = None
@@ -129,6 +203,11 @@ class SolutionRepository(Repository):
         for node in self.solution:
             if node.metadata is None or node.metadata.version == missing_ver:
                 nodes_to_remove.append(node)
+                # Sources that aren't pinned themselves are inputs, e.g. a project
+                # directory or stdin.
+                for reason in node.dependencies.values():
+                    if reason is not None:
+                        self._add_root_req(reason)
         for node in nodes_to_remove:
             try:
                 del self.solution.nodes[node.key]
@@ -159,8 +238,7 @@ class SolutionRepository(Repository):
         if not req_hash_part:
             return
 
-        hashes = req_hash_part.split("--hash=")
-        req_part = hashes[0]
+        req_part, *hashes = req_hash_part.split("--hash=")
 
         req = req_compile.utils.parse_requirement(req_part)
 
@@ -211,15 +289,12 @@ class SolutionRepository(Repository):
             sources = source_part.split(", ")
             url = ""
 
-        dist_hash: Optional[str] = None
-        if len(hashes) > 1:
-            dist_hash = hashes[1]
-            if len(hashes) > 2:
-                self.logger.debug("Discarding %d hashes, using first", len(hashes) - 2)
-
         try:
             self._add_sources(
-                req, sources, url=url if url else None, dist_hash=dist_hash
+                req,
+                sources,
+                url=url if url else None,
+                dist_hashes=[dist_hash.strip() for dist_hash in hashes],
             )
         except Exception as ex:
             raise ValueError(f"Failed to parse line: {line}") from ex
@@ -242,7 +317,7 @@ class SolutionRepository(Repository):
         req: packaging.requirements.Requirement,
         sources: Iterable[str],
         url: Optional[str] = None,
-        dist_hash: Optional[str] = None,
+        dist_hashes: Sequence[str] = (),
     ) -> None:
         pkg_names = map(lambda x: x.split(" ", 1)[0], sources)
         constraints = map(
@@ -253,6 +328,22 @@ class SolutionRepository(Repository):
             ),
             sources,
         )
+        metadata = self._add_pin(req, url=url, dist_hashes=dist_hashes)
+        for name, constraint in zip(pkg_names, constraints):
+            self._add_via(
+                metadata, name, _create_metadata_req(req, metadata, name, constraint)
+            )
+
+    def _add_pin(
+        self,
+        req: packaging.requirements.Requirement,
+        url: Optional[str] = None,
+        dist_hashes: Sequence[str] = (),
+    ) -> RequirementContainer:
+        """Add the pinned distribution of a solution line.
+
+        The first of its hashes is the hash of the file that was solved with.
+        """
         version = req_compile.utils.parse_version(next(iter(req.specifier)).version)
 
         metadata = None
@@ -261,7 +352,8 @@ class SolutionRepository(Repository):
         if metadata is None:
             metadata = req_compile.containers.DistInfo(req.name, version, [])
 
-        metadata.hash = dist_hash
+        metadata.hash = dist_hashes[0] if dist_hashes else None
+        self.hashes[normalize_project_name(req.name)] = list(dist_hashes)
 
         metadata.version = version
         metadata.origin = self
@@ -280,39 +372,53 @@ class SolutionRepository(Repository):
         metadata.candidate = candidate
 
         self.solution.add_dist(metadata, None, req)
-        for name, constraint in zip(pkg_names, constraints):
-            if name and not (
-                name.endswith(".txt")
-                or name.endswith(".out")
-                or "\\" in name
-                or "/" in name
-            ):
-                constraint_req = None
-
-                try:
-                    constraint_req = req_compile.utils.parse_requirement(name)
-                    proj_name = constraint_req.name
-                except ValueError:
-                    proj_name = name
-
-                self.solution.add_dist(proj_name, None, constraint_req)
-                reverse_dep = self.solution[name]
-                if reverse_dep.metadata is None:
-                    inner_meta = req_compile.containers.DistInfo(
-                        proj_name,
-                        req_compile.utils.parse_version("0+missing"),
-                        [],
-                    )
-                    inner_meta.origin = ReferenceSourceRepository(inner_meta)
-                    reverse_dep.metadata = inner_meta
-            else:
-                reverse_dep = None
-
-            reason = _create_metadata_req(req, metadata, name, constraint)
-            if reverse_dep is not None:
-                assert reverse_dep.metadata is not None
-                reverse_dep.metadata.reqs.append(reason)
-            self.solution.add_dist(metadata.name, reverse_dep, reason)
+        return metadata
+
+    def _add_via(
+        self,
+        metadata: RequirementContainer,
+        name: str,
+        reason: packaging.requirements.Requirement,
+    ) -> None:
+        """Add the edge from a source, named in a "via" explanation, to a pin."""
+        if name and not (
+            name.endswith(".txt")
+            or name.endswith(".out")
+            or "\\" in name
+            or "/" in name
+        ):
+            constraint_req = None
+
+            try:
+                constraint_req = req_compile.utils.parse_requirement(name)
+                proj_name = constraint_req.name
+            except ValueError:
+                proj_name = name
+
+            self.solution.add_dist(proj_name, None, constraint_req)
+            reverse_dep: Optional[DependencyNode] = self.solution[name]
+            assert reverse_dep is not None
+            if reverse_dep.metadata is None:
+                inner_meta = req_compile.containers.DistInfo(
+                    proj_name,
+                    req_compile.utils.parse_version("0+missing"),
+                    [],
+                )
+                inner_meta.origin = ReferenceSourceRepository(inner_meta)
+                reverse_dep.metadata = inner_meta
+        else:
+            reverse_dep = None
+
+        if reverse_dep is not None:
+            assert reverse_dep.metadata is not None
+            reverse_dep.metadata.add_requirement(reason)
+        else:
+            self._add_root_req(reason)
+        self.solution.add_dist(metadata.name, reverse_dep, reason)
+
+    def _add_root_req(self, req: packaging.requirements.Requirement) -> None:
+        name = normalize_project_name(req.name)
+        self.root_reqs[name] = merge_requirements(self.root_reqs.get(name), req)
 
 
 def _create_metadata_req(
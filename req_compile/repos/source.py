@@ -1,11 +1,29 @@
 """Definition of source repository."""
 
 import collections
+import configparser
 import functools
+import hashlib
 import itertools
+import json
 import os
-from multiprocessing.pool import ThreadPool
-from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+import re
+import tempfile
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 import packaging.requirements
 
@@ -13,10 +31,23 @@ import req_compile.errors
 import req_compile.metadata
 import req_compile.repos.repository
 from req_compile import utils
-from req_compile.containers import RequirementContainer
+from req_compile.containers import (
+    RequirementContainer,
+    metadata_from_dict,
+    metadata_to_dict,
+)
+from req_compile.repos.discovery import (
+    DISCOVERY_MODES,
+    list_git_files,
+    scan_files,
+    walk_listing,
+)
 from req_compile.repos.repository import Candidate, Repository
 from req_compile.utils import parse_version
 
+if TYPE_CHECKING:
+    from multiprocessing.pool import ThreadPool
+
 # Special directories that will never be considered
 SPECIAL_DIRS = {
     ".bazelbsp",
@@ -42,6 +73,129 @@ SPECIAL_DIRS = {
 # that directory from being included in the repository
 MARKER_FILES = {"__init__.py"}
 
+# Files that make a directory a project.
+PROJECT_FILES = {"setup.py", "setup.cfg", "pyproject.toml"}
+
+SCAN_CACHE_VERSION = 1
+
+# Dynamic versions read from other files, e.g. "version = file: VERSION" or
+# "version = attr: pkg.__version__" in setup.cfg or pyproject.toml.
+_VERSION_FILE_RE = re.compile(r"""\bfile\s*[:=]\s*\[?\s*["']?([^"'\s,\]}]+)""")
+_VERSION_ATTR_RE = re.compile(r"""\battr\s*[:=]\s*["']?([\w.]+)""")
+# A literal name passed to setup() in setup.py.
+_SETUP_PY_NAME_RE = re.compile(r"""\bsetup\s*\([^)]*?\bname\s*=\s*["']([^"']+)["']""")
+
+
+def guess_project_name(source_dir: str) -> str:
+    """Guess the name of the project in a directory without extracting its metadata.
+
+    The name is taken from pyproject.toml's [project] table, setup.cfg's [metadata]
+    section or a literal name given to setup() in setup.py, in that order. Otherwise
+    the directory's name is used.
+    """
+    return _declared_project_name(source_dir) or os.path.basename(source_dir)
+
+
+def _declared_project_name(source_dir: str) -> Optional[str]:
+    """The name a project declares in its packaging files, if it can be read as is."""
+    import toml  # pylint: disable=import-outside-toplevel
+
+    try:
+        pyproject = toml.load(os.path.join(source_dir, "pyproject.toml"))
+        name = pyproject.get("project", {})["name"]
+        if isinstance(name, str) and name:
+            return name
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    config = configparser.ConfigParser(interpolation=None)
+    try:
+        config.read(os.path.join(source_dir, "setup.cfg"), encoding="utf-8")
+        name = config.get("metadata", "name", fallback="").strip()
+        if name:
+            return name
+    except (configparser.Error, UnicodeDecodeError):
+        pass
+
+    try:
+        with open(
+            os.path.join(source_dir, "setup.py"), encoding="utf-8", errors="replace"
+        ) as handle:
+            match = _SETUP_PY_NAME_RE.search(handle.read())
+        if match:
+            return match.group(1)
+    except OSError:
+        pass
+
+    return None
+
+
+def _referenced_files(source_dir: str) -> List[str]:
+    """Files outside the top of a project that its version is read from."""
+    referenced = []
+    for config_name in ("setup.cfg", "pyproject.toml"):
+        try:
+            with open(
+                os.path.join(source_dir, config_name),
+                encoding="utf-8",
+                errors="replace",
+            ) as handle:
+                config = handle.read()
+        except OSError:
+            continue
+        referenced.extend(_VERSION_FILE_RE.findall(config))
+        for attr in _VERSION_ATTR_RE.findall(config):
+            module = attr.rpartition(".")[0].replace(".", "/")
+            referenced.extend(
+                (
+                    module + ".py",
+                    module + "/__init__.py",
+                    "src/" + module + ".py",
+                    "src/" + module + "/__init__.py",
+                )
+            )
+    return referenced
+
+
+def source_identity(source_dir: str) -> Dict[str, List[int]]:
+    """Identify the state of a project by the files its metadata is built from.
+
+    These are the files at the top of the project, e.g. setup.py, setup.cfg,
+    pyproject.toml and requirements or version files, and any file its version is
+    declared to be read from.
+
+    Returns:
+        The size and modification time of each file, by path relative to the project.
+    """
+    identity: Dict[str, List[int]] = {}
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                identity[entry.name] = [stat.st_size, stat.st_mtime_ns]
+    for relative_path in _referenced_files(source_dir):
+        try:
+            stat = os.stat(os.path.join(source_dir, relative_path))
+        except OSError:
+            continue
+        identity[relative_path.replace(os.sep, "/")] = [stat.st_size, stat.st_mtime_ns]
+    return identity
+
+
+def _extract_isolated(
+    source_dir: str,
+) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+    """Extract the metadata of a project in a worker process.
+
+    Returns:
+        The project directory, and either its metadata or the reason extraction failed.
+    """
+    try:
+        metadata = req_compile.metadata.extract_metadata(source_dir)
+    except req_compile.errors.MetadataError as ex:
+        return source_dir, None, str(ex)
+    return source_dir, metadata_to_dict(metadata), None
+
 
 class SourceRepository(Repository):
     """Repository for Python projects source code on the filesystem.
@@ -56,6 +210,9 @@ class SourceRepository(Repository):
         excluded_paths: Optional[Iterable[str]] = None,
         marker_files: Optional[Iterable[str]] = None,
         parallelism: int = 1,
+        cache_dir: Optional[str] = None,
+        lazy: bool = False,
+        discovery: str = "walk",
     ) -> None:
         """Constructor.
 
@@ -65,7 +222,16 @@ class SourceRepository(Repository):
                 those included in `SPECIAL_DIRS`
             marker_files (list[str]): Files or directories, that if present, indicate that a discovered
                 source directory should not be included in the repository
-            parallelism: Number of in-process threads to execute when discovering source projects
+            parallelism: Number of in-process threads to execute when discovering source projects.
+                Projects with a setup.py are extracted in as many worker processes, because
+                running setup.py is not thread-safe.
+            cache_dir: Directory in which to keep the metadata of the projects found, so later
+                repositories for the same tree only extract the projects that changed. Defaults
+                to REQ_COMPILE_SOURCE_CACHE_DIR. If neither is set, nothing is kept.
+            lazy: If True, only extract the metadata of projects once they are asked for.
+                Projects are found by a guess of their name, see guess_project_name.
+            discovery: How to find the projects in the tree, one of DISCOVERY_MODES. Only
+                "walk" finds projects that are ignored by git.
         """
         super(SourceRepository, self).__init__(
             "source." + os.path.basename(path).replace(".", "-"), allow_prerelease=True
@@ -82,14 +248,50 @@ class SourceRepository(Repository):
         )
         self.marker_files = set(MARKER_FILES)
         self.parallelism = parallelism
+        if discovery not in DISCOVERY_MODES:
+            raise ValueError(
+                "Unknown source discovery mode {}, expected one of {}".format(
+                    discovery, ", ".join(DISCOVERY_MODES)
+                )
+            )
+        self.discovery = discovery
 
         if marker_files:
             self.marker_files |= set(marker_files)
 
+        cache_dir = cache_dir or os.environ.get("REQ_COMPILE_SOURCE_CACHE_DIR")
+        self.cache_file: Optional[str] = None
+        if cache_dir:
+            # Trees are cached separately for each set of options that affects what's found.
+            cache_key = hashlib.sha256(
+                json.dumps(
+                    [
+                        self.path,
+                        sorted(os.path.abspath(path) for path in excluded_paths or []),
+                        sorted(self.marker_files),
+                        discovery,
+                    ]
+                ).encode("utf-8")
+            ).hexdigest()
+            self.cache_file = os.path.join(
+                cache_dir, "source-{}.json".format(cache_key[:16])
+            )
+        self._scan_entries: Dict[str, Dict[str, Any]] = {}
+        self._identities: Dict[str, Optional[Dict[str, List[int]]]] = {}
+
+        # In lazy mode, the directories not extracted yet, by guessed project name.
+        self.lazy = lazy
+        self._pending: Dict[utils.NormName, List[str]] = {}
+        # Pending directories whose name was guessed from the directory alone.
+        self._undeclared: Set[str] = set()
+        self._pending_lock = threading.Lock()
+
         self._find_later: Deque[str] = collections.deque()
-        self._find_all_distributions(
-            [os.path.abspath(path) for path in (excluded_paths or [])]
-        )
+        # The tree is only scanned once a project is asked for, so compiles that
+        # never need it don't pay for it.
+        self._excluded_paths = [os.path.abspath(path) for path in excluded_paths or []]
+        self._scanned = False
+        self._scan_lock = threading.Lock()
 
     def _extract_metadata(
         self, allow_setup_py: bool, source_dir: str
@@ -111,34 +313,242 @@ class SourceRepository(Repository):
             )
             return source_dir, None
 
+    def _load_scan_cache(self) -> Dict[str, Dict[str, Any]]:
+        if self.cache_file is None:
+            return {}
+        try:
+            with open(self.cache_file, encoding="utf-8") as handle:
+                cache = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(cache, dict) or cache.get("version") != SCAN_CACHE_VERSION:
+            return {}
+        return cache.get("projects", {})
+
+    def _save_scan_cache(self) -> None:
+        if self.cache_file is None:
+            return
+        cache_dir = os.path.dirname(self.cache_file)
+        temp_path = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(
+                dir=cache_dir, prefix=".source-", suffix=".tmp"
+            )
+            with os.fdopen(handle, "w", encoding="utf-8") as out:
+                json.dump(
+                    {"version": SCAN_CACHE_VERSION, "projects": self._scan_entries},
+                    out,
+                    sort_keys=True,
+                )
+            os.replace(temp_path, self.cache_file)
+        except OSError as ex:
+            self.logger.warning("Could not write source scan cache: %s", ex)
+            if temp_path is not None:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+
+    def _add_extracted(
+        self,
+        source_dir: str,
+        result: RequirementContainer,
+        identity: Optional[Dict[str, List[int]]],
+    ) -> None:
+        if identity is not None:
+            self._scan_entries[os.path.relpath(source_dir, self.path)] = {
+                "identity": identity,
+                "metadata": metadata_to_dict(result),
+            }
+        self._add_distribution(source_dir, result)
+
+    @property
+    def initialized(self) -> bool:
+        return self._scanned
+
+    def initialize(self) -> None:
+        """Find the projects in the tree, if that's not done yet."""
+        if self._scanned:
+            return
+        with self._scan_lock:
+            if not self._scanned:
+                start = time.perf_counter()
+                self._find_all_distributions(self._excluded_paths)
+                self._scanned = True
+                self.logger.info(
+                    "Scanned %s in %.3f seconds", self.path, time.perf_counter() - start
+                )
+
     def _find_all_distributions(self, excluded_paths: Iterable[str]) -> None:
         """Find all source distribution possible locations"""
         source_dirs = set(self._find_all_source_dirs(excluded_paths))
 
+        # Projects that are unchanged since they were last scanned are not extracted again.
+        identities = self._identities
+        previous: Dict[str, Dict[str, Any]] = {}
+        if self.cache_file is not None:
+            previous = self._load_scan_cache()
+            for source_dir in sorted(source_dirs):
+                identity = source_identity(source_dir)
+                entry = previous.get(os.path.relpath(source_dir, self.path))
+                if entry is not None and entry.get("identity") == identity:
+                    cached = metadata_from_dict(entry["metadata"])
+                    cached.origin = self
+                    self._add_extracted(source_dir, cached, identity)
+                    source_dirs.discard(source_dir)
+                else:
+                    identities[source_dir] = identity
+            self.logger.info(
+                "Reused metadata of %d source project(s), extracting %d",
+                len(self._scan_entries),
+                len(source_dirs),
+            )
+
+        if self.lazy:
+            for source_dir in source_dirs:
+                name = _declared_project_name(source_dir)
+                if name is None:
+                    name = os.path.basename(source_dir)
+                    self._undeclared.add(source_dir)
+                self._pending.setdefault(utils.normalize_project_name(name), []).append(
+                    source_dir
+                )
+            return
+
         # Loading source distributions via threads can be significantly faster because
         # it is a lot of I/O
         if self.parallelism == 1:
-            pool: Optional[ThreadPool] = None
+            pool: Optional["ThreadPool"] = None
             map_func: Callable = map
         else:
-            pool = ThreadPool(self.parallelism)
+            import multiprocessing.pool  # pylint: disable=import-outside-toplevel
+
+            pool = multiprocessing.pool.ThreadPool(self.parallelism)
             map_func = pool.imap_unordered
         try:
-            for source_dir, result in map_func(
-                functools.partial(self._extract_metadata, False), source_dirs
-            ):
-                if result is not None:
-                    self._add_distribution(source_dir, result)
+            # Results are added in a fixed order, however they were produced.
+            results = sorted(
+                map_func(functools.partial(self._extract_metadata, False), source_dirs),
+                key=lambda item: item[0],
+            )
         finally:
             if pool is not None:
                 pool.close()
+        for source_dir, result in results:
+            if result is not None:
+                self._add_extracted(source_dir, result, identities.get(source_dir))
+
+        for source_dir, result in self._extract_deferred(sorted(self._find_later)):
+            if result is not None:
+                self._add_extracted(source_dir, result, identities.get(source_dir))
+
+        if identities or len(previous) != len(self._scan_entries):
+            self._save_scan_cache()
+
+    def _extract_deferred(
+        self, source_dirs: Sequence[str]
+    ) -> Iterable[Tuple[str, Optional[RequirementContainer]]]:
+        """Extract projects that have a setup.py, in order.
+
+        Each setup.py runs in the process it's extracted in, so projects are extracted
+        in isolated worker processes when running in parallel. That's also the case
+        off the main thread, e.g. when repositories are initialized concurrently, as
+        other threads would see the patches made while a setup.py runs.
+        """
+        if not source_dirs:
+            return []
+        processes = min(self.parallelism, len(source_dirs))
+        if processes <= 1 and threading.current_thread() is threading.main_thread():
+            return [
+                self._extract_metadata(True, source_dir) for source_dir in source_dirs
+            ]
 
-        if self._find_later:
-            for source_dir, result in map(
-                functools.partial(self._extract_metadata, True), self._find_later
+        import multiprocessing  # pylint: disable=import-outside-toplevel
+
+        # Workers are spawned, not forked, as this process may be running threads.
+        with multiprocessing.get_context("spawn").Pool(max(processes, 1)) as pool:
+            extracted = pool.map(_extract_isolated, source_dirs)
+
+        results: List[Tuple[str, Optional[RequirementContainer]]] = []
+        for source_dir, metadata, error in extracted:
+            if metadata is None:
+                self.logger.error(
+                    "Failed to parse metadata for %s - %s", source_dir, error
+                )
+                results.append((source_dir, None))
+                continue
+            result = metadata_from_dict(metadata)
+            result.origin = self
+            results.append((source_dir, result))
+        return results
+
+    def _extract_pending(self, project_name: Optional[utils.NormName]) -> None:
+        """Extract the projects not extracted yet that may be the given project.
+
+        If none of them is the project, the projects whose name could only be guessed
+        from their directory are extracted too, as one of them may be it.
+
+        The lock is held until they are added, so that threads asking for the same
+        project wait for them rather than finding nothing.
+
+        Args:
+            project_name: The project being asked for, or None for all projects.
+        """
+        with self._pending_lock:
+            if project_name is None:
+                source_dirs = self._take_pending(lambda source_dir: True)
+            else:
+                source_dirs = self._pending.pop(project_name, [])
+            self._extract_source_dirs(source_dirs)
+            if (
+                project_name is not None
+                and not self.distributions.get(project_name)
+                and self._undeclared
             ):
-                if result is not None:
-                    self._add_distribution(source_dir, result)
+                self._extract_source_dirs(
+                    self._take_pending(self._undeclared.__contains__)
+                )
+
+    def _take_pending(self, predicate: Callable[[str], bool]) -> List[str]:
+        """Remove the pending directories matching the predicate and return them."""
+        taken: List[str] = []
+        for name, pending in list(self._pending.items()):
+            taken.extend(source_dir for source_dir in pending if predicate(source_dir))
+            pending = [
+                source_dir for source_dir in pending if not predicate(source_dir)
+            ]
+            if pending:
+                self._pending[name] = pending
+            else:
+                del self._pending[name]
+        return taken
+
+    def _extract_source_dirs(self, source_dirs: Sequence[str]) -> None:
+        """Extract and add projects that were pending.
+
+        Must be called with the pending lock held.
+        """
+        if not source_dirs:
+            return
+        self._undeclared.difference_update(source_dirs)
+
+        with_setup_py = []
+        results = []
+        for source_dir in sorted(source_dirs):
+            if os.path.exists(os.path.join(source_dir, "setup.py")):
+                with_setup_py.append(source_dir)
+            else:
+                results.append(self._extract_metadata(True, source_dir))
+        results.extend(self._extract_deferred(with_setup_py))
+
+        for source_dir, result in sorted(results, key=lambda item: item[0]):
+            if result is not None:
+                self._add_extracted(
+                    source_dir, result, self._identities.get(source_dir)
+                )
+        if self.cache_file is not None:
+            self._save_scan_cache()
 
     def _add_distribution(self, source_dir: str, result: RequirementContainer) -> None:
         if result.version is None:
@@ -157,19 +567,58 @@ class SourceRepository(Repository):
         candidate.preparsed = result
         self.distributions[utils.normalize_project_name(result.name)].append(candidate)
 
+    def _is_pruned(self, root: str, excluded_paths: Iterable[str]) -> bool:
+        filename = os.path.basename(root)
+        if filename in SPECIAL_DIRS or filename.startswith("bazel-"):
+            return True
+        return any(
+            os.path.commonprefix((root, excluded_path)) == excluded_path
+            for excluded_path in excluded_paths
+        )
+
+    def _walk(
+        self, excluded_paths: Sequence[str]
+    ) -> Iterable[Tuple[str, List[str], List[str]]]:
+        """Walk the tree top-down, as the discovery mode sees it."""
+        if self.discovery == "walk":
+            return os.walk(self.path)
+
+        def keep(rel_path: str) -> bool:
+            parts = rel_path.split("/")
+            return parts[-1] in PROJECT_FILES or any(
+                part in self.marker_files for part in parts
+            )
+
+        paths = None
+        if self.discovery in ("git", "auto"):
+            paths = list_git_files(self.path)
+            if paths is not None:
+                # Tracked files may have been deleted from the working tree.
+                paths = [
+                    path
+                    for path in paths
+                    if keep(path)
+                    and os.path.lexists(os.path.join(self.path, *path.split("/")))
+                ]
+            elif self.discovery == "git":
+                self.logger.warning(
+                    "%s is not in a git working tree, scanning it instead", self.path
+                )
+        if paths is None:
+            paths = scan_files(
+                self.path,
+                keep,
+                lambda rel_path: self._is_pruned(
+                    os.path.join(self.path, *rel_path.split("/")), excluded_paths
+                ),
+                parallelism=self.parallelism,
+            )
+        return walk_listing(self.path, paths)
+
     def _find_all_source_dirs(self, excluded_paths: Iterable[str]) -> Iterable[str]:
-        for root, dirs, files in os.walk(self.path):
-            is_excluded = False
-            filename = os.path.basename(root)
-            if filename in SPECIAL_DIRS:
-                is_excluded = True
-            elif filename.startswith("bazel-"):
-                is_excluded = True
-            else:
-                for excluded_path in excluded_paths:
-                    if os.path.commonprefix((root, excluded_path)) == excluded_path:
-                        is_excluded = True
-                        break
+        excluded_paths = list(excluded_paths)
+        for root, dirs, files in self._walk(excluded_paths):
+            is_excluded = self._is_pruned(root, excluded_paths)
 
             # Check if any this directory contains any marker directories.
             if not is_excluded:
@@ -188,10 +637,7 @@ class SourceRepository(Repository):
                 dirs[:] = []
                 continue
 
-            root_is_valid = False
-            for filename in files:
-                if filename in ("setup.py", "setup.cfg", "pyproject.toml"):
-                    root_is_valid = True
+            root_is_valid = any(filename in PROJECT_FILES for filename in files)
 
             if root_is_valid:
                 # Remove test directories from search.
@@ -220,10 +666,13 @@ class SourceRepository(Repository):
     def get_candidates(
         self, req: Optional[packaging.requirements.Requirement]
     ) -> Sequence[Candidate]:
-        if req is None:
-            return list(itertools.chain(*self.distributions.values()))
+        self.initialize()
+        project_name = None if req is None else utils.normalize_project_name(req.name)
+        if self.lazy:
+            self._extract_pending(project_name)
 
-        project_name = utils.normalize_project_name(req.name)
+        if project_name is None:
+            return list(itertools.chain(*self.distributions.values()))
         return self.distributions.get(project_name, [])
 
     def resolve_candidate(
@@ -250,6 +699,8 @@ class ReferenceSourceRepository(SourceRepository):
         if dist.version is None:
             raise ValueError(f"Version of {dist.name} must be known")
         self.path = dist.name
+        self.lazy = False
+        self._scanned = True
         self.distributions = {
             dist.name: [
                 Candidate(dist.name, None, dist.version, None, None, "any", None)
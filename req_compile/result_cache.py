@@ -0,0 +1,218 @@
+"""On-disk cache of whole compile results.
+
+A compile is fully determined by its inputs: the requirement and constraint files,
+the repositories it draws distributions from, the options it ran with and the
+code of req-compile itself. The only exception is the state of remote indices,
+which can be pinned with an optional snapshot id. A fingerprint of all of these
+keys a previously written solution, so an unchanged compile can be answered by
+loading that solution rather than resolving against the repositories again.
+
+Entries are written to a temporary file and moved into place, so any number of
+processes may share a cache directory and will only ever read complete entries.
+"""
+
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Optional, Union
+
+from req_compile.daemon import code_fingerprint
+from req_compile.target import current_target
+
+LOG = logging.getLogger("req_compile.result_cache")
+
+CACHE_VERSION = "1"
+
+# Directories that never contain project sources.
+_SKIPPED_DIRS = {".git", ".hg", ".svn", ".tox", ".nox", "__pycache__", "node_modules"}
+
+
+def _hash_file(digest: Any, path: Union[str, Path]) -> None:
+    try:
+        with open(path, "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 16), b""):
+                digest.update(block)
+    except OSError:
+        digest.update(b"<missing>")
+
+
+def _hash_listing(digest: Any, root: Union[str, Path], recursive: bool) -> None:
+    """Hash the names, sizes and modification times of the files in a directory."""
+    if not os.path.isdir(root):
+        digest.update(b"<missing>")
+        return
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            dirname
+            for dirname in dirnames
+            if recursive
+            and dirname not in _SKIPPED_DIRS
+            and not dirname.endswith(".egg-info")
+        )
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+            entries.append(
+                (
+                    os.path.relpath(full_path, root).replace(os.sep, "/"),
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                )
+            )
+    for entry in sorted(entries):
+        digest.update("{}\0{}\0{}\n".format(*entry).encode("utf-8"))
+
+
+def compile_fingerprint(
+    requirement_files: Mapping[str, Union[str, Path]],
+    constraint_files: Optional[Mapping[str, Union[str, Path]]] = None,
+    solutions: Iterable[Union[str, Path]] = (),
+    sources: Iterable[Union[str, Path]] = (),
+    find_links: Iterable[Union[str, Path]] = (),
+    index_urls: Iterable[str] = (),
+    extra_index_urls: Iterable[str] = (),
+    options: Optional[Mapping[str, Any]] = None,
+    index_snapshot: Optional[str] = None,
+) -> str:
+    """Compute the key of a compile in the result cache.
+
+    Files are identified by their contents. Find-links directories and source trees
+    are identified by the names, sizes and modification times of their files, which
+    is enough to notice added, removed or rebuilt distributions and edited projects.
+
+    Args:
+        requirement_files: Input files, by the name they are referred to with.
+        constraint_files: Constraint files, by the name they are referred to with.
+        solutions: Solution files the compile starts from.
+        sources: Source trees searched for projects.
+        find_links: Find-links directories.
+        index_urls: Index URLs, in priority order.
+        extra_index_urls: Extra index URLs, in priority order.
+        options: Any other options that affect the result, e.g. only_binary. Values
+            are compared by their repr.
+        index_snapshot: An id for the state of the remote indices. Without one,
+            changes to the indices don't invalidate cached results.
+
+    Returns:
+        A hex digest.
+    """
+    digest = hashlib.sha256()
+
+    def section(name: str) -> None:
+        digest.update("\0{}\0".format(name).encode("utf-8"))
+
+    section("version")
+    digest.update(CACHE_VERSION.encode("utf-8"))
+    digest.update(code_fingerprint().encode("utf-8"))
+
+    section("environment")
+    target = current_target()
+    if target is None:
+        digest.update(sys.version.encode("utf-8"))
+        digest.update(sys.platform.encode("utf-8"))
+    else:
+        digest.update(repr(target).encode("utf-8"))
+
+    for name, files in (
+        ("requirements", requirement_files),
+        ("constraints", constraint_files or {}),
+    ):
+        section(name)
+        for file_name, path in sorted(files.items()):
+            digest.update(file_name.encode("utf-8") + b"\0")
+            _hash_file(digest, path)
+
+    section("solutions")
+    for solution in solutions:
+        _hash_file(digest, solution)
+
+    for name, directories, recursive in (
+        ("sources", sources, True),
+        ("find_links", find_links, False),
+    ):
+        section(name)
+        for directory in directories:
+            digest.update(str(directory).encode("utf-8") + b"\0")
+            _hash_listing(digest, directory, recursive)
+
+    for name, urls in (
+        ("index_urls", index_urls),
+        ("extra_index_urls", extra_index_urls),
+    ):
+        section(name)
+        for url in urls:
+            digest.update(url.encode("utf-8") + b"\0")
+
+    section("options")
+    for key, value in sorted((options or {}).items()):
+        digest.update("{}={!r}\n".format(key, value).encode("utf-8"))
+
+    section("index_snapshot")
+    digest.update((index_snapshot or "").encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """A directory of solutions, keyed by the fingerprint of their compile."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+
+    def __repr__(self) -> str:
+        return "ResultCache({})".format(self.path)
+
+    def _entry(self, key: str) -> Path:
+        return self.path / key[:2] / "{}.txt".format(key)
+
+    def get(self, key: str) -> Optional[Path]:
+        """Look up a solution.
+
+        Args:
+            key: Fingerprint of the compile.
+
+        Returns:
+            The path of the stored solution, or None if there is none.
+        """
+        entry = self._entry(key)
+        if entry.is_file():
+            LOG.info("Found cached result %s", key)
+            return entry
+        LOG.debug("No cached result for %s", key)
+        return None
+
+    def put(self, key: str, solution: str) -> Path:
+        """Store a solution, replacing any existing one.
+
+        Args:
+            key: Fingerprint of the compile.
+            solution: Contents of the solution file. It must include explanations,
+                so the dependency graph can be loaded from it again.
+
+        Returns:
+            The path of the stored solution.
+        """
+        entry = self._entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(
+            dir=entry.parent, prefix=".{}-".format(key[:8]), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as out:
+                out.write(solution)
+            os.replace(temp_path, entry)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        LOG.info("Stored result %s", key)
+        return entry
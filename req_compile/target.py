@@ -0,0 +1,318 @@
+"""Description of the environment a solution is compiled for.
+
+By default the interpreter running req-compile decides which distributions are
+compatible and how environment markers evaluate. A TargetEnvironment describes a
+different Python version, ABI or platform so that solutions for other systems can
+be compiled locally. The target is held in a context variable, so it applies to
+everything compiled in the current thread or context.
+"""
+
+import contextlib
+import contextvars
+import platform
+import re
+import sys
+from functools import lru_cache
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    cast,
+)
+
+import packaging.markers
+import packaging.tags
+import packaging.version
+
+# PEP-600 legacy platform tags
+LEGACY_ALIASES = {
+    "manylinux1_x86_64": "manylinux_2_5_x86_64",
+    "manylinux1_i686": "manylinux_2_5_i686",
+    "manylinux2010_x86_64": "manylinux_2_12_x86_64",
+    "manylinux2010_i686": "manylinux_2_12_i686",
+    "manylinux2014_x86_64": "manylinux_2_17_x86_64",
+    "manylinux2014_i686": "manylinux_2_17_i686",
+}
+MANYLINUX_REGEX = r"manylinux_([0-9]+)_([0-9]+)_(.*)"
+MUSLLINUX_REGEX = r"musllinux_([0-9]+)_([0-9]+)_(.*)"
+MACOSX_REGEX = r"macosx_([0-9]+)_([0-9]+)_(.*)"
+
+INTERPRETER_NAMES = {
+    "cp": ("cpython", "CPython"),
+    "pp": ("pypy", "PyPy"),
+    "ip": ("ironpython", "IronPython"),
+    "jy": ("jython", "Jython"),
+}
+
+WINDOWS_MACHINES = {
+    "win32": "x86",
+    "win_amd64": "AMD64",
+    "win_arm64": "ARM64",
+}
+
+
+class TargetEnvironment(NamedTuple):
+    """The Python version, ABI and platform to compile a solution for."""
+
+    python_version: packaging.version.Version
+    """Full version of the target interpreter."""
+
+    implementation: str
+    """Interpreter tag prefix, e.g. cp for CPython."""
+
+    abi_tags: Tuple[str, ...]
+    """Supported ABI tags, lowest priority first."""
+
+    platform_tags: Tuple[str, ...]
+    """Supported platform tags, highest priority first. Empty for the platform
+    req-compile runs on."""
+
+    @classmethod
+    def create(
+        cls,
+        python_version: Optional[str] = None,
+        platforms: Iterable[str] = (),
+        abis: Iterable[str] = (),
+        implementation: Optional[str] = None,
+    ) -> "TargetEnvironment":
+        """Build a target, filling anything not given from the running interpreter.
+
+        Args:
+            python_version: Version of the target Python, e.g. 3.10 or 3.12.1.
+            platforms: Platform tags of the target, e.g. manylinux_2_28_x86_64 or
+                win_amd64. Older compatible tags, like earlier manylinux and macOS
+                versions, are implied.
+            abis: ABI tags supported by the target. Defaults to the stable and
+                version specific ABIs of the target Python.
+            implementation: Interpreter tag prefix. Defaults to the running one.
+        """
+        version = packaging.version.Version(
+            python_version
+            if python_version
+            else "{}.{}.{}".format(*sys.version_info[:3])
+        )
+        if len(version.release) < 2:
+            raise ValueError(
+                "Target Python version {} needs a major and minor version".format(
+                    python_version
+                )
+            )
+        if implementation is None:
+            implementation = _host_implementation()
+
+        abi_tags = tuple(abis)
+        if not abi_tags:
+            major, minor = version.release[:2]
+            abi_suffix = "m" if (major, minor) < (3, 8) else ""
+            abi_tags = (
+                "abi{}".format(major),
+                "{}{}{}{}".format(implementation, major, minor, abi_suffix),
+            )
+
+        platform_tags: List[str] = []
+        for plat in platforms:
+            for tag in expand_platform_tag(plat):
+                if tag not in platform_tags:
+                    platform_tags.append(tag)
+
+        return cls(version, implementation, abi_tags, tuple(platform_tags))
+
+    @property
+    def major_minor(self) -> Tuple[int, int]:
+        return self.python_version.release[0], self.python_version.release[1]
+
+    def marker_environment(self) -> Dict[str, str]:
+        """Environment marker variables describing this target."""
+        return dict(_marker_environment(self))
+
+    def marker(self) -> str:
+        """An environment marker expression matching this target."""
+        env = self.marker_environment()
+        variables = ["python_version"]
+        if self.platform_tags:
+            variables += ["sys_platform", "platform_machine"]
+        return " and ".join(
+            '{} == "{}"'.format(variable, env[variable]) for variable in variables
+        )
+
+    @property
+    def name(self) -> str:
+        """A short name of the target, usable in file names."""
+        major, minor = self.major_minor
+        return "{}{}{}-{}".format(
+            self.implementation,
+            major,
+            minor,
+            self.platform_tags[0] if self.platform_tags else "host",
+        )
+
+    def __str__(self) -> str:
+        return "Python {} ({}) on {}".format(
+            self.python_version,
+            ", ".join(self.abi_tags),
+            self.platform_tags[0] if self.platform_tags else "this platform",
+        )
+
+
+def parse_target(spec: str) -> TargetEnvironment:
+    """Parse a target given as PYTHON[:PLATFORM[:ABI]], e.g. 3.12:win_amd64.
+
+    Several platforms or ABIs can be separated by commas.
+    """
+    python_version, _, rest = spec.partition(":")
+    platforms, _, abis = rest.partition(":")
+    try:
+        return TargetEnvironment.create(
+            python_version=python_version or None,
+            platforms=[plat for plat in platforms.split(",") if plat],
+            abis=[abi for abi in abis.split(",") if abi],
+        )
+    except packaging.version.InvalidVersion:
+        raise ValueError("Invalid Python version in target {}".format(spec))
+
+
+def _host_implementation() -> str:
+    for tag, (_, name) in INTERPRETER_NAMES.items():
+        if name == platform.python_implementation():
+            return tag
+    return "cp"
+
+
+def expand_platform_tag(tag: str) -> List[str]:
+    """Expand a platform tag to all tags a system with that platform supports.
+
+    Args:
+        tag: Platform tag, e.g. manylinux2014_x86_64, macosx_11_0_arm64.
+
+    Returns:
+        The supported tags, highest priority first.
+    """
+    tag = tag.lower().replace("-", "_").replace(".", "_")
+    tag = LEGACY_ALIASES.get(tag, tag)
+
+    manylinux_match = re.match(MANYLINUX_REGEX, tag)
+    if manylinux_match is not None:
+        major, minor, arch = manylinux_match.groups()
+        result = [
+            "manylinux_{}_{}_{}".format(major, older, arch)
+            for older in range(int(minor), -1, -1)
+        ]
+        result.extend(
+            legacy
+            for legacy, alias in LEGACY_ALIASES.items()
+            if alias in result and legacy.endswith(arch)
+        )
+        return result
+
+    musllinux_match = re.match(MUSLLINUX_REGEX, tag)
+    if musllinux_match is not None:
+        major, minor, arch = musllinux_match.groups()
+        return [
+            "musllinux_{}_{}_{}".format(major, older, arch)
+            for older in range(int(minor), -1, -1)
+        ]
+
+    macosx_match = re.match(MACOSX_REGEX, tag)
+    if macosx_match is not None:
+        major, minor, arch = macosx_match.groups()
+        return list(
+            packaging.tags.mac_platforms(version=(int(major), int(minor)), arch=arch)
+        )
+
+    return [tag]
+
+
+@lru_cache(maxsize=None)
+def _marker_environment(target: TargetEnvironment) -> Tuple[Tuple[str, str], ...]:
+    # All marker variables are strings.
+    env = cast(Dict[str, str], packaging.markers.default_environment())
+
+    major, minor = target.major_minor
+    release = target.python_version.release + (0,)
+    full_version = ".".join(str(part) for part in release[:3])
+    impl_name, impl_python_name = INTERPRETER_NAMES.get(
+        target.implementation, (target.implementation, target.implementation)
+    )
+    env.update(
+        {
+            "implementation_name": impl_name,
+            "implementation_version": full_version,
+            "platform_python_implementation": impl_python_name,
+            "python_full_version": full_version,
+            "python_version": "{}.{}".format(major, minor),
+        }
+    )
+
+    if target.platform_tags:
+        plat = target.platform_tags[0]
+        if plat.startswith("win"):
+            env.update(
+                {
+                    "os_name": "nt",
+                    "sys_platform": "win32",
+                    "platform_system": "Windows",
+                    "platform_machine": WINDOWS_MACHINES.get(plat, ""),
+                }
+            )
+        elif plat.startswith("macosx"):
+            arch = plat.split("_", 3)[-1]
+            env.update(
+                {
+                    "os_name": "posix",
+                    "sys_platform": "darwin",
+                    "platform_system": "Darwin",
+                    "platform_machine": "arm64" if arch == "universal2" else arch,
+                }
+            )
+        else:
+            linux_plat = re.sub(r"^(many|musl)linux_[0-9]+_[0-9]+", "linux", plat)
+            _, _, arch = linux_plat.partition("_")
+            env.update(
+                {
+                    "os_name": "posix",
+                    "sys_platform": "linux",
+                    "platform_system": "Linux",
+                    "platform_machine": arch,
+                }
+            )
+        # The release of a foreign system is unknown.
+        env["platform_release"] = ""
+        env["platform_version"] = ""
+    return tuple(sorted(env.items()))
+
+
+_TARGET: contextvars.ContextVar[Optional[TargetEnvironment]] = contextvars.ContextVar(
+    "req_compile_target", default=None
+)
+
+
+def current_target() -> Optional[TargetEnvironment]:
+    """The environment being compiled for, or None for the running interpreter."""
+    return _TARGET.get()
+
+
+def marker_environment() -> Optional[Dict[str, str]]:
+    """Marker variables of the current target, or None for the running interpreter."""
+    target = _TARGET.get()
+    if target is None:
+        return None
+    return target.marker_environment()
+
+
+def set_target(target: Optional[TargetEnvironment]) -> contextvars.Token:
+    """Compile for the given target in the current context from now on."""
+    return _TARGET.set(target)
+
+
+@contextlib.contextmanager
+def use_target(target: Optional[TargetEnvironment]) -> Iterator[None]:
+    """Compile for the given target within the block."""
+    token = _TARGET.set(target)
+    try:
+        yield
+    finally:
+        _TARGET.reset(token)
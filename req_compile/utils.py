@@ -1,13 +1,46 @@
+import contextvars
+import hashlib
 import logging
 import os
+import threading
 import typing
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import lru_cache
-from typing import DefaultDict, Dict, Iterable, Optional, Tuple
-
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import packaging.markers
 import packaging.requirements
+import packaging.specifiers
 import packaging.version
 
+from req_compile.markers import marker_cache_info
+
+# Upper bounds of the parsing caches, so long-running and batch compiles don't grow
+# without limit.
+REQUIREMENT_CACHE_SIZE = int(
+    os.environ.get("REQ_COMPILE_REQUIREMENT_CACHE_SIZE", "16384")
+)
+VERSION_CACHE_SIZE = int(os.environ.get("REQ_COMPILE_VERSION_CACHE_SIZE", "16384"))
+
+T = TypeVar("T")
+U = TypeVar("U")
+
 
 def reduce_requirements(
     raw_reqs: Iterable[packaging.requirements.Requirement],
@@ -25,12 +58,185 @@ def reduce_requirements(
     return list(req for req in reqs.values() if req is not None)
 
 
+class CacheInfo(NamedTuple):
+    """Statistics of a bounded cache, matching functools' cache_info()."""
+
+    hits: int
+    misses: int
+    maxsize: Optional[int]
+    currsize: int
+
+
+class InternTable:
+    """A bounded table mapping a structural key to one canonical object.
+
+    The least recently used entries are evicted once the table is full.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Fetch the canonical object for the key, or None if there isn't one."""
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def intern(self, key: Hashable, value: Any) -> Any:
+        """Store the value as canonical for the key, unless there already is one.
+
+        Returns:
+            The canonical object for the key.
+        """
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                self._entries.move_to_end(key)
+                return existing
+            self._entries[key] = value
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return value
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self._hits, self._misses, self.maxsize, len(self._entries))
+
+    def cache_clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+class KeyedLocks:
+    """A lock per key, so that the same work is never done twice concurrently
+    by threads compiling in parallel.
+
+    A key's lock is only kept while it is held or waited for, so the locks don't
+    grow with the number of keys ever used.
+    """
+
+    def __init__(self) -> None:
+        self._locks: Dict[Hashable, Tuple[threading.Lock, int]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def __call__(self, key: Hashable) -> Iterator[None]:
+        with self._lock:
+            lock, users = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = lock, users + 1
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                users = self._locks[key][1] - 1
+                if users:
+                    self._locks[key] = lock, users
+                else:
+                    del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+def map_concurrently(function: Callable[[T], U], items: Iterable[T]) -> List[U]:
+    """Call function on each item in a thread of its own, returning results in order.
+
+    Each call runs in a copy of the caller's context, so it sees the same target
+    environment. The first exception raised, in the order of the items, is re-raised
+    once all calls are done.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [function(item) for item in items]
+    with ThreadPoolExecutor(max_workers=len(items)) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, function, item)
+            for item in items
+        ]
+    return [future.result() for future in futures]
+
+
+RequirementKey = Tuple[
+    str, FrozenSet[str], FrozenSet[str], Optional[str], Optional[str]
+]
+
+INTERNED_REQUIREMENTS = InternTable(REQUIREMENT_CACHE_SIZE)
+
+
+def _requirement_key(
+    name: str,
+    extras: Iterable[str],
+    specifiers: Iterable[packaging.specifiers.Specifier],
+    marker: Optional[packaging.markers.Marker],
+    url: Optional[str],
+) -> RequirementKey:
+    # The name is kept as spelled, since it is displayed in solutions.
+    return (
+        name,
+        frozenset(extras),
+        frozenset(str(spec) for spec in specifiers),
+        str(marker) if marker else None,
+        url,
+    )
+
+
+def intern_requirement(
+    req: packaging.requirements.Requirement,
+) -> packaging.requirements.Requirement:
+    """Fetch the canonical object for a requirement.
+
+    Requirements that differ only in formatting, such as the order of their
+    specifiers or extras, share one object. Interned requirements must not be modified.
+    """
+    return INTERNED_REQUIREMENTS.intern(
+        _requirement_key(req.name, req.extras, req.specifier, req.marker, req.url), req
+    )
+
+
+def _build_requirement(
+    name: str,
+    extras: Iterable[str],
+    specifiers: Iterable[packaging.specifiers.Specifier],
+    marker: Optional[packaging.markers.Marker],
+) -> packaging.requirements.Requirement:
+    """Construct an interned requirement from already parsed parts."""
+    specifiers = set(specifiers)
+    key = _requirement_key(name, extras, specifiers, marker, None)
+    req = INTERNED_REQUIREMENTS.get(key)
+    if req is not None:
+        return req
+
+    req = packaging.requirements.Requirement.__new__(packaging.requirements.Requirement)
+    req.name = name
+    req.url = None
+    req.extras = set(extras)
+    req.specifier = packaging.specifiers.SpecifierSet(
+        ",".join(sorted(str(spec) for spec in specifiers))
+    )
+    req.marker = marker
+    return INTERNED_REQUIREMENTS.intern(key, req)
+
+
 class CommentError(ValueError):
     def __str__(self):
         return "Text given is a comment"
 
 
-@lru_cache(maxsize=None)
+@lru_cache(maxsize=REQUIREMENT_CACHE_SIZE)
 def parse_requirement(req_text: str) -> packaging.requirements.Requirement:
     """Parse a string into a Requirement object.
 
@@ -49,10 +255,10 @@ def parse_requirement(req_text: str) -> packaging.requirements.Requirement:
         raise ValueError("No requirement given")
     if req_text[0] == "#":
         raise CommentError
-    return packaging.requirements.Requirement(req_text)
+    return intern_requirement(packaging.requirements.Requirement(req_text))
 
 
-@lru_cache(maxsize=None)
+@lru_cache(maxsize=VERSION_CACHE_SIZE)
 def parse_version(version: str) -> packaging.version.Version:
     """Parse a string into a packaging version.
 
@@ -196,30 +402,41 @@ def merge_requirements(
     all_specs = set(req1.specifier) | set(req2.specifier)
 
     # Handle markers
+    new_marker: Optional[packaging.markers.Marker] = None
     if req1.marker and req2.marker:
-        if str(req1.marker) != str(req2.marker):
-            if str(req1.marker) in str(req2.marker):
-                new_marker = ";" + str(req1.marker)
-            elif str(req2.marker) in str(req1.marker):
-                new_marker = ";" + str(req2.marker)
-            else:
-                new_marker = ""
-        else:
-            new_marker = ";" + str(req1.marker)
-    else:
-        new_marker = ""
-
-    extras = merge_extras(req1.extras, req2.extras)
-    extras_str = ""
-    if extras:
-        extras_str = "[" + ",".join(extras) + "]"
-    req_str = (
-        req1_name_norm
-        + extras_str
-        + ",".join(str(part) for part in all_specs)
-        + new_marker
+        marker1 = str(req1.marker)
+        marker2 = str(req2.marker)
+        if marker1 == marker2 or marker1 in marker2:
+            new_marker = req1.marker
+        elif marker2 in marker1:
+            new_marker = req2.marker
+
+    return _build_requirement(
+        req1_name_norm,
+        merge_extras(req1.extras, req2.extras),
+        all_specs,
+        new_marker,
+    )
+
+
+def cache_stats() -> Dict[str, CacheInfo]:
+    """Report the sizes and hit rates of the parsing and interning caches."""
+    return {
+        "parse_requirement": _lru_cache_info(parse_requirement.cache_info()),
+        "parse_version": _lru_cache_info(parse_version.cache_info()),
+        "interned_requirements": INTERNED_REQUIREMENTS.cache_info(),
+        "markers": _lru_cache_info(marker_cache_info()),
+    }
+
+
+def _lru_cache_info(info: Any) -> CacheInfo:
+    """Convert the cache_info() of an lru_cache."""
+    return CacheInfo(
+        hits=info.hits,
+        misses=info.misses,
+        maxsize=info.maxsize,
+        currsize=info.currsize,
     )
-    return parse_requirement(req_str)
 
 
 NormName = typing.NewType("NormName", str)
@@ -271,6 +488,32 @@ def has_prerelease(req: packaging.requirements.Requirement) -> bool:
     return False
 
 
+def hash_file(path: str) -> str:
+    """Hash a distribution file, in the form used by --hash options, e.g. sha256:abc."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 16), b""):
+            hasher.update(block)
+    return "sha256:" + hasher.hexdigest()
+
+
+# Algorithms pip accepts in --hash options.
+HASH_ALGORITHMS = frozenset(("sha256", "sha384", "sha512"))
+
+
+def link_hash(resource: str) -> Optional[str]:
+    """The digest advertised in a link's fragment, e.g. #sha256=abc, as sha256:abc.
+
+    Digests of algorithms pip doesn't accept in --hash options, like md5, are
+    ignored.
+    """
+    _, _, fragment = resource.partition("#")
+    algorithm, _, digest = fragment.partition("=")
+    if algorithm not in HASH_ALGORITHMS or not digest:
+        return None
+    return f"{algorithm}:{digest}"
+
+
 @lru_cache(maxsize=None)
 def get_glibc_version() -> Optional[Tuple[int, int]]:
     """Based on PEP 513/600."""
@@ -0,0 +1,138 @@
+"""Check that an existing solution still satisfies its inputs, without resolving.
+
+Verification only reads the solution and the inputs. The pins, and the dependency
+edges recorded by the solution's explanations, are taken as they are. Every input
+and constraint requirement and every recorded edge is checked against the pinned
+versions. No repository is consulted, so no network access is needed.
+"""
+
+import logging
+from typing import Iterable, List, Optional, Set
+
+import packaging.requirements
+
+from req_compile.containers import RequirementContainer
+from req_compile.dists import DependencyNode
+from req_compile.repos.solution import SolutionRepository
+from req_compile.utils import normalize_project_name
+
+LOG = logging.getLogger("req_compile.verify")
+
+
+def _check_requirement(
+    solution: SolutionRepository,
+    req: packaging.requirements.Requirement,
+    source: str,
+    required: bool,
+    problems: List[str],
+) -> Optional[DependencyNode]:
+    key = normalize_project_name(req.name)
+    node = solution.solution.nodes.get(key)
+    if node is None or node.metadata is None:
+        if required:
+            problems.append(
+                f"{req.name} is required by {source} ({req}) but no satisfying "
+                "version is pinned"
+            )
+        return None
+
+    version = node.metadata.version
+    if version is not None and not req.specifier.contains(version, prereleases=True):
+        problems.append(
+            f"{node.metadata.name}=={version} does not satisfy {source} ({req})"
+        )
+
+    # Inputs that are files have no node of their own, their extras are only kept
+    # with the root requirements.
+    root_req = solution.root_reqs.get(key)
+    recorded_extras = set(root_req.extras) if root_req is not None else set()
+    for reverse_dep in node.reverse_deps:
+        reason = reverse_dep.dependencies.get(node)
+        if reason is not None:
+            recorded_extras |= reason.extras
+    missing_extras = set(req.extras) - recorded_extras
+    if missing_extras:
+        problems.append(
+            "{} is required with extras [{}] by {} that the solution "
+            "does not include".format(
+                node.metadata.name, ",".join(sorted(missing_extras)), source
+            )
+        )
+    return node
+
+
+def verify_solution(
+    solution: SolutionRepository,
+    input_reqs: Iterable[RequirementContainer],
+    constraint_reqs: Optional[Iterable[RequirementContainer]] = None,
+) -> List[str]:
+    """Check whether a solution satisfies the given inputs.
+
+    Args:
+        solution: The solution to check. It must have been written with explanations,
+            which record the dependency edges between pins.
+        input_reqs: Requirements that must be part of the solution.
+        constraint_reqs: Constraints that pins must satisfy, if they are part of it.
+
+    Returns:
+        A description of each problem found. The solution is valid if this is empty.
+    """
+    problems: List[str] = []
+    roots: Set[DependencyNode] = set()
+
+    for containers, required in (
+        (input_reqs, True),
+        (constraint_reqs or [], False),
+    ):
+        for container in containers:
+            if not container.meta and container.version is not None:
+                # A project from a source directory must itself be pinned.
+                project_node = _check_requirement(
+                    solution,
+                    packaging.requirements.Requirement(
+                        f"{container.name}=={container.version}"
+                    ),
+                    container.name,
+                    required,
+                    problems,
+                )
+                if project_node is not None and required:
+                    roots.add(project_node)
+            for req in container.requires():
+                node = _check_requirement(
+                    solution, req, container.name, required, problems
+                )
+                if node is not None and required:
+                    roots.add(node)
+
+    for node in sorted(solution.solution):
+        if node.metadata is None:
+            continue
+        for reason in node.dependencies.values():
+            if reason is None:
+                continue
+            # Pins conflicting with a recorded edge are unsolved while loading the
+            # solution, so they show up as missing.
+            _check_requirement(
+                solution,
+                reason,
+                f"{node.metadata.name}=={node.metadata.version}",
+                True,
+                problems,
+            )
+
+    required_nodes = set(solution.solution.visit_nodes(roots)) | roots
+    for node in sorted(solution.solution):
+        # Pins with no recorded reason can't be judged.
+        if (
+            node not in required_nodes
+            and node.metadata is not None
+            and node.reverse_deps
+        ):
+            problems.append(
+                f"{node.metadata.name}=={node.metadata.version} is no longer "
+                "required by the inputs"
+            )
+
+    LOG.info("Found %d problem(s) in %s", len(problems), solution.filename)
+    return problems
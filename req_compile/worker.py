@@ -0,0 +1,117 @@
+"""Bazel persistent worker support.
+
+Bazel can keep a tool running between actions and send it work requests instead of
+starting a process per action. This implements the JSON flavor of the protocol: each
+line of standard input is a WorkRequest and each line written to standard output is
+the WorkResponse of a request. Requests are handled one at a time, each as if it ran
+in a process of its own, while the caches of req-compile are kept between them.
+"""
+
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from typing import IO, Any, Callable, List, Optional, Sequence
+
+from req_compile.daemon import WarmRunner
+
+LOG = logging.getLogger("req_compile.worker")
+
+WORKER_FLAG = "--persistent_worker"
+
+
+def expand_arguments(arguments: Sequence[str]) -> List[str]:
+    """Expand the flag files among a work request's arguments.
+
+    An argument of the form @path is replaced by the lines of the file at path. @@ at
+    the start of an argument stands for a single @.
+    """
+    expanded: List[str] = []
+    for argument in arguments:
+        if argument.startswith("@@"):
+            expanded.append(argument[1:])
+        elif argument.startswith("@"):
+            with open(argument[1:], encoding="utf-8") as handle:
+                expanded.extend(handle.read().splitlines())
+        else:
+            expanded.append(argument)
+    return expanded
+
+
+def serve_requests(
+    function: Callable[[], Any],
+    prog: str,
+    requests: IO[str],
+    responses: IO[str],
+    runner: WarmRunner,
+) -> None:
+    """Handle work requests until the requests are exhausted.
+
+    Args:
+        function: Entry point to run for each request, with the request's arguments
+            in sys.argv.
+        prog: Program name, sys.argv[0] during each request.
+        requests: Stream of JSON WorkRequests, one per line.
+        responses: Stream to write JSON WorkResponses to, one per line.
+        runner: Runs the requests.
+    """
+    for line in requests:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        # Cancellation is not supported, Bazel only asks workers that say they do.
+        if request.get("cancel"):
+            continue
+
+        response: dict = {}
+        if request.get("requestId"):
+            response["requestId"] = request["requestId"]
+        try:
+            argv = expand_arguments(request.get("arguments", []))
+        except OSError as ex:
+            response.update(exitCode=1, output=f"ERROR: {ex}\n")
+        else:
+            stdout, stderr, exit_code = runner.run(
+                function, prog, argv, cwd=request.get("sandboxDir") or None
+            )
+            response.update(exitCode=exit_code, output=stdout + stderr)
+        responses.write(json.dumps(response) + "\n")
+        responses.flush()
+
+
+def worker_main(
+    function: Callable[[], Any], prog: str, cache_dir: Optional[str] = None
+) -> None:
+    """Run as a persistent worker on this process' standard streams.
+
+    Args:
+        function: Entry point to run for each request.
+        prog: Program name of the entry point.
+        cache_dir: Directory to keep downloads and source tree scans in. By default a
+            temporary directory removed when the worker exits.
+    """
+    # Only responses may be written to standard output. Output of anything else,
+    # such as subprocesses writing to the inherited descriptor, goes to stderr.
+    responses = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    for logger in (LOG, logging.getLogger("req_compile.daemon")):
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    worker_cache_dir = cache_dir or tempfile.mkdtemp(prefix="req-compile-worker-")
+    try:
+        LOG.info("Serving work requests for %s", prog)
+        with responses:
+            serve_requests(
+                function, prog, sys.stdin, responses, WarmRunner(worker_cache_dir)
+            )
+    finally:
+        if not cache_dir:
+            shutil.rmtree(worker_cache_dir, ignore_errors=True)
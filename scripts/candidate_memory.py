@@ -0,0 +1,91 @@
+"""Benchmark the memory held by candidates and dependency graph nodes.
+
+Builds a synthetic index page worth of candidates, similar to what a large project
+like numpy publishes, and reports the memory retained per object.
+"""
+
+import argparse
+import gc
+import tracemalloc
+from typing import Any, Callable, List
+
+from req_compile.containers import DistInfo
+from req_compile.dists import DependencyNode
+from req_compile.repos.repository import filename_to_candidate
+from req_compile.utils import normalize_project_name, parse_version
+
+PLATFORMS = (
+    "manylinux_2_17_x86_64.manylinux2014_x86_64",
+    "manylinux_2_17_aarch64.manylinux2014_aarch64",
+    "musllinux_1_1_x86_64",
+    "macosx_10_9_x86_64",
+    "macosx_11_0_arm64",
+    "win32",
+    "win_amd64",
+)
+PYTHONS = ("cp39", "cp310", "cp311", "cp312", "cp313")
+
+
+def _page_filenames(count: int) -> List[str]:
+    filenames = []
+    version = 0
+    while len(filenames) < count:
+        version += 1
+        ver_str = "{}.{}.{}".format(version // 100, (version // 10) % 10, version % 10)
+        filenames.append("project-{}.tar.gz".format(ver_str))
+        for python in PYTHONS:
+            for plat in PLATFORMS:
+                filenames.append(
+                    "project-{}-{}-{}-{}.whl".format(ver_str, python, python, plat)
+                )
+    return filenames[:count]
+
+
+def _measure(label: str, count: int, build: Callable[[int], List[Any]]) -> None:
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objects = build(count)
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        "{:<16} {:>8} objects {:>12,} bytes {:>8.1f} bytes/object".format(
+            label, len(objects), after - before, (after - before) / len(objects)
+        )
+    )
+
+
+def _build_candidates(count: int) -> List[Any]:
+    return [
+        filename_to_candidate(("https://pypi.org/simple/project/", filename), filename)
+        for filename in _page_filenames(count)
+    ]
+
+
+def _build_nodes(count: int) -> List[Any]:
+    nodes = []
+    for idx in range(count):
+        name = "project-{}".format(idx)
+        dist = DistInfo(name, parse_version("1.0"), [])
+        nodes.append(DependencyNode(normalize_project_name(name), dist))
+    return nodes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--count", type=int, default=20000, help="Number of objects to create"
+    )
+    args = parser.parse_args()
+
+    # Warm up caches that are shared between all objects, like parsed versions.
+    _build_candidates(args.count)
+    _build_nodes(args.count)
+
+    _measure("Candidate", args.count, _build_candidates)
+    _measure("DependencyNode", args.count, _build_nodes)
+
+
+if __name__ == "__main__":
+    main()
@@ -30,7 +30,8 @@ setup(
     license="MIT License",
     entry_points={
         "console_scripts": [
-            "req-compile = req_compile.cmdline:compile_main",
+            "req-compile = req_compile.cmdline:main",
+            "req-compile-daemon = req_compile.daemon:daemon_main",
             "req-candidates = req_compile.candidates:candidates_main",
         ],
     },
@@ -15,6 +15,7 @@ import pytest
 import req_compile.metadata
 import req_compile.metadata.dist_info
 import req_compile.metadata.metadata
+import req_compile.repos.pypi
 import req_compile.utils
 from req_compile.containers import RequirementContainer
 from req_compile.repos.repository import Candidate, Repository
@@ -31,6 +32,9 @@ def clear_caches():
     """Fixture to automatically clear the LRU cache for
     the requirement parsing cache"""
     req_compile.utils.parse_requirement.cache_clear()
+    req_compile.utils.INTERNED_REQUIREMENTS.cache_clear()
+    req_compile.repos.pypi.clear_page_caches()
+    req_compile.metadata.metadata.ARCHIVE_METADATA.cache_clear()
 
 
 @pytest.fixture
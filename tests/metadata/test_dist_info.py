@@ -1,6 +1,13 @@
 import os
+import zipfile
 
-from req_compile.metadata.dist_info import _find_dist_info_metadata
+import pytest
+
+from req_compile.metadata.dist_info import (
+    _fetch_from_wheel,
+    _find_dist_info_metadata,
+    _read_wheel_metadata,
+)
 
 
 def test_wheel_with_vendored():
@@ -39,3 +46,93 @@ def test_best_effort_match():
 def test_not_found():
     """Bad zips won't have any metadata"""
     assert _find_dist_info_metadata("bad", ["totally", "wrong", "files"]) is None
+
+
+METADATA_CONTENTS = (
+    "Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\nRequires-Dist: six\n"
+)
+
+
+def _build_wheel(path, members, compression=zipfile.ZIP_DEFLATED, prefix=b""):
+    with open(path, "wb") as handle:
+        handle.write(prefix)
+        with zipfile.ZipFile(handle, "w", compression=compression) as zfile:
+            for name, contents in members:
+                with zfile.open(name, "w", force_zip64=True) as member:
+                    member.write(contents.encode("utf-8"))
+    return path
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED])
+def test_read_wheel_metadata(tmp_path, compression):
+    wheel = _build_wheel(
+        tmp_path / "normal-1.0-py3-none-any.whl",
+        [
+            ("normal/__init__.py", ""),
+            ("normal-1.0.dist-info/METADATA", METADATA_CONTENTS.format(name="normal")),
+            ("normal-1.0.dist-info/RECORD", ""),
+        ],
+        compression=compression,
+    )
+    assert _read_wheel_metadata(wheel) == METADATA_CONTENTS.format(
+        name="normal"
+    ).encode("utf-8")
+
+    dist = _fetch_from_wheel(wheel)
+    assert dist.name == "normal"
+    assert [str(req) for req in dist.reqs] == ["six"]
+
+
+def test_read_wheel_metadata_vendored(tmp_path):
+    """The project's own dist-info is preferred, even if it isn't last"""
+    wheel = _build_wheel(
+        tmp_path / "pex-2.1.3-py3-none-any.whl",
+        [
+            ("pex-2.1.3.dist-info/METADATA", METADATA_CONTENTS.format(name="pex")),
+            (
+                "pex/vendor/_vendored/pip-20.0.dist-info/METADATA",
+                METADATA_CONTENTS.format(name="pip"),
+            ),
+        ],
+    )
+    assert _fetch_from_wheel(wheel).name == "pex"
+
+
+def test_read_wheel_metadata_many_vendored(tmp_path):
+    """The project's own dist-info is found behind any number of vendored ones"""
+    wheel = _build_wheel(
+        tmp_path / "pex-2.1.3-py3-none-any.whl",
+        [("pex-2.1.3.dist-info/METADATA", METADATA_CONTENTS.format(name="pex"))]
+        + [
+            (
+                "pex/vendor/_vendored/dep{0}-1.0.dist-info/METADATA".format(idx),
+                METADATA_CONTENTS.format(name="dep{}".format(idx)),
+            )
+            for idx in range(40)
+        ],
+    )
+    assert _fetch_from_wheel(wheel).name == "pex"
+
+
+def test_read_wheel_metadata_prefixed(tmp_path):
+    """Data prepended to the archive shifts all offsets"""
+    wheel = _build_wheel(
+        tmp_path / "normal-1.0-py3-none-any.whl",
+        [("normal-1.0.dist-info/METADATA", METADATA_CONTENTS.format(name="normal"))],
+        prefix=b"#!/usr/bin/env python\n",
+    )
+    assert _fetch_from_wheel(wheel).name == "normal"
+
+
+def test_read_wheel_metadata_missing(tmp_path):
+    wheel = _build_wheel(
+        tmp_path / "normal-1.0-py3-none-any.whl", [("normal/__init__.py", "")]
+    )
+    assert _read_wheel_metadata(wheel) is None
+
+
+def test_read_wheel_metadata_empty(tmp_path):
+    wheel = tmp_path / "empty-1.0-py3-none-any.whl"
+    wheel.write_bytes(b"")
+    with pytest.raises(zipfile.BadZipFile):
+        _read_wheel_metadata(wheel)
@@ -0,0 +1,132 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from req_compile.repos.discovery import (
+    is_ignored,
+    list_git_files,
+    parse_gitignore,
+    scan_files,
+    walk_listing,
+)
+from req_compile.repos.source import SourceRepository
+
+
+@pytest.fixture
+def monorepo_dir():
+    return os.path.join(os.path.dirname(__file__), "monorepo")
+
+
+@pytest.mark.parametrize(
+    "pattern, path, is_dir, ignored",
+    [
+        ("build", "build", True, True),
+        ("build", "a/b/build", False, True),
+        ("build/", "a/build", False, False),
+        ("/build", "a/build", True, False),
+        ("/build", "build", True, True),
+        ("*.egg-info", "src/pkg.egg-info", True, True),
+        ("a/**/out", "a/x/y/out", True, True),
+        ("a/**/out", "a/out", True, True),
+        ("**/venv", "deep/venv", True, True),
+        ("data/*", "data/file", False, True),
+        ("data/*", "data/sub/file", False, False),
+        ("file?.txt", "file1.txt", False, True),
+        ("[ab].py", "b.py", False, True),
+    ],
+)
+def test_gitignore_patterns(pattern, path, is_dir, ignored):
+    assert is_ignored(parse_gitignore(pattern, ""), path, is_dir) is ignored
+
+
+def test_gitignore_negation_and_base():
+    rules = parse_gitignore("*.txt\n!keep.txt\n# comment\n", "sub")
+
+    assert is_ignored(rules, "sub/x.txt", False)
+    assert not is_ignored(rules, "sub/keep.txt", False)
+    assert not is_ignored(rules, "other/x.txt", False)
+
+
+@pytest.mark.parametrize("parallelism", [1, 4])
+def test_scan_files(tmp_path, parallelism):
+    for path in (
+        "a/setup.py",
+        "a/readme",
+        "ignored/setup.py",
+        "b/c/pyproject.toml",
+        "b/c/data.bin",
+        "b/skip/setup.py",
+    ):
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("")
+    (tmp_path / ".gitignore").write_text("ignored/\n")
+    (tmp_path / "b" / ".gitignore").write_text("data.bin\n")
+
+    assert scan_files(
+        str(tmp_path),
+        keep=lambda path: path.endswith((".py", ".toml", ".bin")),
+        prune=lambda path: path.endswith("skip"),
+        parallelism=parallelism,
+    ) == ["a/setup.py", "b/c/pyproject.toml"]
+
+
+def test_walk_listing():
+    walked = [
+        (root, list(dirs), files)
+        for root, dirs, files in walk_listing("top", ["a/b/f1", "a/f2", "c/f3", "f4"])
+    ]
+
+    assert walked == [
+        ("top", ["a", "c"], ["f4"]),
+        (os.path.join("top", "a"), ["b"], ["f2"]),
+        (os.path.join("top", "a", "b"), [], ["f1"]),
+        (os.path.join("top", "c"), [], ["f3"]),
+    ]
+
+
+def test_walk_listing_prunes():
+    walked = []
+    for root, dirs, _ in walk_listing("top", ["a/b/f1", "c/f3"]):
+        walked.append(root)
+        if "a" in dirs:
+            dirs.remove("a")
+
+    assert walked == ["top", os.path.join("top", "c")]
+
+
+def _projects(repo):
+    return sorted(
+        (candidate.name, os.path.relpath(candidate.filename, repo.path))
+        for candidate in repo.get_candidates(None)
+    )
+
+
+def test_scan_discovery_matches_walk(monorepo_dir):
+    assert _projects(SourceRepository(monorepo_dir, discovery="scan")) == _projects(
+        SourceRepository(monorepo_dir)
+    )
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_git_discovery(monorepo_dir, tmp_path):
+    tree = tmp_path / "monorepo"
+    shutil.copytree(monorepo_dir, tree)
+    subprocess.run(["git", "init", "-q", str(tree)], check=True)
+    (tree / ".gitignore").write_text("pkg2/\n")
+    shutil.rmtree(tree / "pkg1")
+
+    files = list_git_files(str(tree))
+    assert files is not None
+    assert "pkg2/setup.py" not in files
+
+    projects = _projects(SourceRepository(str(tree), discovery="git"))
+    assert projects == _projects(SourceRepository(str(tree), discovery="scan"))
+    assert [name for name, _ in projects] == ["pkg3", "pkg4"]
+    assert list_git_files(str(tmp_path / "not-a-repo")) is None
+
+
+def test_unknown_discovery(monorepo_dir):
+    with pytest.raises(ValueError):
+        SourceRepository(monorepo_dir, discovery="magic")
@@ -1,9 +1,15 @@
 import os
 import subprocess
 import sys
+import zipfile
 from pathlib import Path
 
+from packaging.requirements import Requirement
+
+import req_compile.metadata
+import req_compile.utils
 from req_compile.repos.findlinks import FindLinksRepository
+from req_compile.utils import parse_version
 
 
 def test_find_links(tmpdir: Path) -> None:
@@ -37,3 +43,76 @@ def test_relative_to_repr(tmpdir: Path) -> None:
         str(FindLinksRepository(tmpdir / "wheeldir", relative_to=tmpdir / "3rdparty"))
         == "--find-links ../wheeldir"
     )
+
+
+def _write_wheel(directory: Path, name: str, version: str, requires: str) -> None:
+    with zipfile.ZipFile(
+        directory / f"{name}-{version}-py3-none-any.whl", "w"
+    ) as wheel:
+        wheel.writestr(
+            f"{name}-{version}.dist-info/METADATA",
+            f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+            f"Requires-Dist: {requires}\n",
+        )
+
+
+def test_candidates_by_name(tmp_path: Path) -> None:
+    _write_wheel(tmp_path, "my_pkg", "1.0", "six")
+    _write_wheel(tmp_path, "my_pkg", "2.0", "six")
+    _write_wheel(tmp_path, "other", "1.0", "six")
+
+    repo = FindLinksRepository(tmp_path)
+
+    assert [
+        str(candidate.version)
+        for candidate in repo.get_candidates(Requirement("My.Pkg"))
+    ] == ["1.0", "2.0"]
+    assert len(repo.get_candidates(None)) == 3
+    assert repo.get_candidates(Requirement("missing")) == []
+
+
+def test_sidecar_reused(tmp_path: Path, mocker) -> None:
+    _write_wheel(tmp_path, "my_pkg", "1.0", "six>1; python_version > '3'")
+    repo = FindLinksRepository(tmp_path)
+    (candidate,) = repo.get_candidates(Requirement("my_pkg"))
+
+    first, _ = repo.resolve_candidate(candidate)
+    assert os.path.isfile(tmp_path / ".req-compile" / f"{candidate.filename}.json")
+
+    extract_spy = mocker.spy(req_compile.metadata, "extract_metadata")
+    hash_spy = mocker.spy(req_compile.utils, "hash_file")
+    second, _ = FindLinksRepository(tmp_path).resolve_candidate(candidate)
+
+    assert extract_spy.call_count == 0
+    assert hash_spy.call_count == 0
+    assert second.name == first.name
+    assert second.version == first.version
+    assert second.hash == first.hash
+    assert [str(req) for req in second.reqs] == [str(req) for req in first.reqs]
+    assert second.origin is not None
+
+
+def test_sidecar_stale(tmp_path: Path) -> None:
+    _write_wheel(tmp_path, "my_pkg", "1.0", "six")
+    (candidate,) = FindLinksRepository(tmp_path).get_candidates(None)
+    before, _ = FindLinksRepository(tmp_path).resolve_candidate(candidate)
+
+    # The archive is rebuilt in place.
+    _write_wheel(tmp_path, "my_pkg", "1.0", "attrs")
+    after, _ = FindLinksRepository(tmp_path).resolve_candidate(candidate)
+
+    assert [str(req) for req in after.reqs] == ["attrs"]
+    assert after.hash != before.hash
+
+
+def test_sidecar_user_cache(tmp_path: Path, monkeypatch) -> None:
+    wheels = tmp_path / "wheels"
+    wheels.mkdir()
+    _write_wheel(wheels, "my_pkg", "1.0", "six")
+    monkeypatch.setenv("REQ_COMPILE_FINDLINKS_CACHE_DIR", str(tmp_path / "cache"))
+
+    repo = FindLinksRepository(wheels)
+    assert repo.get_hashes("my_pkg", parse_version("1.0"))
+
+    assert not (wheels / ".req-compile").exists()
+    assert list((tmp_path / "cache").glob("*/*.whl.json"))
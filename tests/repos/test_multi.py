@@ -1,3 +1,4 @@
+import threading
 from unittest import mock
 
 import pytest
@@ -92,3 +93,41 @@ def test_fetch_in_order():
     assert len(candidates) == 1
     assert candidates[0].name == "nonsense"
     assert candidates[0].version == parse_version("1.0")
+
+
+class LazyFakeRepository(FakeRepository):
+    def __init__(self, name, barrier):
+        super(LazyFakeRepository, self).__init__(name)
+        self.barrier = barrier
+        self._initialized = False
+
+    @property
+    def initialized(self):
+        return self._initialized
+
+    def initialize(self):
+        # Only passes once every repository is initializing at the same time.
+        self.barrier.wait()
+        self._initialized = True
+
+
+def test_initialize_when_needed():
+    """Repositories are initialized together, once the ones before them miss"""
+    barrier = threading.Barrier(2, timeout=10)
+    first = FakeRepository("1")
+    first.get_candidates.side_effect = lambda req: (
+        [Candidate("found", ".", parse_version("1.0"), None, None, "any", "")]
+        if req.name == "found"
+        else []
+    )
+    lazy2 = LazyFakeRepository("2", barrier)
+    lazy3 = LazyFakeRepository("3", barrier)
+    multi = MultiRepository(first, MultiRepository(lazy2, lazy3))
+
+    multi.get_dist(Requirement("found"))
+    assert not multi.initialized
+
+    with pytest.raises(NoCandidateException):
+        multi.get_dist(Requirement("missing"))
+    assert lazy2.initialized and lazy3.initialized
+    assert list(multi) == [first, lazy2, lazy3]
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import platform
 
@@ -341,3 +342,198 @@ def test_simple_index_whitespace_in_links(mocked_responses, mock_py_version, tmp
     assert len(candidates) == 2
     assert candidates[0].version == parse_version("0.0.0")
     assert candidates[1].version == parse_version("0.0.1")
+
+
+def test_simple_json_index(mocked_responses, mock_py_version, tmpdir):
+    mock_py_version("3.11.6")
+
+    page = {
+        "meta": {"api-version": "1.0"},
+        "name": "my-package",
+        "files": [
+            {
+                "filename": "my_package-0.0.1-py3-none-any.whl",
+                "url": "https://files.example.com/my_package-0.0.1-py3-none-any.whl",
+                "hashes": {"sha256": "def456"},
+            },
+            {
+                "filename": "my_package-0.0.2-py3-none-any.whl",
+                "url": "https://files.example.com/my_package-0.0.2-py3-none-any.whl",
+                "hashes": {},
+                "requires-python": ">=4",
+            },
+        ],
+    }
+    mocked_responses.add(
+        responses.GET,
+        INDEX_URL + "/my-package/",
+        json=page,
+        content_type="application/vnd.pypi.simple.v1+json",
+        status=200,
+    )
+    repo = PyPIRepository(INDEX_URL, str(tmpdir))
+
+    candidates = repo.get_candidates(Requirement("my-package"))
+
+    assert [candidate.version for candidate in candidates] == [parse_version("0.0.1")]
+    assert candidates[0].link == (
+        INDEX_URL + "/my-package/",
+        "https://files.example.com/my_package-0.0.1-py3-none-any.whl#sha256=def456",
+    )
+    assert "application/vnd.pypi.simple.v1+json" in (
+        mocked_responses.calls[0].request.headers["Accept"]
+    )
+
+
+def test_get_hashes_downloads_only_undigested(
+    mocked_responses, mock_py_version, tmpdir
+):
+    mock_py_version("3.11.6")
+
+    html = """\
+<html><body>
+    <a href="my_package-1.0-cp311-cp311-win_amd64.whl#sha256=abc">my_package-1.0-cp311-cp311-win_amd64.whl</a>
+    <a href="my_package-1.0-cp311-cp311-manylinux1_x86_64.whl#sha256=def">my_package-1.0-cp311-cp311-manylinux1_x86_64.whl</a>
+    <a href="my_package-1.0.tar.gz">my_package-1.0.tar.gz</a>
+    <a href="my_package-1.0.zip#md5=123">my_package-1.0.zip</a>
+    <a href="my_package-2.0.tar.gz">my_package-2.0.tar.gz</a>
+</body></html>"""
+    mocked_responses.add(
+        responses.GET, INDEX_URL + "/my-package/", body=html, status=200
+    )
+    mocked_responses.add(
+        responses.GET, INDEX_URL + "/my-package/my_package-1.0.tar.gz", body=b"sdist"
+    )
+    mocked_responses.add(
+        responses.GET, INDEX_URL + "/my-package/my_package-1.0.zip", body=b"zip"
+    )
+    repo = PyPIRepository(INDEX_URL, str(tmpdir))
+
+    hashes = repo.get_hashes("my_package", parse_version("1.0"))
+
+    expected = {
+        "sha256:abc",
+        "sha256:def",
+        "sha256:" + hashlib.sha256(b"sdist").hexdigest(),
+        # md5 digests can't be used with --hash.
+        "sha256:" + hashlib.sha256(b"zip").hexdigest(),
+    }
+    assert set(hashes) == expected
+    # The index page, and the files without a usable digest.
+    assert len(mocked_responses.calls) == 3
+
+    # Computed hashes are kept, the files are not downloaded again.
+    assert set(repo.get_hashes("my_package", parse_version("1.0"))) == expected
+    assert len(mocked_responses.calls) == 3
+
+
+def test_links_parser_chunked(read_contents):
+    """Pages fed in any pieces give the same links as fed at once"""
+    content = read_contents("numpy.html")
+    whole = req_compile.repos.pypi.LinksHTMLParser(INDEX_URL, project_name="numpy")
+    whole.feed(content)
+    whole.close()
+
+    chunked = req_compile.repos.pypi.LinksHTMLParser(INDEX_URL, project_name="numpy")
+    for start in range(0, len(content), 97):
+        chunked.feed(content[start : start + 97])
+    chunked.close()
+
+    assert len(whole.links) == 2427
+    assert chunked.links == whole.links
+
+
+def test_links_parser_other_projects():
+    lp = req_compile.repos.pypi.LinksHTMLParser(INDEX_URL, project_name="My.Package")
+    lp.feed(
+        '<a href="my_package-1.0.tar.gz">my_package-1.0.tar.gz</a>'
+        '<a href="my_package_extra-1.0.tar.gz">my_package_extra-1.0.tar.gz</a>'
+        '<a href="other-1.0.tar.gz">other-1.0.tar.gz</a>'
+    )
+    lp.close()
+    assert [link.filename for link in lp.links] == [
+        "my_package-1.0.tar.gz",
+        "my_package_extra-1.0.tar.gz",
+    ]
+
+
+class _StreamedResponse:
+    url = INDEX_URL + "/my-package/"
+    headers = {"Content-Type": "text/html"}
+    status_code = 200
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.received = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            self.received += 1
+            yield chunk
+
+
+def test_stream_page_links():
+    """Links are produced as the page arrives, even with characters split in pieces"""
+    response = _StreamedResponse(
+        [
+            '<a href="my_package-1.0.tar.gz">my_package-1.0.tar.gz</a><a href="my_pack'.encode(),
+            'age-2.0.tar.gz">my_package-2.0.tar.gz</a><a href="my_package-é'.encode()[
+                :-1
+            ],
+            'é-3.0.tar.gz">x</a>'.encode()[1:],
+        ]
+    )
+
+    links = req_compile.repos.pypi._stream_page_links(response, "my-package")
+
+    assert next(links).filename == "my_package-1.0.tar.gz"
+    assert response.received == 1
+    assert [link.href for link in links] == ["my_package-2.0.tar.gz"]
+
+
+def test_fetch_page_streams_candidates(monkeypatch):
+    """Candidates are made while the rest of the page is still being received"""
+    response = _StreamedResponse(
+        [
+            b'<a href="my_package-1.0.tar.gz">my_package-1.0.tar.gz</a>',
+            b'<a href="my_package-2.0.tar.gz">my_package-2.0.tar.gz</a>',
+        ]
+    )
+
+    class _Session:
+        def get(self, url, **kwargs):
+            return response
+
+    received = []
+    filename_to_candidate = req_compile.repos.pypi.filename_to_candidate
+
+    def _filename_to_candidate(link, filename):
+        received.append(response.received)
+        return filename_to_candidate(link, filename)
+
+    monkeypatch.setattr(
+        req_compile.repos.pypi, "filename_to_candidate", _filename_to_candidate
+    )
+
+    candidates = req_compile.repos.pypi._fetch_page(
+        INDEX_URL, "my-package", _Session(), 0
+    )
+    assert [str(candidate.version) for candidate in candidates] == ["1.0", "2.0"]
+    assert received == [1, 2]
+
+    # The page's links are kept, and not fetched again.
+    response.chunks = []
+    cached = req_compile.repos.pypi._fetch_page(INDEX_URL, "my-package", _Session(), 0)
+    assert [candidate.filename for candidate in cached] == [
+        "my_package-1.0.tar.gz",
+        "my_package-2.0.tar.gz",
+    ]
@@ -9,6 +9,7 @@ from packaging.requirements import Requirement
 import req_compile.compile
 from req_compile.cmdline import write_requirements_file
 from req_compile.containers import DistInfo
+from req_compile.lock import lock_file_path
 from req_compile.repos import RepositoryInitializationError
 from req_compile.repos.findlinks import FindLinksRepository
 from req_compile.repos.multi import MultiRepository
@@ -290,3 +291,219 @@ def test_load_multi_line_hash():
     )
 
     assert solution_repo.solution["myreq"].metadata.hash == "myhash:567"
+
+
+def _write_solution(results, nodes, repo, path):
+    with path.open("w", encoding="utf-8") as fh:
+        write_requirements_file(results, nodes, repo=repo, write_to=fh)
+    return path
+
+
+@pytest.mark.parametrize(
+    "roots, new_roots, excluded, reused",
+    [
+        (["d"], ["d", "f"], [], {"a", "b", "c", "d"}),
+        (["d", "f"], ["d"], [], {"a", "b", "c", "d"}),
+        (["d", "f"], ["d", "f>=1"], [], {"a", "b", "c", "d"}),
+        (["d", "f"], ["d", "f"], ["b"], {"a", "d", "f"}),
+        (["d"], ["d<1"], [], set()),
+        (["d", "f"], ["d", 'f ; python_version >= "3"'], [], {"a", "b", "c", "d"}),
+    ],
+)
+def test_incremental_compile(
+    mock_metadata, mock_pypi, tmp_path, roots, new_roots, excluded, reused
+):
+    mock_pypi.load_scenario("normal")
+    results, nodes = req_compile.compile.perform_compile(
+        [DistInfo("test", None, list(parse_requirements(roots)), meta=True)],
+        mock_pypi,
+    )
+    solution_repo = SolutionRepository(
+        _write_solution(results, nodes, mock_pypi, tmp_path / "solution.txt"),
+        excluded_packages=excluded,
+    )
+
+    inputs = [DistInfo("test", None, list(parse_requirements(new_roots)), meta=True)]
+    results, nodes = req_compile.compile.perform_compile(
+        inputs,
+        mock_pypi,
+        previous_solution=solution_repo,
+    )
+    expected, expected_nodes = req_compile.compile.perform_compile(inputs, mock_pypi)
+
+    assert {
+        node.metadata.to_definition(node.extras) for node in results.visit_nodes(nodes)
+    } == {
+        node.metadata.to_definition(node.extras)
+        for node in expected.visit_nodes(expected_nodes)
+    }
+    assert {
+        node.key
+        for node in results
+        if node.key in solution_repo.solution
+        and node.metadata is solution_repo.solution[node.key].metadata
+    } == reused
+
+
+def test_load_solution_root_reqs():
+    solution_repo = SolutionRepository(
+        os.path.join(os.path.dirname(__file__), "..", "solutionfile.txt")
+    )
+    assert solution_repo.root_reqs == {
+        "astroid": Requirement("astroid"),
+        "pylint": Requirement("pylint>=1.5"),
+    }
+
+
+def _graph(solution_repo):
+    return {
+        node.key: (
+            str(node.metadata.version),
+            node.metadata.hash,
+            node.metadata.candidate.link,
+            sorted(dep.key for dep in node.dependencies),
+            sorted(node.extras),
+        )
+        for node in solution_repo.solution
+    }
+
+
+@pytest.mark.parametrize(
+    "roots", [["a"], ["d"], ["e", "d"], ["a[x1,x2,x3]"], ["a", "b", "c"]]
+)
+def test_lock_file_round_trip(mock_metadata, mock_pypi, tmp_path, mocker, roots):
+    mock_pypi.load_scenario("normal")
+    results, nodes = req_compile.compile.perform_compile(
+        [DistInfo("test", None, list(parse_requirements(roots)), meta=True)],
+        mock_pypi,
+    )
+
+    solution_path = tmp_path / "requirements.txt"
+    lock_path = lock_file_path(solution_path)
+    assert lock_path.name == "requirements.lock.json"
+    with solution_path.open("w", encoding="utf-8") as fh, lock_path.open(
+        "w", encoding="utf-8"
+    ) as lock_fh:
+        write_requirements_file(
+            results, nodes, repo=mock_pypi, hashes=True, write_to=fh, lock_to=lock_fh
+        )
+
+    parse_spy = mocker.spy(SolutionRepository, "_load_from_lines")
+    from_lock = SolutionRepository(solution_path)
+    assert parse_spy.call_count == 0
+
+    lock_path.unlink()
+    from_text = SolutionRepository(solution_path)
+    assert parse_spy.call_count == 1
+
+    assert _graph(from_lock) == _graph(from_text)
+    assert from_lock.root_reqs == from_text.root_reqs
+
+
+def test_lock_file_elsewhere(mock_metadata, mock_pypi, tmp_path, mocker):
+    mock_pypi.load_scenario("normal")
+    results, nodes = req_compile.compile.perform_compile(
+        [DistInfo("test", None, list(parse_requirements(["d"])), meta=True)],
+        mock_pypi,
+    )
+
+    solution_path = tmp_path / "requirements.txt"
+    lock_path = tmp_path / "app.json"
+    with solution_path.open("w", encoding="utf-8") as fh, lock_path.open(
+        "w", encoding="utf-8"
+    ) as lock_fh:
+        write_requirements_file(
+            results, nodes, repo=mock_pypi, write_to=fh, lock_to=lock_fh
+        )
+
+    parse_spy = mocker.spy(SolutionRepository, "_load_from_lines")
+    SolutionRepository(solution_path)
+    assert parse_spy.call_count == 1
+    SolutionRepository(solution_path, lock_file=lock_path)
+    assert parse_spy.call_count == 1
+
+
+def test_lock_file_stale(mock_metadata, mock_pypi, tmp_path):
+    mock_pypi.load_scenario("normal")
+    results, nodes = req_compile.compile.perform_compile(
+        [DistInfo("test", None, list(parse_requirements(["d"])), meta=True)],
+        mock_pypi,
+    )
+
+    solution_path = tmp_path / "requirements.txt"
+    with solution_path.open("w", encoding="utf-8") as fh, lock_file_path(
+        solution_path
+    ).open("w", encoding="utf-8") as lock_fh:
+        write_requirements_file(
+            results, nodes, repo=mock_pypi, write_to=fh, lock_to=lock_fh
+        )
+
+    # The solution was edited after the lock was written.
+    solution_path.write_text(
+        solution_path.read_text(encoding="utf-8").replace("c==1.0.0", "c==1.0.1"),
+        encoding="utf-8",
+    )
+    solution_repo = SolutionRepository(solution_path)
+    assert solution_repo.solution["c"].metadata.version == parse_version("1.0.1")
+
+
+def test_solution_keeps_all_hashes(tmp_path):
+    solution_path = tmp_path / "requirements.txt"
+    solution_path.write_text(
+        dedent(
+            """\
+            a==1.0 \\
+                --hash=sha256:aaa \\
+                --hash=sha256:bbb
+                # via test
+            b==2.0 --hash=sha256:ccc  # via a
+            """
+        ),
+        encoding="utf-8",
+    )
+
+    repo = SolutionRepository(solution_path)
+
+    assert repo.solution["a"].metadata.hash == "sha256:aaa"
+    assert repo.get_hashes("a", parse_version("1.0")) == ["sha256:aaa", "sha256:bbb"]
+    assert repo.get_hashes("b", parse_version("2.0")) == ["sha256:ccc"]
+    assert repo.get_hashes("a", parse_version("2.0")) == []
+
+
+def test_all_platform_hashes(mock_metadata, mock_pypi, tmp_path, mocker):
+    mock_pypi.load_scenario("normal")
+    results, nodes = req_compile.compile.perform_compile(
+        [DistInfo("test", None, list(parse_requirements(["d"])), meta=True)],
+        mock_pypi,
+    )
+    for node in results:
+        if node.metadata is not None:
+            node.metadata.hash = "sha256:solved"
+            node.metadata.origin = mock_pypi
+    mocker.patch.object(
+        type(mock_pypi),
+        "get_hashes",
+        lambda self, name, version: ["sha256:other", "sha256:solved"],
+    )
+
+    solution_path = tmp_path / "requirements.txt"
+    with solution_path.open("w", encoding="utf-8") as fh, lock_file_path(
+        solution_path
+    ).open("w", encoding="utf-8") as lock_fh:
+        write_requirements_file(
+            results,
+            nodes,
+            repo=mock_pypi,
+            all_platform_hashes=True,
+            write_to=fh,
+            lock_to=lock_fh,
+        )
+
+    assert "--hash=sha256:solved \\\n    --hash=sha256:other" in (
+        solution_path.read_text(encoding="utf-8")
+    )
+    from_lock = SolutionRepository(solution_path)
+    assert from_lock.get_hashes("d", from_lock.solution["d"].metadata.version) == [
+        "sha256:solved",
+        "sha256:other",
+    ]
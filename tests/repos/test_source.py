@@ -1,10 +1,17 @@
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 from packaging.requirements import Requirement
 import pytest
 
+import req_compile.metadata
 from req_compile.errors import NoCandidateException
-from req_compile.repos.source import SourceRepository
+from req_compile.repos.source import (
+    SourceRepository,
+    guess_project_name,
+    source_identity,
+)
 
 
 @pytest.fixture
@@ -77,3 +84,143 @@ def test_exclude_with_marker(monorepo_dir):
     assert source_repo.get_candidates(Requirement("pkg1"))
     with pytest.raises(NoCandidateException):
         source_repo.get_dist(Requirement("pkg2"))
+
+
+def test_scan_cache(monorepo_dir, tmp_path, mocker):
+    tree = tmp_path / "monorepo"
+    shutil.copytree(monorepo_dir, tree)
+    cache_dir = str(tmp_path / "cache")
+
+    first = _dists(SourceRepository(str(tree), cache_dir=cache_dir))
+    assert os.listdir(cache_dir)
+
+    extract_spy = mocker.spy(req_compile.metadata, "extract_metadata")
+    second = SourceRepository(str(tree), cache_dir=cache_dir)
+    assert _dists(second) == first
+    assert extract_spy.call_count == 0
+
+    setup_py = tree / "pkg2" / "setup.py"
+    setup_py.write_text(
+        setup_py.read_text().replace("'requests'", "'requests', 'six'")
+    )
+    third = SourceRepository(str(tree), cache_dir=cache_dir)
+    result, _ = third.get_dist(Requirement("pkg2"))
+    assert [call.args[0] for call in extract_spy.call_args_list] == [
+        str(tree / "pkg2")
+    ]
+    assert [str(req) for req in result.reqs] == ["requests", "six"]
+
+
+def test_scan_cache_version_file(tmp_path):
+    tree = tmp_path / "tree"
+    (tree / "proj" / "src").mkdir(parents=True)
+    (tree / "proj" / "setup.cfg").write_text(
+        "[metadata]\nname = proj\nversion = file: src/VERSION\n"
+    )
+    (tree / "proj" / "src" / "VERSION").write_text("1.0\n")
+
+    identity = source_identity(str(tree / "proj"))
+
+    assert set(identity) == {"setup.cfg", "src/VERSION"}
+
+
+def _dists(repo):
+    return sorted(
+        (
+            candidate.name,
+            str(candidate.version),
+            [str(req) for req in candidate.preparsed.reqs],
+        )
+        for candidate in repo.get_candidates(None)
+    )
+
+
+def test_lazy(monorepo_dir, mocker):
+    extract_spy = mocker.spy(req_compile.metadata, "extract_metadata")
+    source_repo = SourceRepository(monorepo_dir, lazy=True)
+    assert extract_spy.call_count == 0
+
+    result, _ = source_repo.get_dist(Requirement("pkg2"))
+    assert result.name == "pkg2"
+    assert [call.args[0] for call in extract_spy.call_args_list] == [
+        os.path.join(monorepo_dir, "pkg2")
+    ]
+
+    # Extracted projects are remembered.
+    source_repo.get_dist(Requirement("pkg2"))
+    with pytest.raises(NoCandidateException):
+        source_repo.get_dist(Requirement("requests"))
+    assert extract_spy.call_count == 1
+
+    assert _dists(source_repo) == _dists(SourceRepository(monorepo_dir))
+
+
+def test_lazy_undeclared_name(tmp_path, mocker):
+    """A project whose name isn't written out is found by extracting it"""
+    project = tmp_path / "dir-name"
+    project.mkdir()
+    (project / "setup.py").write_text(
+        'from setuptools import setup\nNAME = "real-name"\n'
+        'setup(name=NAME, version="1.0")\n'
+    )
+    declared = tmp_path / "declared"
+    declared.mkdir()
+    (declared / "setup.cfg").write_text("[metadata]\nname = declared\n")
+    (declared / "pyproject.toml").write_text(
+        '[project]\nname = "declared"\nversion = "1.0"\n'
+    )
+    extract_spy = mocker.spy(req_compile.metadata, "extract_metadata")
+    source_repo = SourceRepository(str(tmp_path), lazy=True)
+
+    result, _ = source_repo.get_dist(Requirement("real-name"))
+    assert result.name == "real-name"
+    # Projects that declare their name are left for when they're asked for.
+    assert [call.args[0] for call in extract_spy.call_args_list] == [str(project)]
+
+
+def test_lazy_threads(monorepo_dir, mocker):
+    """Threads asking for the same project all find it, extracted once in a worker"""
+    deferred_spy = mocker.spy(SourceRepository, "_extract_deferred")
+    source_repo = SourceRepository(monorepo_dir, lazy=True)
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(
+            executor.map(
+                lambda _: source_repo.get_dist(Requirement("pkg2"))[0].name, range(4)
+            )
+        )
+
+    assert results == ["pkg2"] * 4
+    # The setup.py is run in an isolated process, as the thread isn't the main one.
+    assert [call.args[1] for call in deferred_spy.call_args_list] == [
+        [os.path.join(monorepo_dir, "pkg2")]
+    ]
+    assert source_repo.get_dist(Requirement("pkg2"))[0].origin is source_repo
+
+
+@pytest.mark.parametrize(
+    "filename, contents, expected",
+    [
+        ("pyproject.toml", '[project]\nname = "from-pyproject"\n', "from-pyproject"),
+        ("setup.cfg", "[metadata]\nname = from-setup-cfg\n", "from-setup-cfg"),
+        ("setup.py", "setup(\n    name='from-setup-py',\n)\n", "from-setup-py"),
+        ("setup.py", "setup(name=NAME)\n", "from-dir-name"),
+    ],
+)
+def test_guess_project_name(tmp_path, filename, contents, expected):
+    project = tmp_path / "from-dir-name"
+    project.mkdir()
+    (project / filename).write_text(contents)
+
+    assert guess_project_name(str(project)) == expected
+
+
+def test_parallel_setup_py(monorepo_dir):
+    serial = SourceRepository(monorepo_dir)
+    parallel = SourceRepository(monorepo_dir, parallelism=3)
+
+    assert _dists(parallel) == _dists(serial)
+    assert all(
+        candidate.preparsed.origin is parallel
+        for candidate in parallel.get_candidates(None)
+    )
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+
+import pytest
+
+from req_compile.batch import read_batch_manifest, shared_repositories
+from req_compile.cmdline import build_repo, compile_main
+from req_compile.repos.source import SourceRepository
+
+LOCAL_TREE = os.path.join(os.path.dirname(__file__), "local-tree")
+
+
+def _write_manifest(tmp_path, manifest):
+    path = tmp_path / "batch.json"
+    path.write_text(json.dumps(manifest), encoding="utf-8")
+    return str(path)
+
+
+def test_read_batch_manifest(tmp_path):
+    jobs = read_batch_manifest(
+        _write_manifest(
+            tmp_path,
+            {
+                "options": ["--no-index"],
+                "jobs": [
+                    {
+                        "name": "app",
+                        "inputs": ["app.in"],
+                        "constraints": ["constraints.txt"],
+                        "output": "app.txt",
+                        "options": ["--hashes"],
+                    },
+                    {"output": "other.txt"},
+                ],
+            },
+        )
+    )
+    assert jobs[0].argv() == [
+        "--no-index",
+        "--hashes",
+        "app.in",
+        "--constraints",
+        "constraints.txt",
+    ]
+    assert jobs[1].name == "other.txt"
+    assert jobs[1].argv() == ["--no-index"]
+
+
+@pytest.mark.parametrize(
+    "manifest",
+    [
+        [],
+        {"jobs": [{"inputs": ["a.in"]}]},
+        {"jobs": [{"output": "a.txt", "inputs": "a.in"}]},
+        {"jobs": [{"output": "a.txt"}, {"output": "a.txt"}]},
+    ],
+)
+def test_read_batch_manifest_invalid(tmp_path, manifest):
+    with pytest.raises(ValueError):
+        read_batch_manifest(_write_manifest(tmp_path, manifest))
+
+
+def test_batch(tmp_path, capsys):
+    manifest = _write_manifest(
+        tmp_path,
+        {
+            "options": ["--source", LOCAL_TREE],
+            "jobs": [
+                {
+                    "inputs": [os.path.join(LOCAL_TREE, "user1")],
+                    "output": str(tmp_path / "user1.txt"),
+                },
+                {
+                    "inputs": [os.path.join(LOCAL_TREE, "user2")],
+                    "output": str(tmp_path / "user2.txt"),
+                },
+                {
+                    "name": "broken",
+                    "inputs": [str(tmp_path / "missing")],
+                    "output": str(tmp_path / "broken.txt"),
+                },
+            ],
+        },
+    )
+
+    with pytest.raises(SystemExit) as exit_info:
+        compile_main(["--batch", manifest, "--no-index"])
+
+    assert exit_info.value.code == 1
+    assert (tmp_path / "user1.txt").read_text() == "framework==1.0.1  # user1\n"
+    assert (tmp_path / "user2.txt").read_text().splitlines() == [
+        "framework==1.0.1  # user-2",
+        "util==8.0.0       # user-2",
+    ]
+    assert not (tmp_path / "broken.txt").exists()
+    stdout, stderr = capsys.readouterr()
+    assert stdout == ""
+    assert "ERROR: Failed to compile broken" in stderr
+    assert "missing does not exist" in stderr
+    assert "1 of 3 jobs failed: broken" in stderr
+
+
+def test_batch_job_settings(tmp_path, capsys, monkeypatch):
+    monkeypatch.delenv("REQ_COMPILE_DOWNLOAD_DIR", raising=False)
+    manifest = _write_manifest(
+        tmp_path,
+        {
+            "options": ["--source", LOCAL_TREE],
+            "jobs": [
+                {
+                    "name": "verbose",
+                    "inputs": [os.path.join(LOCAL_TREE, "user1")],
+                    "output": str(tmp_path / "verbose.txt"),
+                    "options": ["--verbose"],
+                },
+                {
+                    "name": "quiet",
+                    "inputs": [os.path.join(LOCAL_TREE, "user2")],
+                    "output": str(tmp_path / "quiet.txt"),
+                },
+            ],
+        },
+    )
+
+    compile_main(["--batch", manifest, "--no-index"])
+
+    assert "REQ_COMPILE_DOWNLOAD_DIR" not in os.environ
+    _, stderr = capsys.readouterr()
+    # Only the verbose job logged anything.
+    assert stderr.startswith("verbose:\n")
+    assert "DEBUG:req_compile" in stderr
+    assert "quiet:" not in stderr
+    assert logging.getLogger("req_compile").propagate
+
+
+def test_shared_repositories(tmp_path):
+    def source_repo():
+        return build_repo([], [], [LOCAL_TREE], [], [], [], str(tmp_path), no_index=True)
+
+    assert source_repo() is not source_repo()
+    with shared_repositories():
+        repo = source_repo()
+        assert isinstance(repo, SourceRepository)
+        assert source_repo() is repo
+    assert source_repo() is not repo
@@ -4,6 +4,7 @@ from io import StringIO
 
 import pytest
 
+import req_compile.repos.pypi
 from req_compile.cmdline import _create_input_reqs, compile_main
 from req_compile.containers import DistInfo
 from req_compile.repos.findlinks import FindLinksRepository
@@ -15,7 +16,7 @@ from req_compile.utils import parse_requirements
 
 @pytest.fixture
 def basic_compile_mock(mocker):
-    perform_compile_mock = mocker.patch("req_compile.cmdline.perform_compile")
+    perform_compile_mock = mocker.patch("req_compile.compile.perform_compile")
     result = mocker.MagicMock()
     result.generate_lines.return_value = [("line", "line")]
     perform_compile_mock.return_value = result, mocker.MagicMock()
@@ -27,6 +28,7 @@ def compile_mock(basic_compile_mock, mocker):
     mocker.patch("req_compile.cmdline._create_input_reqs")
     mocker.patch("os.path.exists")
     mocker.patch("os.listdir")
+    mocker.patch("req_compile.repos.findlinks.FindLinksRepository._find_all_links")
     mocker.patch("req_compile.repos.solution.SolutionRepository.load_from_file")
     mocker.patch("req_compile.repos.repository.filename_to_candidate")
     return basic_compile_mock
@@ -134,3 +136,30 @@ def test_stdin_reqs(mock_stdin):
     assert set(result.reqs) == set(
         parse_requirements(["pytest", "pytest-mock"])
     )
+
+
+def test_solution_only_compile_skips_repositories(tmp_path, capsys, mocker):
+    """Repositories only initialize once the solution can't serve a project."""
+    local_tree = os.path.join(os.path.dirname(__file__), "local-tree")
+    (tmp_path / "requirements.in").write_text("framework\n")
+    (tmp_path / "solution.txt").write_text("framework==1.0.1  # requirements.in\n")
+    scan_spy = mocker.spy(SourceRepository, "_find_all_distributions")
+    list_spy = mocker.spy(FindLinksRepository, "_find_all_links")
+    session_spy = mocker.spy(req_compile.repos.pypi, "_shared_session")
+
+    compile_main(
+        [
+            str(tmp_path / "requirements.in"),
+            "--solution",
+            str(tmp_path / "solution.txt"),
+            "--source",
+            local_tree,
+            "--find-links",
+            str(tmp_path / "missing"),
+        ]
+    )
+
+    assert capsys.readouterr().out.startswith("framework==1.0.1")
+    assert scan_spy.call_count == 0
+    assert list_spy.call_count == 0
+    assert session_spy.call_count == 0
@@ -1,6 +1,7 @@
 import os
 
-from req_compile.containers import RequirementsFile
+from req_compile.containers import DistInfo, RequirementsFile
+from req_compile.utils import parse_requirement, parse_version
 
 
 def test_gather_indices():
@@ -16,3 +17,34 @@ def test_gather_indices():
         "--extra-index-url",
         "https://tools/prebuilt/simple",
     ]
+
+
+def test_raw_reqs_parsed_lazily():
+    dist = DistInfo(
+        "a", parse_version("1.0"), [], raw_reqs=["b>1.0", 'c ; extra == "test"']
+    )
+    assert dist._reqs is None  # pylint: disable=protected-access
+    assert dist.requires() == [parse_requirement("b>1.0")]
+    assert dist.requires("test") == [parse_requirement('c ; extra == "test"')]
+
+
+def test_requires_memoized_per_extra():
+    dist = DistInfo(
+        "a",
+        parse_version("1.0"),
+        [parse_requirement("b"), parse_requirement('c ; extra == "test"')],
+    )
+    assert dist.requires() is dist.requires()
+    assert dist.requires("test") is dist.requires("test")
+    assert dist.requires() is not dist.requires("test")
+
+
+def test_requires_invalidated_on_change():
+    dist = DistInfo("a", parse_version("1.0"), [parse_requirement("b")])
+    assert dist.requires() == [parse_requirement("b")]
+
+    dist.add_requirement(parse_requirement("c"))
+    assert {req.name for req in dist.requires()} == {"b", "c"}
+
+    dist.reqs = [parse_requirement("d")]
+    assert dist.requires() == [parse_requirement("d")]
@@ -0,0 +1,128 @@
+# pylint: disable=redefined-outer-name
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+import pytest
+
+from req_compile.daemon import (
+    DaemonServer,
+    _connect,
+    _receive,
+    _send,
+    code_fingerprint,
+    default_socket_path,
+    request_daemon,
+    run_in_daemon,
+    stop_daemon,
+)
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Unix domain sockets are required"
+)
+
+LOCAL_TREE = os.path.join(os.path.dirname(__file__), "local-tree")
+ENTRY = ("req_compile.cmdline", "compile_main")
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    # Socket paths are limited to about a hundred characters.
+    socket_dir = tempfile.mkdtemp(prefix="rcd")
+    socket_path = os.path.join(socket_dir, "daemon.sock")
+    server = DaemonServer(socket_path, str(tmp_path / "cache"))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield socket_path
+    stop_daemon(socket_path)
+    thread.join()
+    server.server_close()
+    shutil.rmtree(socket_dir)
+
+
+def test_compile(daemon, tmp_path):
+    cwd = os.getcwd()
+    result = request_daemon(
+        ENTRY,
+        [os.path.join(LOCAL_TREE, "user1"), "--source", LOCAL_TREE, "--no-index"],
+        socket_path=daemon,
+    )
+    assert result is not None
+    stdout, _, exit_code = result
+    assert exit_code == 0
+    assert stdout == "framework==1.0.1  # user1\n"
+    assert os.getcwd() == cwd
+    assert (tmp_path / "cache" / "sources").is_dir()
+
+
+def test_stdin_and_exit_code(daemon):
+    result = request_daemon(
+        ENTRY,
+        ["-", "--source", LOCAL_TREE, "--no-index"],
+        stdin="util\n",
+        socket_path=daemon,
+    )
+    assert result is not None
+    assert result[0] == "util==8.0.0  # -\n"
+
+    result = request_daemon(ENTRY, ["does-not-exist"], socket_path=daemon)
+    assert result is not None
+    _, stderr, exit_code = result
+    assert exit_code == 1
+    assert "does-not-exist does not exist" in stderr
+
+
+def test_fingerprint_mismatch(daemon):
+    with _connect(daemon) as sock:
+        _send(sock, {"command": "run", "fingerprint": "other", "entry": list(ENTRY)})
+        assert "error" in _receive(sock)
+
+
+def test_fingerprint_dependencies(mocker):
+    before = code_fingerprint()
+    code_fingerprint.cache_clear()
+    mocker.patch("importlib.metadata.version", return_value="0.0.1")
+    try:
+        assert code_fingerprint() != before
+    finally:
+        code_fingerprint.cache_clear()
+
+
+def test_no_daemon(tmp_path):
+    assert request_daemon(ENTRY, [], socket_path=str(tmp_path / "none.sock")) is None
+    assert not stop_daemon(str(tmp_path / "none.sock"))
+
+
+def test_opt_in(daemon, monkeypatch, capsys):
+    """Compiles are only sent to the daemon when asked to"""
+    argv = ["-", "--source", LOCAL_TREE, "--no-index"]
+    monkeypatch.setenv("REQ_COMPILE_DAEMON_SOCKET", daemon)
+    monkeypatch.delenv("REQ_COMPILE_DAEMON", raising=False)
+    assert not run_in_daemon(ENTRY, argv, stdin="util\n")
+
+    monkeypatch.setenv("REQ_COMPILE_DAEMON", "1")
+    assert run_in_daemon(ENTRY, argv, stdin="util\n")
+    assert capsys.readouterr().out == "util==8.0.0  # -\n"
+
+
+def test_shared_directory(daemon):
+    """Nothing is sent to a socket in a directory other users can access"""
+    os.chmod(os.path.dirname(daemon), 0o755)
+    try:
+        assert request_daemon(ENTRY, [], socket_path=daemon) is None
+    finally:
+        os.chmod(os.path.dirname(daemon), 0o700)
+    assert request_daemon(ENTRY, ["--help"], socket_path=daemon) is not None
+
+
+def test_default_socket_path(monkeypatch, tmp_path):
+    monkeypatch.delenv("REQ_COMPILE_DAEMON_SOCKET", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert default_socket_path() == str(tmp_path / "req-compile" / "daemon.sock")
+
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    assert os.path.basename(os.path.dirname(default_socket_path())) == (
+        "req-compile-{}".format(os.getuid())
+    )
@@ -0,0 +1,63 @@
+import platform
+
+import packaging.markers
+import pytest
+
+from req_compile.markers import compile_marker, evaluate_marker
+
+
+@pytest.mark.parametrize(
+    "marker, extra",
+    [
+        ('extra == "test"', None),
+        ('extra == "test"', "test"),
+        ('extra == "test"', "other"),
+        ('extra == "Test_Case"', "test-case"),
+        ('extra == "a" or extra == "b"', "b"),
+        ('extra != "test"', "test"),
+        ('extra != "test"', None),
+        ('python_version > "2.7" and extra == "test"', "test"),
+        ('python_version < "2.7" and extra == "test"', "test"),
+        ('(extra == "a" or extra == "b") and os_name == "nt"', "a"),
+        ('"a" in extra', "a"),
+        ('"a" in extra', "b"),
+        ('sys_platform == "win32"', None),
+        ('sys_platform != "win32"', "anything"),
+    ],
+)
+def test_matches_packaging(marker, extra):
+    expected = packaging.markers.Marker(marker).evaluate({"extra": extra or ""})
+    assert evaluate_marker(packaging.markers.Marker(marker), extra) == expected
+    # Evaluate again to exercise the memoized path.
+    assert evaluate_marker(packaging.markers.Marker(marker), extra) == expected
+
+
+def test_environment_override():
+    marker = packaging.markers.Marker('platform_system == "Plan9"')
+    assert not evaluate_marker(marker)
+    assert evaluate_marker(marker, environment={"platform_system": "Plan9"})
+    assert evaluate_marker(marker) == (platform.system() == "Plan9")
+
+
+def test_compiled_marker_shared_by_text():
+    assert compile_marker(packaging.markers.Marker('extra == "a"')) is compile_marker(
+        packaging.markers.Marker("extra=='a'")
+    )
+
+
+def test_extras_normalized():
+    compiled = compile_marker(packaging.markers.Marker('extra == "Test_Case"'))
+    assert compiled.extras == {"test-case"}
+    assert compiled("test-case")
+    assert compiled("Test.Case")
+    assert not compiled("other")
+    assert not compiled()
+
+
+def test_equality_extras():
+    compiled = compile_marker(
+        packaging.markers.Marker(
+            '(extra == "a" or extra == "B") and extra != "c" and os_name == "nt"'
+        )
+    )
+    assert compiled.extras == {"a", "b"}
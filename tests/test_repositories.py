@@ -10,7 +10,9 @@ from req_compile.repos.repository import (
     _impl_major_minor,
     _py_version_score,
     _wheel_filename_to_candidate,
+    filename_to_candidate,
     sort_candidates,
+    supported_tags,
 )
 
 
@@ -144,6 +146,29 @@ def test_sort_manylinux():
     assert candidate1.sortkey > candidate2.sortkey
 
 
+def test_sortkey_follows_extra_sort_info():
+    candidate = Candidate(
+        "pytz",
+        None,
+        parse_version("1.0"),
+        WheelVersionTags(["cp37"]),
+        "cp37m",
+        ["manylinux_2_12_x86_64"],
+        None,
+    )
+    lower = candidate.sortkey
+    candidate.extra_sort_info = "1"
+    assert candidate.sortkey > lower
+    assert candidate.sortkey[1] == "1"
+
+
+def test_candidates_share_platform_sets():
+    candidate1 = filename_to_candidate(None, "pytz-1.0-cp37-cp37m-win_amd64.whl")
+    candidate2 = filename_to_candidate(None, "pytz-2.0-cp37-cp37m-win_amd64.whl")
+    assert candidate1.platforms is candidate2.platforms
+    assert not hasattr(candidate1, "__dict__")
+
+
 @pytest.mark.skipif(sys.platform != "darwin", reason="MacOS only test")
 def test_sort_macos():
     candidate1 = Candidate(
@@ -201,3 +226,30 @@ def test_py_version_score():
     assert score1 > score2
     assert score2 > score3
     assert score3 > score4
+
+
+def test_supported_tags_follow_interpreter(mock_py_version):
+    mock_py_version("3.7.4")
+    tags = supported_tags()
+    assert supported_tags() is tags
+    assert tags.python_info("py3")[0]
+    assert tags.python_info("cp36")[0]
+    assert not tags.python_info("cp38")[0]
+    assert tags.abi_info("cp37m") == (True, 1)
+    assert not tags.abi_info("cp38")[0]
+    assert tags.platform_info("any") == (True, 0)
+
+    mock_py_version("3.8.1")
+    assert supported_tags() is not tags
+    assert supported_tags().python_info("cp38")[0]
+
+
+def test_supported_tags_platforms(mocker):
+    mocker.patch(
+        "req_compile.repos.repository.PLATFORM_TAGS",
+        ("this_platform", "older_platform"),
+    )
+    tags = supported_tags()
+    assert tags.platform_info("this_platform") == (True, 200)
+    assert tags.platform_info("older_platform") == (True, 100)
+    assert tags.platform_info("unsupported_platform") == (False, None)
@@ -0,0 +1,106 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from req_compile.result_cache import ResultCache, compile_fingerprint
+from req_compile.target import TargetEnvironment, use_target
+
+
+@pytest.fixture(name="inputs")
+def fixture_inputs(tmp_path: Path):
+    reqs = tmp_path / "requirements.in"
+    reqs.write_text("six\n", encoding="utf-8")
+    links = tmp_path / "links"
+    links.mkdir()
+    (links / "six-1.0.0-py3-none-any.whl").write_bytes(b"")
+    return reqs, links
+
+
+def _fingerprint(reqs, links, **kwargs):
+    return compile_fingerprint(
+        {"requirements.in": reqs},
+        find_links=[links],
+        index_urls=["https://pypi.org/simple"],
+        **kwargs
+    )
+
+
+def test_fingerprint_stable(inputs):
+    reqs, links = inputs
+    assert _fingerprint(reqs, links) == _fingerprint(reqs, links)
+
+
+def test_fingerprint_requirements_content(inputs):
+    reqs, links = inputs
+    before = _fingerprint(reqs, links)
+    reqs.write_text("six\nwheel\n", encoding="utf-8")
+    assert _fingerprint(reqs, links) != before
+
+
+def test_fingerprint_find_links_contents(inputs):
+    reqs, links = inputs
+    before = _fingerprint(reqs, links)
+    (links / "six-2.0.0-py3-none-any.whl").write_bytes(b"")
+    assert _fingerprint(reqs, links) != before
+
+
+def test_fingerprint_sources(inputs, tmp_path):
+    reqs, links = inputs
+    project = tmp_path / "project"
+    project.mkdir()
+    setup_py = project / "setup.py"
+    setup_py.write_text("", encoding="utf-8")
+    before = _fingerprint(reqs, links, sources=[project])
+
+    (project / ".git").mkdir()
+    (project / ".git" / "index").write_bytes(b"changed")
+    assert _fingerprint(reqs, links, sources=[project]) == before
+
+    setup_py.write_text("from setuptools import setup\n", encoding="utf-8")
+    assert _fingerprint(reqs, links, sources=[project]) != before
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"index_snapshot": "2024-01-01"},
+        {"options": {"only_binary": True}},
+        {"extra_index_urls": ["https://extra.com"]},
+        {"constraint_files": {"constraints.txt": Path("missing.txt")}},
+    ],
+)
+def test_fingerprint_configuration(inputs, kwargs):
+    reqs, links = inputs
+    assert _fingerprint(reqs, links, **kwargs) != _fingerprint(reqs, links)
+
+
+def test_fingerprint_target(inputs):
+    reqs, links = inputs
+    before = _fingerprint(reqs, links)
+    with use_target(
+        TargetEnvironment.create(python_version="3.8", platforms=["win_amd64"])
+    ):
+        assert _fingerprint(reqs, links) != before
+
+
+def test_fingerprint_code(inputs, monkeypatch):
+    reqs, links = inputs
+    before = _fingerprint(reqs, links)
+    monkeypatch.setattr("req_compile.result_cache.code_fingerprint", lambda: "upgraded")
+    assert _fingerprint(reqs, links) != before
+
+
+def test_result_cache_round_trip(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    key = "ab" * 32
+    assert cache.get(key) is None
+
+    path = cache.put(key, "six==1.0.0\n")
+    assert cache.get(key) == path
+    assert path.read_text(encoding="utf-8") == "six==1.0.0\n"
+
+    cache.put(key, "six==2.0.0\n")
+    assert cache.get(key).read_text(encoding="utf-8") == "six==2.0.0\n"
+    # No temporary files are left behind.
+    assert os.listdir(path.parent) == [path.name]
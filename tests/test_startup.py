@@ -0,0 +1,62 @@
+import re
+import subprocess
+import sys
+from typing import Dict
+
+# Only needed to run setup.py files, talk to an index or read configuration files,
+# none of which req-compile --help does.
+DEFERRED_MODULES = {
+    "appdirs",
+    "multiprocessing",
+    "requests",
+    "setuptools",
+    "toml",
+}
+
+# Only needed to compile, verify or lock a solution, so imported by the functions
+# doing it rather than when the command line is parsed.
+DEFERRED_REQ_COMPILE_MODULES = {
+    "req_compile.batch",
+    "req_compile.compile",
+    "req_compile.lock",
+    "req_compile.metadata",
+    "req_compile.repos.findlinks",
+    "req_compile.repos.multi",
+    "req_compile.repos.pypi",
+    "req_compile.repos.solution",
+    "req_compile.repos.source",
+    "req_compile.verify",
+}
+
+# Cumulative import time of req_compile.cmdline, in microseconds. This is a few
+# times the expected time, to only catch regressions on slow machines.
+IMPORT_BUDGET_US = 500_000
+
+
+def _import_times(*args: str) -> Dict[str, int]:
+    """Cumulative import times of the modules imported by running python with args."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s*\d+ \|\s*(\d+) \|\s*(\S+)", line)
+        if match:
+            times[match.group(2)] = int(match.group(1))
+    return times
+
+
+def test_help_defers_heavy_imports():
+    times = _import_times("-m", "req_compile", "--help")
+    assert "req_compile.cmdline" in times
+    assert not {name.split(".")[0] for name in times} & DEFERRED_MODULES
+    assert not set(times) & DEFERRED_REQ_COMPILE_MODULES
+
+
+def test_import_budget():
+    times = _import_times("-c", "import req_compile.cmdline")
+    assert times["req_compile.cmdline"] < IMPORT_BUDGET_US
@@ -0,0 +1,206 @@
+import argparse
+import os
+
+import pytest
+from packaging.requirements import Requirement
+
+from req_compile.cmdline import add_target_args, compile_main, target_from_args
+from req_compile.containers import DistInfo
+from req_compile.repos.pypi import check_python_compatibility
+from req_compile.repos.repository import check_usability, filename_to_candidate
+from req_compile.target import (
+    TargetEnvironment,
+    current_target,
+    expand_platform_tag,
+    parse_target,
+    use_target,
+)
+from req_compile.utils import parse_version
+
+
+def test_create_defaults_abis():
+    target = TargetEnvironment.create("3.12", ["win_amd64"], implementation="cp")
+    assert target.python_version == parse_version("3.12")
+    assert target.abi_tags == ("abi3", "cp312")
+    assert target.platform_tags == ("win_amd64",)
+    assert TargetEnvironment.create("3.7", implementation="cp").abi_tags == (
+        "abi3",
+        "cp37m",
+    )
+
+
+def test_create_needs_minor_version():
+    with pytest.raises(ValueError):
+        TargetEnvironment.create("3")
+
+
+def test_expand_manylinux():
+    tags = expand_platform_tag("manylinux2014_x86_64")
+    assert tags[0] == "manylinux_2_17_x86_64"
+    assert "manylinux_2_5_x86_64" in tags
+    assert "manylinux1_x86_64" in tags
+    assert "manylinux_2_18_x86_64" not in tags
+    assert "manylinux1_i686" not in tags
+
+
+def test_expand_macos():
+    tags = expand_platform_tag("macosx_11_0_arm64")
+    assert tags[0] == "macosx_11_0_arm64"
+    assert "macosx_11_0_universal2" in tags
+
+
+def test_marker_environment():
+    target = TargetEnvironment.create("3.10", ["win_amd64"], implementation="cp")
+    env = target.marker_environment()
+    assert env["python_version"] == "3.10"
+    assert env["python_full_version"] == "3.10.0"
+    assert env["sys_platform"] == "win32"
+    assert env["platform_system"] == "Windows"
+    assert env["platform_machine"] == "AMD64"
+
+    env = TargetEnvironment.create(
+        "3.12.1", ["manylinux_2_28_aarch64"], implementation="cp"
+    ).marker_environment()
+    assert env["sys_platform"] == "linux"
+    assert env["platform_machine"] == "aarch64"
+    assert env["python_full_version"] == "3.12.1"
+
+
+def test_use_target_is_scoped():
+    target = TargetEnvironment.create("3.10")
+    assert current_target() is None
+    with use_target(target):
+        assert current_target() is target
+    assert current_target() is None
+
+
+def test_wheel_compatibility_follows_target():
+    candidate = filename_to_candidate(None, "numpy-2.0.0-cp310-cp310-win_amd64.whl")
+    with use_target(TargetEnvironment.create("3.10", ["win_amd64"], ["cp310"])):
+        assert check_usability(None, candidate) is None
+    with use_target(
+        TargetEnvironment.create("3.10", ["manylinux_2_17_x86_64"], ["cp310"])
+    ):
+        assert check_usability(None, candidate) is not None
+    with use_target(TargetEnvironment.create("3.11", ["win_amd64"], ["cp311"])):
+        assert check_usability(None, candidate) is not None
+
+
+def test_requires_python_follows_target():
+    with use_target(TargetEnvironment.create("3.8")):
+        assert not check_python_compatibility(">=3.10")
+    with use_target(TargetEnvironment.create("3.12")):
+        assert check_python_compatibility(">=3.10")
+
+
+def test_requires_follows_target():
+    dist = DistInfo(
+        "test",
+        parse_version("1.0"),
+        [
+            Requirement('pywin32 ; sys_platform == "win32"'),
+            Requirement('tomli ; python_version < "3.11"'),
+        ],
+    )
+    with use_target(TargetEnvironment.create("3.10", ["win_amd64"])):
+        assert [req.name for req in dist.requires()] == ["pywin32", "tomli"]
+    with use_target(TargetEnvironment.create("3.12", ["macosx_11_0_arm64"])):
+        assert dist.requires() == []
+
+
+def test_target_from_args():
+    parser = argparse.ArgumentParser()
+    add_target_args(parser)
+    assert target_from_args(parser.parse_args([])) is None
+
+    target = target_from_args(
+        parser.parse_args(["--target-python", "3.11", "--target-platform", "win_amd64"])
+    )
+    assert target is not None
+    assert target.major_minor == (3, 11)
+    assert target.platform_tags == ("win_amd64",)
+
+    with pytest.raises(ValueError):
+        target_from_args(parser.parse_args(["--target-python", "three"]))
+
+
+def test_parse_target():
+    target = parse_target("3.12:win_amd64,win32:cp312")
+    assert target.major_minor == (3, 12)
+    assert target.platform_tags == ("win_amd64", "win32")
+    assert target.abi_tags == ("cp312",)
+    assert target.name.endswith("312-win_amd64")
+    assert parse_target("3.10").platform_tags == ()
+
+    with pytest.raises(ValueError):
+        parse_target("three:win_amd64")
+
+
+@pytest.fixture(name="marker_reqs")
+def fixture_marker_reqs(tmp_path):
+    reqs = tmp_path / "requirements.in"
+    reqs.write_text('framework\nuser1 ; python_version < "3.11"\n')
+    return str(reqs)
+
+
+def _compile_args(reqs):
+    source = os.path.join(os.path.dirname(__file__), "local-tree")
+    return [reqs, "--source", source, "--no-index"]
+
+
+def test_compile_merges_targets(marker_reqs, capsys):
+    compile_main(_compile_args(marker_reqs) + ["--target", "3.10", "--target", "3.12"])
+    lines = capsys.readouterr().out.splitlines()
+    assert (
+        "framework==1.0.1                         # {}, user1".format(marker_reqs)
+        in lines
+    )
+    assert 'user1==2.0.0 ; python_version == "3.10"  # {}'.format(marker_reqs) in lines
+
+
+def test_compile_merges_targets_options(marker_reqs, capsys):
+    compile_main(
+        _compile_args(marker_reqs)
+        + ["--target", "3.10", "--target", "3.12", "--multiline", "--no-pins"]
+    )
+    assert capsys.readouterr().out.splitlines() == [
+        "framework",
+        "    # via",
+        "    #   {}".format(marker_reqs),
+        "    #   user1",
+        'user1 ; python_version == "3.10"',
+        "    # via {}".format(marker_reqs),
+    ]
+
+    compile_main(
+        _compile_args(marker_reqs)
+        + ["--target", "3.10", "--target", "3.12", "--no-comments"]
+    )
+    assert capsys.readouterr().out.splitlines() == [
+        "framework==1.0.1",
+        'user1==2.0.0 ; python_version == "3.10"',
+    ]
+
+
+def test_compile_merges_targets_rejects_annotate(marker_reqs):
+    with pytest.raises(SystemExit):
+        compile_main(
+            _compile_args(marker_reqs)
+            + ["--target", "3.10", "--target", "3.12", "--annotate"]
+        )
+
+
+def test_compile_target_output_dir(marker_reqs, tmp_path):
+    output_dir = tmp_path / "solutions"
+    compile_main(
+        _compile_args(marker_reqs)
+        + ["--target", "3.10:win_amd64", "--target", "3.12:win_amd64"]
+        + ["--target-output-dir", str(output_dir)]
+    )
+    impl = TargetEnvironment.create("3.10").implementation
+    py310 = (output_dir / "{}310-win_amd64.txt".format(impl)).read_text()
+    py312 = (output_dir / "{}312-win_amd64.txt".format(impl)).read_text()
+    assert "user1==2.0.0" in py310
+    # The explanation is evaluated for the target, not the running interpreter.
+    assert "user1==2.0.0      # {}".format(marker_reqs) in py310
+    assert "user1" not in py312
@@ -1,7 +1,12 @@
 import pytest
 
 from req_compile.utils import (
+    InternTable,
+    KeyedLocks,
+    cache_stats,
     has_prerelease,
+    map_concurrently,
+    merge_requirements,
     parse_requirement,
     parse_requirements,
     req_iter_from_lines,
@@ -59,3 +64,61 @@ class TestInlineCommentStripping:
         assert len(reqs) == 1
         assert reqs[0].name == "requests"
         assert str(reqs[0].specifier) == "==2.28.0"
+
+
+def test_equivalent_requirements_interned():
+    """Requirements differing only in formatting share one object."""
+    assert parse_requirement("thing[b,a]>1,<2") is parse_requirement(
+        "thing[a,b] <2, >1"
+    )
+    assert parse_requirement("thing>1") is not parse_requirement("Thing>1")
+
+
+def test_merge_requirements_interned():
+    merged = merge_requirements(
+        parse_requirement("thing>1"), parse_requirement("thing<2")
+    )
+    assert merged is parse_requirement("thing<2,>1")
+    assert merged is merge_requirements(
+        parse_requirement("thing<2"), parse_requirement("thing>1")
+    )
+
+
+def test_intern_table_bounded():
+    table = InternTable(2)
+    assert table.intern("a", 1) == 1
+    assert table.intern("b", 2) == 2
+    assert table.intern("a", 3) == 1
+    table.intern("c", 4)
+    # "b" was least recently used
+    assert table.get("b") is None
+    assert table.get("a") == 1
+    assert table.cache_info().currsize == 2
+
+
+def test_cache_stats():
+    parse_requirement("thing==1.0")
+    stats = cache_stats()
+    assert stats["parse_requirement"].currsize >= 1
+    assert stats["interned_requirements"].currsize >= 1
+    assert stats["parse_version"].maxsize is not None
+
+
+def test_map_concurrently():
+    assert map_concurrently(lambda item: item * 2, [3, 1, 2]) == [6, 2, 4]
+
+    def fail(item):
+        raise ValueError(item)
+
+    with pytest.raises(ValueError, match="1"):
+        map_concurrently(fail, [1, 2])
+
+
+def test_keyed_locks_released():
+    """Locks are only kept for keys in use"""
+    locks = KeyedLocks()
+    with locks("a"):
+        with locks("b"):
+            assert len(locks) == 2
+        assert len(locks) == 1
+    assert len(locks) == 0
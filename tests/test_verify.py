@@ -0,0 +1,115 @@
+from textwrap import dedent
+
+import pytest
+from packaging.requirements import Requirement
+
+from req_compile.cmdline import compile_main
+from req_compile.containers import DistInfo
+from req_compile.repos.solution import SolutionRepository
+from req_compile.verify import verify_solution
+
+SOLUTION = """\
+a==0.1.0
+    # via d ([x1])
+b==1.1.0
+    # via a[x1] (>1)
+c==1.0.0
+    # via b
+d==0.9.0
+    # via requirements.in
+"""
+
+
+@pytest.fixture(name="solution")
+def fixture_solution(tmp_path):
+    solution_path = tmp_path / "solution.txt"
+    solution_path.write_text(SOLUTION, encoding="utf-8")
+    return SolutionRepository(solution_path)
+
+
+def _inputs(*reqs):
+    return [DistInfo("requirements.in", None, [Requirement(req) for req in reqs])]
+
+
+def test_verify_valid(solution):
+    assert not verify_solution(solution, _inputs("d>0.5"))
+
+
+def test_verify_transitive_input(solution):
+    assert not verify_solution(solution, _inputs("d", "c==1.0.0"))
+
+
+@pytest.mark.parametrize(
+    "reqs, problem",
+    [
+        (
+            ["d", "e"],
+            "e is required by requirements.in (e) but no satisfying version is pinned",
+        ),
+        (["d>=1.0"], "d==0.9.0 does not satisfy requirements.in (d>=1.0)"),
+        (
+            ["d[extra]"],
+            "d is required with extras [extra] by requirements.in that the "
+            "solution does not include",
+        ),
+        (["c"], "d==0.9.0 is no longer required by the inputs"),
+    ],
+)
+def test_verify_stale(solution, reqs, problem):
+    assert problem in verify_solution(solution, _inputs(*reqs))
+
+
+def test_verify_root_extras_from_file(tmp_path):
+    solution_path = tmp_path / "solution.txt"
+    solution_path.write_text(
+        "a==0.1.0\n    # via requirements.txt ([x1])\n", encoding="utf-8"
+    )
+    solution = SolutionRepository(solution_path)
+    assert not verify_solution(solution, _inputs("a[x1]"))
+
+
+def test_verify_constraints(solution):
+    assert not verify_solution(solution, _inputs("d"), _inputs("e<1", "c<2"))
+    assert verify_solution(solution, _inputs("d"), _inputs("c>1")) == [
+        "c==1.0.0 does not satisfy requirements.in (c>1)"
+    ]
+
+
+def test_verify_edges(tmp_path):
+    solution_path = tmp_path / "solution.txt"
+    solution_path.write_text(
+        SOLUTION.replace("b==1.1.0", "b==0.9.0"), encoding="utf-8"
+    )
+    assert verify_solution(SolutionRepository(solution_path), _inputs("d")) == [
+        'b is required by a==0.1.0 (b>1; extra == "x1") but no satisfying '
+        "version is pinned"
+    ]
+
+
+@pytest.mark.parametrize("reqs, code", [("d\n", 0), ("d>1\n", 1)])
+def test_verify_cmdline(mocker, tmp_path, reqs, code):
+    pypi_mock = mocker.patch("req_compile.repos.pypi.PyPIRepository")
+    solution_path = tmp_path / "solution.txt"
+    solution_path.write_text(SOLUTION, encoding="utf-8")
+    reqs_path = tmp_path / "requirements.in"
+    reqs_path.write_text(dedent(reqs), encoding="utf-8")
+
+    with pytest.raises(SystemExit) as ex:
+        compile_main([str(reqs_path), "--verify", str(solution_path)])
+    assert ex.value.code == code
+    pypi_mock.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "targets, code",
+    [([], 0), (["--target", "3.8"], 1), (["--target", "3.8", "--target", "3.12"], 1)],
+)
+def test_verify_cmdline_target(tmp_path, targets, code):
+    solution_path = tmp_path / "solution.txt"
+    solution_path.write_text(SOLUTION, encoding="utf-8")
+    reqs_path = tmp_path / "requirements.in"
+    reqs_path.write_text('d\ne ; python_version < "3.9"\n', encoding="utf-8")
+
+    with pytest.raises(SystemExit) as ex:
+        compile_main([str(reqs_path), "--verify", str(solution_path)] + targets)
+    assert ex.value.code == code
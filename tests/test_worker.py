@@ -0,0 +1,97 @@
+import json
+import os
+import sys
+from io import StringIO
+
+import requests
+
+from req_compile.cmdline import compile_main
+from req_compile.daemon import WarmRunner
+from req_compile.repos.pypi import PyPIRepository
+from req_compile.worker import expand_arguments, serve_requests
+
+LOCAL_TREE = os.path.join(os.path.dirname(__file__), "local-tree")
+
+
+def _serve(tmp_path, *work_requests, function=compile_main):
+    request_stream = StringIO(
+        "".join(json.dumps(request) + "\n" for request in work_requests)
+    )
+    responses = StringIO()
+    serve_requests(
+        function,
+        "compiler",
+        request_stream,
+        responses,
+        WarmRunner(str(tmp_path / "cache")),
+    )
+    return [json.loads(line) for line in responses.getvalue().splitlines()]
+
+
+def test_expand_arguments(tmp_path):
+    flag_file = tmp_path / "args.txt"
+    flag_file.write_text("--source\nsrc\n", encoding="utf-8")
+    assert expand_arguments(["a", f"@{flag_file}", "@@b"]) == [
+        "a",
+        "--source",
+        "src",
+        "@b",
+    ]
+
+
+def test_serve_requests(tmp_path):
+    flag_file = tmp_path / "args.txt"
+    flag_file.write_text(f"--source\n{LOCAL_TREE}\n--no-index\n", encoding="utf-8")
+
+    responses = _serve(
+        tmp_path,
+        {"arguments": [os.path.join(LOCAL_TREE, "user1"), f"@{flag_file}"]},
+        {
+            "arguments": [os.path.join(LOCAL_TREE, "user2"), f"@{flag_file}"],
+            "requestId": 3,
+        },
+        {"arguments": ["does-not-exist"], "requestId": 4},
+        {"requestId": 3, "cancel": True},
+    )
+
+    assert responses[0] == {"exitCode": 0, "output": "framework==1.0.1  # user1\n"}
+    assert responses[1]["requestId"] == 3
+    assert responses[1]["exitCode"] == 0
+    assert responses[2]["requestId"] == 4
+    assert responses[2]["exitCode"] == 1
+    assert "does-not-exist does not exist" in responses[2]["output"]
+    assert len(responses) == 3
+
+
+def test_requests_are_isolated(tmp_path):
+    seen = []
+
+    def entry():
+        seen.append(list(sys.argv))
+        os.environ["LEAKED"] = "1"
+        print("output")
+        raise SystemExit("failed")
+
+    responses = _serve(
+        tmp_path,
+        {"arguments": ["--first"]},
+        {"arguments": ["--second"]},
+        function=entry,
+    )
+
+    assert seen == [["compiler", "--first"], ["compiler", "--second"]]
+    assert responses[1] == {"exitCode": 1, "output": "output\nfailed\n"}
+    assert "LEAKED" not in os.environ
+
+
+def test_sessions_are_not_shared(tmp_path, mocker):
+    close_spy = mocker.spy(requests.Session, "close")
+    sessions = []
+
+    def entry():
+        sessions.append(PyPIRepository("https://example.com/simple", tmp_path).session)
+
+    _serve(tmp_path, {"arguments": []}, {"arguments": []}, function=entry)
+
+    assert sessions[0] is not sessions[1]
+    assert close_spy.call_count == 2